@@ -1,5 +1,6 @@
 import express from "express";
 import { pool } from "../db.js";
+import { imageKeyFromUrl, resolveImageUrl, setImagePinned } from "./pipeline.routes.js";
 
 const router = express.Router();
 
@@ -31,11 +32,11 @@ coordinates:
       : null,
 
   size: row.size != null ? Number(row.size) : null,
-  image: row.image_url || null,
+  image: resolveImageUrl(row.image_url) || null,
 
   images: Array.isArray(row.images)
     ? row.images.map(img => ({
-        url: img.url,
+        url: resolveImageUrl(img.url),
         type: img.type,
         capturedAt: img.capturedat ? new Date(img.capturedat) : null
       }))
@@ -230,9 +231,29 @@ router.delete("/:id/delete", async (req, res) => {
       return res.status(404).json({ error: "Defect not found" });
     }
 
+    const images = await pool.query(
+      `SELECT image_url FROM defect_images WHERE defect_id=$1`,
+      [id]
+    );
+
     // Delete main defect row 
     await pool.query(`DELETE FROM defects WHERE id=$1`, [id]);
 
+    // release pipeline images no other defect links to
+    for (const { image_url } of images.rows) {
+      const key = imageKeyFromUrl(image_url);
+      if (!key) continue;
+      const still = await pool.query(
+        `SELECT 1 FROM defect_images WHERE image_url=$1 LIMIT 1`,
+        [image_url]
+      );
+      if (still.rows.length === 0) {
+        await setImagePinned(key, false).catch((err) =>
+          console.warn(`Could not unpin pipeline image ${key}:`, err.message)
+        );
+      }
+    }
+
     return res.json({ success: true, message: `Defect ${id} deleted` });
 
   } catch (err) {
@@ -16,6 +16,28 @@ const upload = multer({
 });
 
 const PIPELINE_URL = process.env.PIPELINE_URL || "http://localhost:8000";
+// base for image links handed to browsers, which may not resolve PIPELINE_URL
+const PIPELINE_PUBLIC_URL = process.env.PIPELINE_PUBLIC_URL || PIPELINE_URL;
+
+const IMAGE_PATH_PATTERN = /^\/images\/([0-9a-f]{64})$/;
+
+// image links are stored as the pipeline's relative /images/<key> path and
+// resolved against PIPELINE_PUBLIC_URL when they are read
+export const resolveImageUrl = (url) =>
+  url && IMAGE_PATH_PATTERN.test(url) ? `${PIPELINE_PUBLIC_URL}${url}` : url;
+
+export const imageKeyFromUrl = (url) => {
+  const match = url && url.match(IMAGE_PATH_PATTERN);
+  return match ? match[1] : null;
+};
+
+// pinned images are exempt from the pipeline's image retention
+export const setImagePinned = async (key, pinned) => {
+  const response = await fetch(`${PIPELINE_URL}/images/${key}/pin`, {
+    method: pinned ? "PUT" : "DELETE",
+  });
+  return response.ok;
+};
 
 
 router.post(
@@ -107,9 +129,20 @@ router.post(
           const defectId = defectResult.rows[0].id;
 
           // Insert defect image if available
-          if (defect.image_base64) {
-            // Store as data URI for now
-            const imageUrl = `data:image/jpeg;base64,${defect.image_base64}`;
+          let imageUrl = null;
+          if (defect.image_url) {
+            // served by the pipeline's image store, kept there while we link to it
+            imageUrl = defect.image_url;
+            const key = imageKeyFromUrl(imageUrl);
+            if (key && !(await setImagePinned(key, true).catch(() => false))) {
+              console.warn(`Could not pin pipeline image ${key}`);
+            }
+          } else if (defect.image_base64) {
+            // inline images from image_format=base64
+            imageUrl = `data:image/jpeg;base64,${defect.image_base64}`;
+          }
+
+          if (imageUrl) {
             await client.query(
               `INSERT INTO defect_images (defect_id, image_url, image_type)
                VALUES ($1, $2, $3)`,
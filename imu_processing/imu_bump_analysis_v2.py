@@ -5,6 +5,7 @@ from scipy.signal import butter, filtfilt, find_peaks
 import matplotlib.pyplot as plt
 from datetime import datetime
 import os
+from imu_features import bump_summary, kalman_filter, rolling_rms
 
 
 def analyze_bumps_v2(
@@ -36,26 +37,11 @@ def analyze_bumps_v2(
         df[f"{g}_f"] = filtfilt(b_g, a_g, df[g])
 
     # --- Step 4: Kalman filter (Z-axis) ---
-    def kalman_filter(z, Q=0.01, R=1):
-        x_est, P = 0, 1
-        out = []
-        for k in z:
-            P += Q
-            K = P / (P + R)
-            x_est += K * (k - x_est)
-            P *= (1 - K)
-            out.append(x_est)
-        return np.array(out)
-
     df["acc_z_kal"] = kalman_filter(df["acc_z_mean_c_f"])
 
     # --- Step 5: RMS Energy (0.5 s window) ---
     win = int(fs * 0.5)
-    df["rms_z"] = (
-        df["acc_z_kal"]
-        .rolling(win, center=True)
-        .apply(lambda x: np.sqrt(np.mean(x ** 2)), raw=True)
-    )
+    df["rms_z"] = rolling_rms(df["acc_z_kal"], win)
 
     # --- Step 6: Speed-compensated bump score (Hybrid Strategy E) ---
     # (A) Lateral variance as proxy for speed
@@ -99,29 +85,7 @@ def analyze_bumps_v2(
     print(f"✅ Results saved → {output_path}")
 
     # --- Step 11: Summarize bumps ---
-    bumps = []
-    in_bump, bump_id = False, 0
-    for i in range(len(df)):
-        if df.loc[i, "bump_flag"] == 1 and not in_bump:
-            in_bump, bump_id, start_t = True, bump_id + 1, df.loc[i, "t_s"]
-        elif df.loc[i, "bump_flag"] == 0 and in_bump:
-            in_bump = False
-            end_t = df.loc[i - 1, "t_s"]
-            seg = df[(df["t_s"] >= start_t) & (df["t_s"] <= end_t)]
-            pk = seg["bump_score"].idxmax()
-            bumps.append(
-                {
-                    "bump_id": bump_id,
-                    "start_time_s": start_t,
-                    "end_time_s": end_t,
-                    "duration_s": end_t - start_t,
-                    "peak_time_s": df.loc[pk, "t_s"],
-                    "peak_score": df.loc[pk, "bump_score"],
-                    "severity": df.loc[pk, "bump_severity"],
-                    "turning": bool(df.loc[pk, "turning"]),
-                    "rejection_reason": df.loc[pk, "bump_rejection_reason"],
-                }
-            )
+    bumps = bump_summary(df)
 
     pd.DataFrame(bumps).to_csv(summary_path, index=False)
     print(f"✅ Summary saved → {summary_path}")
@@ -0,0 +1,78 @@
+# ---------- IMU FEATURES (vectorized building blocks for the bump analysis) ----------
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+
+def kalman_filter(z, Q=0.01, R=1):
+    """
+    Scalar random-walk Kalman filter (x starts at 0, P at 1), same output as
+    filtering sample by sample.
+
+    The gain doesn't depend on the data and settles within a few hundred
+    samples. Those are filtered one by one, the rest in a single lfilter
+    pass at the steady-state gain.
+    """
+    z = np.asarray(z, dtype=float)
+    out = np.empty_like(z)
+    x_est, P, K_prev = 0.0, 1.0, None
+
+    i = 0
+    while i < len(z):
+        P += Q
+        K = P / (P + R)
+        if K_prev is not None and abs(K - K_prev) <= 1e-15 * K:
+            break
+        x_est += K * (z[i] - x_est)
+        P *= (1 - K)
+        out[i] = x_est
+        K_prev = K
+        i += 1
+
+    if i < len(z):
+        # x_k = K z_k + (1 - K) x_{k-1}, continuing from the last estimate
+        out[i:], _ = lfilter([K], [1, K - 1], z[i:], zi=[(1 - K) * x_est])
+    return out
+
+
+def rolling_rms(values, window, center=True):
+    """RMS over a rolling window, NaN where the window isn't full."""
+    squares = pd.Series(np.asarray(values, dtype=float)) ** 2
+    # rounding can leave a tiny negative mean where the signal is flat
+    return np.sqrt(squares.rolling(window, center=center).mean().clip(lower=0)).to_numpy()
+
+
+def bump_segments(flags):
+    """
+    First and last row (inclusive) of every run of set flags.
+    A run still open at the last row is left out.
+    """
+    edges = np.diff((np.asarray(flags) != 0).astype(np.int8), prepend=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return starts[:len(ends)], ends
+
+
+def bump_summary(df):
+    """One row per flagged run, described at its highest bump_score."""
+    starts, ends = bump_segments(df["bump_flag"].to_numpy())
+    t = df["t_s"].to_numpy()
+    score = df["bump_score"].to_numpy(dtype=float)
+
+    bumps = []
+    for bump_id, (start, end) in enumerate(zip(starts, ends), start=1):
+        pk = df.index[start + int(np.nanargmax(score[start:end + 1]))]
+        bumps.append(
+            {
+                "bump_id": bump_id,
+                "start_time_s": t[start],
+                "end_time_s": t[end],
+                "duration_s": t[end] - t[start],
+                "peak_time_s": df.loc[pk, "t_s"],
+                "peak_score": df.loc[pk, "bump_score"],
+                "severity": df.loc[pk, "bump_severity"],
+                "turning": bool(df.loc[pk, "turning"]),
+                "rejection_reason": df.loc[pk, "bump_rejection_reason"],
+            }
+        )
+    return bumps
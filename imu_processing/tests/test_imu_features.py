@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from imu_features import bump_segments, bump_summary, kalman_filter, rolling_rms
+
+
+# ---------- the per-sample code imu_features replaced (imu_bump_analysis_v2) ----------
+
+def reference_kalman(z, Q=0.01, R=1):
+    x_est, P = 0, 1
+    out = []
+    for k in z:
+        P += Q
+        K = P / (P + R)
+        x_est += K * (k - x_est)
+        P *= (1 - K)
+        out.append(x_est)
+    return np.array(out)
+
+
+def reference_rms(values, win):
+    return pd.Series(values).rolling(win, center=True).apply(lambda x: np.sqrt(np.mean(x ** 2)), raw=True).to_numpy()
+
+
+def reference_summary(df):
+    bumps = []
+    in_bump, bump_id = False, 0
+    for i in range(len(df)):
+        if df.loc[i, "bump_flag"] == 1 and not in_bump:
+            in_bump, bump_id, start_t = True, bump_id + 1, df.loc[i, "t_s"]
+        elif df.loc[i, "bump_flag"] == 0 and in_bump:
+            in_bump = False
+            end_t = df.loc[i - 1, "t_s"]
+            seg = df[(df["t_s"] >= start_t) & (df["t_s"] <= end_t)]
+            pk = seg["bump_score"].idxmax()
+            bumps.append(
+                {
+                    "bump_id": bump_id,
+                    "start_time_s": start_t,
+                    "end_time_s": end_t,
+                    "duration_s": end_t - start_t,
+                    "peak_time_s": df.loc[pk, "t_s"],
+                    "peak_score": df.loc[pk, "bump_score"],
+                    "severity": df.loc[pk, "bump_severity"],
+                    "turning": bool(df.loc[pk, "turning"]),
+                    "rejection_reason": df.loc[pk, "bump_rejection_reason"],
+                }
+            )
+    return bumps
+
+
+# ---------- synthetic signals ----------
+
+def road_signal(n, fs=100.0, seed=0):
+    # vertical acceleration: engine vibration, noise and a few sharp bumps
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / fs
+    z = 0.05 * np.sin(2 * np.pi * 12 * t) + rng.normal(0, 0.02, n)
+    for at in rng.integers(0, max(n, 1), n // 500):
+        z[at:at + 15] += rng.uniform(0.5, 2.0) * np.hanning(len(z[at:at + 15]))
+    return z
+
+
+def bump_frame(flags, scores=None, seed=0):
+    rng = np.random.default_rng(seed)
+    n = len(flags)
+    scores = rng.random(n) if scores is None else np.asarray(scores, dtype=float)
+    return pd.DataFrame({
+        "t_s": np.arange(n) * 0.01,
+        "bump_flag": np.asarray(flags, dtype=int),
+        "bump_score": scores,
+        "bump_severity": rng.choice(["low", "medium", "high"], n),
+        "turning": rng.random(n) < 0.2,
+        "bump_rejection_reason": rng.choice(["", "turning"], n),
+    })
+
+
+def assert_same_nans_and_close(expected, actual, atol):
+    expected, actual = np.asarray(expected, dtype=float), np.asarray(actual, dtype=float)
+    np.testing.assert_array_equal(np.isnan(expected), np.isnan(actual))
+    np.testing.assert_allclose(actual[~np.isnan(actual)], expected[~np.isnan(expected)], rtol=0, atol=atol)
+
+
+# ---------- kalman_filter ----------
+
+@pytest.mark.parametrize("n", [0, 1, 5, 200, 20000])
+def test_kalman_matches_the_loop(n):
+    z = road_signal(n)
+    assert_same_nans_and_close(reference_kalman(z), kalman_filter(z), atol=1e-12)
+
+
+@pytest.mark.parametrize("Q, R", [(0.01, 1), (0.5, 0.1), (1e-4, 10)])
+def test_kalman_matches_the_loop_for_other_noise_settings(Q, R):
+    z = road_signal(5000, seed=1)
+    assert_same_nans_and_close(reference_kalman(z, Q, R), kalman_filter(z, Q, R), atol=1e-12)
+
+
+def test_kalman_takes_a_series():
+    z = pd.Series(road_signal(1000, seed=2))
+    assert_same_nans_and_close(reference_kalman(z), kalman_filter(z), atol=1e-12)
+
+
+# ---------- rolling_rms ----------
+
+@pytest.mark.parametrize("n, win", [(1000, 50), (1000, 51), (1000, 1), (30, 50), (0, 5)])
+def test_rms_matches_rolling_apply(n, win):
+    values = kalman_filter(road_signal(n))
+    assert_same_nans_and_close(reference_rms(values, win), rolling_rms(values, win), atol=1e-12)
+
+
+def test_rms_of_a_flat_signal_is_not_nan():
+    # the rolling mean of squares can round below zero, sqrt would give NaN
+    values = np.full(500, 1e-9)
+    values[:250] = 3.0
+    rms = rolling_rms(values, 50)
+    assert_same_nans_and_close(reference_rms(values, 50), rms, atol=1e-12)
+
+
+# ---------- bump_segments / bump_summary ----------
+
+@pytest.mark.parametrize("flags, expected", [
+    ([], ([], [])),
+    ([0, 0, 0], ([], [])),
+    ([1, 1, 0, 0], ([0], [1])),
+    ([0, 1, 0, 1, 1, 0], ([1, 3], [1, 4])),
+    # a run still open at the last row is left out
+    ([0, 1, 1, 0, 1, 1], ([1], [2])),
+    ([1, 1, 1], ([], [])),
+])
+def test_bump_segments(flags, expected):
+    starts, ends = bump_segments(np.array(flags, dtype=int))
+    assert starts.tolist() == expected[0]
+    assert ends.tolist() == expected[1]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_summary_matches_the_row_loop(seed):
+    rng = np.random.default_rng(seed)
+    # runs of 1-20 flagged rows between gaps of 1-50
+    flags = []
+    while len(flags) < 3000:
+        flags += [0] * int(rng.integers(1, 50)) + [1] * int(rng.integers(1, 20))
+    df = bump_frame(flags, seed=seed)
+
+    expected = reference_summary(df)
+    assert len(expected) > 50
+    pd.testing.assert_frame_equal(pd.DataFrame(expected), pd.DataFrame(bump_summary(df)))
+
+
+@pytest.mark.parametrize("flags", [
+    [1, 1, 0, 0, 1, 0],
+    [0, 0, 1, 1, 1, 1],
+    [0, 1, 0, 1, 0, 1, 1],
+])
+def test_summary_edges_match_the_row_loop(flags):
+    df = bump_frame(flags)
+    pd.testing.assert_frame_equal(pd.DataFrame(reference_summary(df)), pd.DataFrame(bump_summary(df)))
+
+
+def test_summary_ties_and_nans_pick_the_same_peak():
+    # equal scores: the first one, as idxmax; NaN scores are skipped
+    df = bump_frame([0, 1, 1, 1, 0, 1, 1, 0], scores=[0.1, 0.7, 0.9, 0.9, 0.2, np.nan, 0.4, 0.3])
+    bumps = bump_summary(df)
+    assert [b["peak_time_s"] for b in bumps] == [df.loc[2, "t_s"], df.loc[6, "t_s"]]
+    pd.testing.assert_frame_equal(pd.DataFrame(reference_summary(df)), pd.DataFrame(bumps))
+
+
+def test_summary_without_bumps_is_empty():
+    df = bump_frame([0] * 10)
+    assert bump_summary(df) == reference_summary(df) == []
@@ -0,0 +1,170 @@
+"""Speed and agreement of the onnx detector backends against PyTorch on CPU.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_backends --video sample.mp4 --weights weights/road_defects.pt
+
+Frames are sampled from the clip at --target-fps and run through every
+backend in batches. Detections are matched to the torch ones per frame
+(same class, IoU >= 0.5): recall is the share of torch boxes found, and the
+confidence/IoU columns average over matched pairs. Without --video the
+synthetic drive from bench_chunked is used, which only exercises speed
+unless the weights actually detect something in it.
+
+The ONNX files are exported (and quantized) next to the weights on first
+use, as the service does.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from utils.detector_backends import OnnxModel, export_onnx, quantize_int8
+from utils.frame_sampler import FrameSampler
+from utils.general import iter_batches
+from utils.model_registry import ModelRegistry
+
+MATCH_IOU = 0.5
+
+
+def sample_frames(video_path: str, target_fps: float, limit: int) -> list[np.ndarray]:
+    cap = cv2.VideoCapture(video_path)
+    try:
+        sampler = FrameSampler(cap, cap.get(cv2.CAP_PROP_FPS), target_fps)
+        frames = []
+        for _, frame in sampler:
+            frames.append(frame)
+            if len(frames) >= limit:
+                break
+        return frames
+    finally:
+        cap.release()
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def compare(reference: list[tuple], candidate: list[tuple]) -> dict:
+    matched, total_ref, total_cand = 0, 0, 0
+    conf_diffs, ious = [], []
+    for (ref_boxes, ref_cls, ref_conf), (boxes, cls, conf) in zip(reference, candidate):
+        total_ref += len(ref_boxes)
+        total_cand += len(boxes)
+        if not len(ref_boxes) or not len(boxes):
+            continue
+        iou = _box_iou(ref_boxes, boxes)
+        iou[ref_cls[:, None] != cls[None, :]] = 0
+        # greedy, best pairs first
+        used_ref, used = set(), set()
+        for i, j in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+            if iou[i, j] < MATCH_IOU:
+                break
+            if i in used_ref or j in used:
+                continue
+            used_ref.add(i)
+            used.add(j)
+            matched += 1
+            ious.append(float(iou[i, j]))
+            conf_diffs.append(abs(float(ref_conf[i] - conf[j])))
+
+    return {
+        'detections': total_cand,
+        'recall': round(matched / total_ref, 4) if total_ref else None,
+        'precision': round(matched / total_cand, 4) if total_cand else None,
+        'mean_iou': round(float(np.mean(ious)), 4) if ious else None,
+        'mean_conf_diff': round(float(np.mean(conf_diffs)), 4) if conf_diffs else None,
+    }
+
+
+def _detect(model, frames: list[np.ndarray], batch_size: int, conf: float) -> tuple[float, list[tuple]]:
+    # one untimed batch for allocator/graph setup
+    model.predict(frames[:batch_size], conf=conf)
+    outputs = []
+    start = time.perf_counter()
+    for batch in iter_batches(frames, batch_size):
+        for result in model.predict(batch, conf=conf):
+            boxes = result.boxes
+            outputs.append((boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy()))
+    return time.perf_counter() - start, outputs
+
+
+def run(
+    video_path: str,
+    weights_path: str,
+    threads: list[int],
+    frames: int,
+    batch_size: int,
+    conf: float,
+    target_fps: float
+) -> list[dict]:
+    inputs = sample_frames(video_path, target_fps, frames)
+    models = [('torch', None, ModelRegistry(max_models=1).get(weights_path, 'cpu', backend='torch'))]
+    for backend, onnx_path in (('onnx', export_onnx(weights_path)), ('onnx-int8', quantize_int8(weights_path))):
+        for count in threads:
+            models.append((backend, count, OnnxModel(onnx_path, weights_path, None, backend, intra_op_threads=count)))
+
+    rows = []
+    reference = None
+    for backend, count, model in models:
+        elapsed, outputs = _detect(model, inputs, batch_size, conf)
+        if reference is None:
+            reference = (elapsed, outputs)
+        row = {
+            'backend': backend,
+            'intra_op_threads': count,
+            'frames': len(inputs),
+            'seconds': round(elapsed, 3),
+            'fps': round(len(inputs) / elapsed, 2),
+            'speedup': round(reference[0] / elapsed, 2),
+            **compare(reference[1], outputs),
+        }
+        rows.append(row)
+        print(f"{backend:<10} threads={str(count or '-'):>2}  {row['fps']:7.2f} frames/s  x{row['speedup']:<5}"
+              f"  recall={row['recall']}  precision={row['precision']}  conf_diff={row['mean_conf_diff']}")
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--video')
+    parser.add_argument('--weights', default='weights/road_defects.pt')
+    parser.add_argument('--threads', default='1,2,4', help="ONNX Runtime intra-op thread counts to try")
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--conf', type=float, default=0.3)
+    parser.add_argument('--target-fps', type=float, default=10)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.video:
+            video_path = args.video
+        else:
+            from benchmarks.synthetic import synthetic_drive
+            video_path = synthetic_drive(tmp, seconds=args.frames / args.target_fps + 1)['video_path']
+
+        results = run(
+            video_path,
+            args.weights,
+            [int(t) for t in args.threads.split(',')],
+            args.frames,
+            args.batch_size,
+            args.conf,
+            args.target_fps
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
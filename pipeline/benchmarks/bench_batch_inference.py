@@ -0,0 +1,69 @@
+"""Frames/sec of YOLO inference against batch size.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_batch_inference --weights weights/road_defects.pt
+
+Without --weights an untrained yolov8n graph is built from its yaml, which is
+enough to measure throughput offline.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from utils.general import iter_batches
+from utils.model_registry import ModelRegistry
+
+
+def run(weights_path: str, device: str, batch_sizes: list[int], frames: int, width: int, height: int) -> list[dict]:
+    model = ModelRegistry(max_models=1).get(weights_path, device)
+
+    rng = np.random.default_rng(0)
+    inputs = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(frames)]
+
+    rows = []
+    for batch_size in batch_sizes:
+        # one untimed pass so allocator/graph setup for this shape isn't counted
+        model.predict(inputs[:batch_size])
+
+        start = time.perf_counter()
+        for batch in iter_batches(inputs, batch_size):
+            model.predict(batch)
+        elapsed = time.perf_counter() - start
+
+        rows.append({
+            'batch_size': batch_size,
+            'frames': frames,
+            'seconds': round(elapsed, 3),
+            'fps': round(frames / elapsed, 2),
+        })
+        print(f"batch={batch_size:>3}  {frames / elapsed:8.2f} frames/s")
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default='yolov8n.yaml')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(
+        args.weights,
+        args.device,
+        [int(b) for b in args.batch_sizes.split(',')],
+        args.frames,
+        args.width,
+        args.height
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
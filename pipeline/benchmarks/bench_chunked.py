@@ -0,0 +1,92 @@
+"""Wall-clock time of a whole video against the number of chunk workers.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_chunked --video survey.mp4 --gpx survey.gpx --imu survey.csv \
+        --weights weights/road_defects.pt
+
+Without --video a synthetic drive (boxes crossing the road zone) is written to
+a temp directory along with matching GPX and IMU files. Each worker count is
+checked against the single-process result: the defect lists must be equal.
+
+The first chunk runs in the calling process, every other worker is a
+separate process with its own model, so the speed-up is bounded by physical
+cores (and memory); on a single core the extra workers only add model loads
+and the warm-up/tail overlap reported as overlap_frames. Worker counts are
+capped by PIPELINE_PROCESS_BUDGET (the CPU count by default).
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_drive
+from defect_processor import process_video
+
+
+def run(inputs: dict, weights_path: str, device: str, workers: list[int], target_fps: int) -> list[dict]:
+    rows = []
+    baseline = None
+    for count in workers:
+        start = time.perf_counter()
+        result = process_video(
+            segment_id=1,
+            weights_path=weights_path,
+            device=device,
+            target_fps=target_fps,
+            chunk_workers=count,
+            **inputs
+        )
+        elapsed = time.perf_counter() - start
+
+        info = result['processing_info']
+        defects = result['defects']
+        if baseline is None:
+            baseline = (elapsed, defects)
+
+        rows.append({
+            'workers': count,
+            'seconds': round(elapsed, 2),
+            'speedup': round(baseline[0] / elapsed, 2),
+            'defects': len(defects),
+            'matches_sequential': defects == baseline[1],
+            'overlap_frames': info.get('overlap_frames', 0),
+            'stitched_tracks': info.get('stitched_tracks', 0),
+        })
+        print(f"workers={count:>2}  {elapsed:8.2f}s  x{baseline[0] / elapsed:5.2f}  defects={len(defects)}"
+              f"  same={defects == baseline[1]}")
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--video')
+    parser.add_argument('--gpx')
+    parser.add_argument('--imu')
+    parser.add_argument('--seconds', type=float, default=60, help="length of the synthetic drive")
+    parser.add_argument('--weights', default='yolov8n.yaml')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--target-fps', type=int, default=10)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.video:
+            with open(args.gpx) as g, open(args.imu) as i:
+                inputs = {'video_path': args.video, 'gpx_content': g.read(), 'imu_content': i.read()}
+        else:
+            inputs = synthetic_drive(tmp, args.seconds)
+
+        results = run(
+            inputs,
+            args.weights,
+            args.device,
+            [int(w) for w in args.workers.split(',')],
+            args.target_fps
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
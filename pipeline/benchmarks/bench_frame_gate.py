@@ -0,0 +1,131 @@
+"""Skip rate and speed of the frame-difference gate on static and moving clips.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_frame_gate
+    python -m benchmarks.bench_frame_gate --weights weights/road_defects.pt
+
+Two synthetic clips are written to a temp directory: a parked vehicle (fixed
+road with sensor noise and slow exposure changes) and a drive (road texture
+scrolling under the camera with defects passing through). The gate alone is
+run over the sampled frames of each and its skip rate and cost per frame
+reported; nearly every frame should be reused when parked, none while
+driving. The gate's behaviour itself is tested in tests/test_frame_gate.py.
+
+With --weights both clips are also processed end to end with the gate off
+and on, reporting wall-clock time and the defects found in each case.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from defect_processor import load_vehicle_zones, process_video, zone_roi
+from utils.frame_gate import DEFAULT_GATE_THRESHOLD, FrameGate
+from utils.frame_sampler import FrameSampler
+
+def synthetic_clip(
+    directory: str,
+    moving: bool,
+    seconds: float = 20,
+    fps: float = 30,
+    width: int = 1280,
+    height: int = 720
+) -> str:
+    rng = np.random.default_rng(1)
+    video_path = os.path.join(directory, 'moving.mp4' if moving else 'static.mp4')
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    # patchy asphalt with dashed lane markings, twice the frame height so it can scroll
+    patches = (rng.random((height * 2 // 24, width // 24)) * 80 + 60).astype(np.uint8)
+    road = cv2.resize(patches, (width, height * 2), interpolation=cv2.INTER_CUBIC)
+    for y in range(0, height * 2, 160):
+        cv2.rectangle(road, (width // 2 - 8, y), (width // 2 + 8, y + 80), 230, -1)
+    road = cv2.cvtColor(road, cv2.COLOR_GRAY2BGR)
+    for k in range(int(seconds * fps)):
+        if moving:
+            # about 15 m/s at 20 px per metre
+            offset = int(k * 10) % height
+            frame = road[height - offset:2 * height - offset].copy()
+            x = int((k % (2 * fps)) * width / (2 * fps))
+            cv2.rectangle(frame, (x, height * 2 // 3), (x + 120, height * 2 // 3 + 90), (20, 20, 20), -1)
+        else:
+            # auto-exposure wobble
+            frame = road[:height] + 2 * np.sin(k / fps)
+        noise = rng.normal(0, 2, frame.shape[:2]).astype(np.float32)[..., None]
+        writer.write(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    writer.release()
+    return video_path
+
+
+def gate_skip_rate(video_path: str, target_fps: float, threshold: float) -> dict:
+    cap = cv2.VideoCapture(video_path)
+    try:
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        gate = FrameGate(zone_roi(load_vehicle_zones(1), width, height), threshold)
+        start = time.perf_counter()
+        for _, frame in FrameSampler(cap, cap.get(cv2.CAP_PROP_FPS), target_fps):
+            gate.should_infer(frame)
+        elapsed = time.perf_counter() - start
+    finally:
+        cap.release()
+    frames = gate.inferred + gate.reused
+    return {**gate.stats(), 'gate_ms_per_frame': round(elapsed / max(1, frames) * 1000, 3)}
+
+
+def end_to_end(video_path: str, weights_path: str, device: str, target_fps: float, threshold: float) -> dict:
+    row = {}
+    for frame_gate in (False, True):
+        start = time.perf_counter()
+        result = process_video(
+            video_path=video_path,
+            gpx_content='<?xml version="1.0"?><gpx version="1.1"></gpx>',
+            imu_content='timestamp,accel_x,accel_y,accel_z,gyro_x,gyro_y,gyro_z\n',
+            segment_id=1,
+            weights_path=weights_path,
+            device=device,
+            target_fps=target_fps,
+            save_images=False,
+            frame_gate=frame_gate,
+            gate_threshold=threshold
+        )
+        key = 'gated' if frame_gate else 'ungated'
+        row[f'{key}_seconds'] = round(time.perf_counter() - start, 3)
+        row[f'{key}_defects'] = len(result['defects'])
+    row['speedup'] = round(row['ungated_seconds'] / row['gated_seconds'], 2)
+    return row
+
+
+def run(directory: str, weights_path: str, device: str, target_fps: float, threshold: float) -> list[dict]:
+    rows = []
+    for moving in (False, True):
+        clip = 'moving' if moving else 'static'
+        video_path = synthetic_clip(directory, moving)
+        row = {'clip': clip, **gate_skip_rate(video_path, target_fps, threshold)}
+        if weights_path:
+            row.update(end_to_end(video_path, weights_path, device, target_fps, threshold))
+        rows.append(row)
+        print(f"{clip:<7} skip_rate={row['skip_rate']:<6} gate={row['gate_ms_per_frame']} ms/frame"
+              + (f"  x{row['speedup']} ({row['ungated_defects']} -> {row['gated_defects']} defects)"
+                 if weights_path else ''))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', help="also process both clips end to end with these weights")
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--target-fps', type=float, default=10)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_GATE_THRESHOLD)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(tmp, args.weights, args.device, args.target_fps, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,155 @@
+"""Streaming GPX parser against the whole-document parser it replaced.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_gpx_parser --hours 1,4,16 --rate 1
+
+A synthetic track of each length is written to a temp file and parsed
+from an open handle, as /process does. Both parsers must produce the
+same GpsTrack. Time is the best of --repeat runs. Peak memory is measured
+with tracemalloc in a separate run, so tracing doesn't skew the timings.
+points_peak_mb covers iterating the points without keeping them; that
+should stay flat however long the track is.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic import gpx_track
+from utils.gpx_parser import GpsTrack, _iter_track_points, parse_gpx_track
+
+
+def legacy_parse_gpx(gpx_content) -> list[dict]:
+    # the parser before the streaming rewrite, kept for comparison
+    if hasattr(gpx_content, 'read'):
+        root = ET.parse(gpx_content).getroot()
+    else:
+        root = ET.fromstring(gpx_content)
+
+    namespaces = {
+        'gpx': 'http://www.topografix.com/GPX/1/1',
+        'gpx10': 'http://www.topografix.com/GPX/1/0'
+    }
+    track_points = root.findall('.//gpx:trkpt', namespaces)
+    if not track_points:
+        track_points = root.findall('.//gpx10:trkpt', namespaces)
+    if not track_points:
+        track_points = root.findall('.//{http://www.topografix.com/GPX/1/1}trkpt')
+    if not track_points:
+        track_points = root.findall('.//trkpt')
+
+    coordinates = []
+    for point in track_points:
+        elevation = None
+        ele_elem = point.find('gpx:ele', namespaces) or point.find('ele') or point.find('{http://www.topografix.com/GPX/1/1}ele')
+        if ele_elem is not None and ele_elem.text:
+            elevation = float(ele_elem.text)
+
+        timestamp = None
+        time_elem = point.find('gpx:time', namespaces) or point.find('time') or point.find('{http://www.topografix.com/GPX/1/1}time')
+        if time_elem is not None and time_elem.text:
+            time_str = time_elem.text
+            if time_str.endswith('Z'):
+                time_str = time_str[:-1] + '+00:00'
+            try:
+                timestamp = datetime.fromisoformat(time_str)
+            except ValueError:
+                timestamp = datetime.strptime(time_str.split('.')[0], '%Y-%m-%dT%H:%M:%S')
+
+        coordinates.append({
+            'lat': float(point.get('lat')),
+            'lng': float(point.get('lon')),
+            'elevation': elevation,
+            'timestamp': timestamp
+        })
+    return coordinates
+
+
+def legacy_parse_gpx_track(gpx_content) -> GpsTrack:
+    return GpsTrack.from_coordinates(legacy_parse_gpx(gpx_content))
+
+
+def iterate_points(gpx_content) -> int:
+    return sum(1 for _ in _iter_track_points(gpx_content))
+
+
+def best_time(parse, path: str, repeat: int) -> tuple[float, object]:
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        with open(path, 'rb') as f:
+            start = time.perf_counter()
+            result = parse(f)
+            best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_mb(parse, path: str) -> float:
+    with open(path, 'rb') as f:
+        tracemalloc.start()
+        try:
+            parse(f)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return round(peak / 1e6, 2)
+
+
+def same_track(a: GpsTrack, b: GpsTrack) -> bool:
+    arrays = ('times_ns', 'lat', 'lng', 'elevation', 'untimed_lat', 'untimed_lng')
+    return a.start_time == b.start_time and all(
+        np.array_equal(getattr(a, name), getattr(b, name), equal_nan=True) for name in arrays
+    )
+
+
+def run(hours: float, rate: float, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'track.gpx')
+        with open(path, 'w') as f:
+            f.write(gpx_track(hours * 3600, rate))
+
+        legacy_seconds, legacy_track = best_time(legacy_parse_gpx_track, path, repeat)
+        seconds, track = best_time(parse_gpx_track, path, repeat)
+        if not same_track(legacy_track, track):
+            raise AssertionError(f"{hours} h track: streaming parser disagrees with the legacy parser")
+
+        return {
+            'hours': hours,
+            'rate_hz': rate,
+            'points': len(track),
+            'file_mb': round(os.path.getsize(path) / 1e6, 2),
+            'legacy_seconds': round(legacy_seconds, 4),
+            'seconds': round(seconds, 4),
+            'speedup': round(legacy_seconds / seconds, 2),
+            'legacy_peak_mb': peak_mb(legacy_parse_gpx_track, path),
+            'peak_mb': peak_mb(parse_gpx_track, path),
+            'points_peak_mb': peak_mb(iterate_points, path),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', default='1,4,16', help="comma-separated track lengths")
+    parser.add_argument('--rate', type=float, default=1, help="GPS fixes per second")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    rows = []
+    for hours in (float(h) for h in args.hours.split(',')):
+        row = run(hours, args.rate, args.repeat)
+        rows.append(row)
+        print(f"{row['hours']:>5} h {row['points']:>8} points ({row['file_mb']} MB): "
+              f"{row['legacy_seconds']:.3f} s -> {row['seconds']:.3f} s (x{row['speedup']}), "
+              f"peak {row['legacy_peak_mb']} MB -> {row['peak_mb']} MB, "
+              f"points only {row['points_peak_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
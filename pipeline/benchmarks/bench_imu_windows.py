@@ -0,0 +1,110 @@
+"""Windowed IMU statistics and nearest-sample lookups against a full scan.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_imu_windows --hours 1 --rate 100 --windows 500
+
+Every window is also checked against the mask-and-reduce computation the
+index replaces; the run fails if any result differs by more than --tolerance.
+Nearest lookups for --frames frame times must match an argmin scan exactly.
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from utils.imu_analyzer import ImuSeries, ImuWindowStats
+
+
+def synthetic_series(hours: float, rate: float, seed: int = 0) -> ImuSeries:
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 * rate)
+    start_ns = int(datetime(2025, 1, 1, 8).timestamp() * 1e9)
+    timestamps = start_ns + (np.arange(n) * (1e9 / rate)).astype(np.int64)
+    channels = {
+        'accel_x': rng.normal(0, 1, n),
+        'accel_y': rng.normal(0, 1, n),
+        'accel_z': 9.81 + rng.normal(0, 2, n),
+    }
+    return ImuSeries(timestamps, np.ones(n, dtype=bool), channels)
+
+
+def reference(series: ImuSeries, start_ns: int, end_ns: int) -> tuple[int, float, float]:
+    mask = series.has_time & (series.timestamps_ns >= start_ns) & (series.timestamps_ns <= end_ns)
+    count = int(np.count_nonzero(mask))
+    if not count:
+        return 0, 0.0, 0.0
+    magnitude = np.sqrt(series.accel_x[mask]**2 + series.accel_y[mask]**2 + series.accel_z[mask]**2)
+    z = series.accel_z[mask]
+    return count, float(np.var(magnitude)), float(np.sqrt(np.mean((z - z.mean())**2)))
+
+
+def run(hours: float, rate: float, windows: int, tolerance: float, frames: int) -> dict:
+    series = synthetic_series(hours, rate)
+    rng = np.random.default_rng(1)
+    span = series.timestamps_ns[-1] - series.timestamps_ns[0]
+    starts = series.timestamps_ns[0] + (rng.random(windows) * span).astype(np.int64)
+    ends = starts + (rng.uniform(0.1, 5.0, windows) * 1e9).astype(np.int64)
+
+    start = time.perf_counter()
+    index = ImuWindowStats(series)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    counts, variances = index.magnitude_variance(starts, ends)
+    _, rms = index.accel_z_rms(starts, ends)
+    indexed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [reference(series, s, e) for s, e in zip(starts, ends)]
+    scan_seconds = time.perf_counter() - start
+
+    worst = 0.0
+    for i, (count, variance, z_rms) in enumerate(expected):
+        if count != counts[i]:
+            raise AssertionError(f"window {i}: count {counts[i]} != {count}")
+        if count:
+            worst = max(worst, abs(variances[i] - variance), abs(rms[i] - z_rms))
+    if worst > tolerance:
+        raise AssertionError(f"max abs error {worst:.3e} exceeds {tolerance:.1e}")
+
+    targets = series.timestamps_ns[0] + (rng.random(frames) * span).astype(np.int64)
+
+    start = time.perf_counter()
+    rows = series.time_index.nearest(targets)
+    nearest_seconds = time.perf_counter() - start
+
+    checked = targets[:min(frames, 200)]
+    start = time.perf_counter()
+    expected_rows = [int(np.argmin(np.abs(series.timestamps_ns - t))) for t in checked]
+    argmin_seconds = time.perf_counter() - start
+    if list(rows[:len(checked)]) != expected_rows:
+        raise AssertionError("nearest lookup disagrees with argmin scan")
+
+    result = {
+        'samples': len(series),
+        'windows': windows,
+        'build_seconds': round(build_seconds, 4),
+        'indexed_us_per_window': round(indexed_seconds / windows * 1e6, 3),
+        'scan_us_per_window': round(scan_seconds / windows * 1e6, 3),
+        'max_abs_error': worst,
+        'frames': frames,
+        'nearest_us_per_frame': round(nearest_seconds / frames * 1e6, 3),
+        'argmin_us_per_frame': round(argmin_seconds / len(checked) * 1e6, 3),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', type=float, default=1.0)
+    parser.add_argument('--rate', type=float, default=100.0)
+    parser.add_argument('--windows', type=int, default=500)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--frames', type=int, default=36000)
+    args = parser.parse_args()
+
+    run(args.hours, args.rate, args.windows, args.tolerance, args.frames)
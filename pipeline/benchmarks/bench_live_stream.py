@@ -0,0 +1,133 @@
+"""Live stream session on a looping file source: throughput, drops, latency.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_live_stream --seconds 20
+    python -m benchmarks.bench_live_stream --seconds 20 --weights weights/road_defects.pt
+
+Without --source a synthetic drive (boxes crossing the road zone) is written to
+a temp directory and played back in a loop at its own frame rate, standing in
+for an RTSP camera. GPS and IMU samples for the current wall-clock time are
+pushed to the session while it runs, as a vehicle would.
+
+Without --weights the session runs StubDetector, slowed down to
+--inference-ms per frame so the worker falls behind the camera. The session
+behaviour itself is covered by tests/test_live_processor.py.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import live_processor
+from benchmarks.synthetic import StubDetector, write_video
+from live_processor import LiveSession
+
+
+class SlowStubDetector(StubDetector):
+    """StubDetector taking at least inference_ms per call, like a model on a slow device."""
+
+    def __init__(self, inference_ms: float) -> None:
+        super().__init__()
+        self.inference_ms = inference_ms
+
+    def predict(self, frames, conf=None, **kwargs):
+        start = time.perf_counter()
+        results = super().predict(frames, conf, **kwargs)
+        time.sleep(max(0.0, self.inference_ms / 1000 - (time.perf_counter() - start)))
+        return results
+
+
+def push_sensors(session: LiveSession, stop: threading.Event, pushed: list[dict], imu_rate: float = 100) -> None:
+    rng = np.random.default_rng(0)
+    lat, lng = 1.35, 103.98
+    while True:
+        now = time.time()
+        fix = {'timestamp': now, 'lat': lat, 'lng': lng}
+        session.sensors.add_gps([fix])
+        pushed.append(fix)
+        session.sensors.add_imu([
+            {
+                'timestamp': now - 1 + k / imu_rate,
+                'accel_x': float(rng.normal(0, 0.3)),
+                'accel_y': float(rng.normal(0, 0.3)),
+                'accel_z': float(9.81 + rng.normal(0, 1.0)),
+            }
+            for k in range(int(imu_rate))
+        ])
+        lat += 1e-5
+        lng += 1e-5
+        if stop.wait(1.0):
+            break
+
+
+def run(source: str, weights_path: str, device: str, seconds: float, target_fps: float, inference_ms: float) -> dict:
+    original_get_model = live_processor.get_model
+    if not weights_path:
+        live_processor.get_model = lambda *args, **kwargs: SlowStubDetector(inference_ms)
+    try:
+        session = LiveSession(
+            source,
+            segment_id=1,
+            weights_path=weights_path,
+            device=device,
+            target_fps=target_fps,
+            loop=True,
+            realtime=True
+        )
+        stop = threading.Event()
+        pushed: list[dict] = []
+        pusher = threading.Thread(target=push_sensors, args=(session, stop, pushed), daemon=True)
+
+        # the first fix is in before the first frame
+        pusher.start()
+        while not pushed:
+            time.sleep(0.01)
+        started = time.perf_counter()
+        session.start()
+        time.sleep(seconds)
+        session.stop()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        pusher.join()
+    finally:
+        live_processor.get_model = original_get_model
+
+    if session.error:
+        raise RuntimeError(session.error)
+
+    stats = session.stats()
+    result = {
+        'source': source,
+        'detector': weights_path or f'stub ({inference_ms} ms)',
+        'seconds': round(elapsed, 2),
+        'processed_fps': round(stats['frames_processed'] / elapsed, 2),
+        'defects': len(session.defects),
+        **stats,
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', help="RTSP URL or video file; a synthetic drive by default")
+    parser.add_argument('--weights', help="run this model instead of the stub detector")
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--target-fps', type=float, default=10)
+    parser.add_argument('--inference-ms', type=float, default=100, help="time the stub detector takes per frame")
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source or write_video(os.path.join(tmp, 'loop.mp4'), seconds=8)
+        result = run(source, args.weights, args.device, args.seconds, args.target_fps, args.inference_ms)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
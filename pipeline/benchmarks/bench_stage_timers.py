@@ -0,0 +1,90 @@
+"""Overhead of the per-stage timers in process_video.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.bench_stage_timers --weights weights/road_defects.pt
+
+A single timed stage (enter, exit, locked add) is timed in a tight loop.
+The synthetic drive from bench_chunked is then processed once, with the
+number of timed stages counted. The overhead is that count times the cost
+of one stage, as a share of the run's wall-clock time. It also prints the
+stage breakdown that goes into processing_info.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import defect_processor
+from benchmarks.synthetic import synthetic_drive
+from defect_processor import process_video
+from utils.metrics import StageTimer
+
+
+def stage_cost(iterations: int = 200_000) -> float:
+    timer = StageTimer()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with timer.stage('x'):
+            pass
+    return (time.perf_counter() - start) / iterations
+
+
+def run(inputs: dict, weights_path: str, device: str, target_fps: int, batch_size: int) -> dict:
+    timers = []
+
+    class CountingTimer(StageTimer):
+        def __init__(self) -> None:
+            super().__init__()
+            timers.append(self)
+
+    defect_processor.StageTimer = CountingTimer
+    try:
+        result = process_video(
+            segment_id=1,
+            weights_path=weights_path,
+            device=device,
+            target_fps=target_fps,
+            batch_size=batch_size,
+            save_images=False,
+            **inputs
+        )
+    finally:
+        defect_processor.StageTimer = StageTimer
+
+    info = result['processing_info']
+    cost = stage_cost()
+    calls = sum(sum(timer.calls.values()) for timer in timers)
+    return {
+        'frames': info['processed_frames'],
+        'wall_seconds': info['wall_seconds'],
+        'timed_stages': calls,
+        'stages_per_frame': round(calls / max(1, info['processed_frames']), 2),
+        'stage_cost_us': round(cost * 1e6, 3),
+        'overhead_seconds': round(calls * cost, 5),
+        'overhead_percent': round(calls * cost / info['wall_seconds'] * 100, 4),
+        'stage_seconds': info['stage_seconds'],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default='weights/road_defects.pt')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--target-fps', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        row = run(synthetic_drive(tmp, seconds=args.seconds), args.weights, args.device, args.target_fps, args.batch_size)
+
+    print(f"{row['frames']} frames in {row['wall_seconds']} s, {row['stages_per_frame']} timed stages per frame "
+          f"at {row['stage_cost_us']} us each: {row['overhead_percent']}% overhead")
+    for stage, seconds in sorted(row['stage_seconds'].items(), key=lambda item: -item[1]):
+        print(f"  {stage:<16} {seconds:9.4f} s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(row, f, indent=2)
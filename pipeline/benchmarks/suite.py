@@ -0,0 +1,369 @@
+"""Benchmark suite over synthetic survey data at 1x, 10x and 100x sizes.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --compare benchmarks/results/<commit>.json
+    python -m benchmarks.suite --compare old.json --results new.json
+
+Each case times one stage on inputs from benchmarks.synthetic, scaled by
+the drive duration. process_video runs with StubDetector in place of the
+model, so no weights are needed. The imu_processing cases call the
+scripts in ../imu_processing as they are, writing into a temp directory.
+
+Results go to benchmarks/results/<commit>.json (or --output), together
+with the commit, interpreter and machine. --compare prints the change in
+best-of-N time per case and scale against an earlier results file and
+exits with status 1 if anything got slower by more than --threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+import defect_processor
+from benchmarks.synthetic import (
+    START_TIME,
+    StubDetector,
+    gpx_track,
+    imu_csv,
+    imu_sensor_logs,
+    synthetic_drive
+)
+from utils.gpx_parser import get_gps_at_frame, parse_gpx, parse_gpx_track
+from utils.imu_analyzer import calculate_severity_weight, parse_imu_csv, parse_imu_series
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMU_PROCESSING_DIR = os.path.join(os.path.dirname(PIPELINE_DIR), 'imu_processing')
+RESULTS_DIR = os.path.join(PIPELINE_DIR, 'benchmarks', 'results')
+
+# drive durations at 1x, in seconds
+GPS_SECONDS = 600
+IMU_SECONDS = 60
+VIDEO_SECONDS = 2
+
+# work per 1x run for the lookup cases
+LOOKUPS = 1000
+WINDOWS = 100
+
+VIDEO_SIZE = (640, 360)
+VIDEO_FPS = 30
+
+# a case prepares its inputs (untimed) and returns the timed call, which
+# returns how many items it processed, plus a description of the input size
+Case = Callable[[int, str], tuple[Callable[[], int], dict]]
+CASES: dict[str, Case] = {}
+
+
+def case(name: str):
+    def register(function: Case) -> Case:
+        CASES[name] = function
+        return function
+    return register
+
+
+@case('parse_gpx')
+def bench_parse_gpx(scale: int, workdir: str):
+    seconds = GPS_SECONDS * scale
+    content = gpx_track(seconds)
+    return lambda: len(parse_gpx(content)), {'gps_seconds': seconds, 'gps_hz': 1, 'bytes': len(content)}
+
+
+@case('parse_gpx_track')
+def bench_parse_gpx_track(scale: int, workdir: str):
+    seconds = GPS_SECONDS * scale
+    content = gpx_track(seconds)
+    return lambda: len(parse_gpx_track(content)), {'gps_seconds': seconds, 'gps_hz': 1, 'bytes': len(content)}
+
+
+@case('parse_imu_csv')
+def bench_parse_imu_csv(scale: int, workdir: str):
+    seconds = IMU_SECONDS * scale
+    content = imu_csv(seconds)
+    return lambda: len(parse_imu_csv(content)), {'imu_seconds': seconds, 'imu_hz': 100, 'bytes': len(content)}
+
+
+@case('get_gps_at_frame')
+def bench_get_gps_at_frame(scale: int, workdir: str):
+    seconds = GPS_SECONDS * scale
+    track = parse_gpx_track(gpx_track(seconds))
+    frames = np.random.default_rng(0).integers(0, seconds * VIDEO_FPS, LOOKUPS * scale)
+
+    def run() -> int:
+        for frame in frames:
+            get_gps_at_frame(track, int(frame), VIDEO_FPS)
+        return len(frames)
+
+    return run, {'gps_seconds': seconds, 'lookups': len(frames)}
+
+
+@case('calculate_severity_weight')
+def bench_calculate_severity_weight(scale: int, workdir: str):
+    seconds = IMU_SECONDS * scale
+    series = parse_imu_series(imu_csv(seconds))
+    # two-second windows, as long as a typical defect track
+    starts = np.random.default_rng(0).uniform(0, seconds - 2, WINDOWS * scale)
+    windows = [(START_TIME + timedelta(seconds=s), START_TIME + timedelta(seconds=s + 2)) for s in starts]
+    # the window index is built on first use, once per series
+    calculate_severity_weight(series, *windows[0])
+
+    def run() -> int:
+        for start, end in windows:
+            calculate_severity_weight(series, start, end)
+        return len(windows)
+
+    return run, {'imu_seconds': seconds, 'windows': len(windows)}
+
+
+@case('process_video')
+def bench_process_video(scale: int, workdir: str):
+    seconds = VIDEO_SECONDS * scale
+    width, height = VIDEO_SIZE
+    inputs = synthetic_drive(workdir, seconds, VIDEO_FPS, width, height)
+    # the default zone is drawn for 1920x1080
+    zones = [np.round(defect_processor.DEFAULT_ZONE_POLYGON * width / 1920).astype(np.int32)]
+
+    def run() -> int:
+        result = defect_processor.process_video(
+            segment_id=1, target_fps=10, save_images=False, zones=zones, **inputs
+        )
+        return result['processing_info']['processed_frames']
+
+    return run, {'video_seconds': seconds, 'fps': VIDEO_FPS, 'width': width, 'height': height, 'target_fps': 10}
+
+
+def _imu_processing():
+    if not os.path.isdir(IMU_PROCESSING_DIR):
+        raise RuntimeError(f"imu_processing not found at {IMU_PROCESSING_DIR}")
+    if IMU_PROCESSING_DIR not in sys.path:
+        sys.path.insert(0, IMU_PROCESSING_DIR)
+    # the bump analysis plots; nothing is shown without a display
+    import matplotlib
+    matplotlib.use('Agg')
+    import gpx_to_csv_merge
+    import imu_bump_analysis_v2
+    import imu_preprocess
+    return imu_preprocess, imu_bump_analysis_v2, gpx_to_csv_merge
+
+
+def _quiet(function: Callable, *args, **kwargs):
+    # the scripts print a report for every step
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def _imu_stages(scale: int, workdir: str, upto: str) -> tuple[Callable[[], int], dict]:
+    preprocess, bumps, merge = _imu_processing()
+    import matplotlib.pyplot as plt
+
+    seconds = IMU_SECONDS * scale
+    samples = seconds * 100
+    accel, gyro = imu_sensor_logs(workdir, seconds)
+    gpx_path = os.path.join(workdir, 'drive.gpx')
+    with open(gpx_path, 'w') as f:
+        f.write(gpx_track(seconds))
+    paths = {name: os.path.join(workdir, name) for name in (
+        'imu_data.csv', 'bumps.csv', 'bump_summary.csv', 'imu_gps.csv', 'bump_summary_gps.csv'
+    )}
+
+    def run_preprocess() -> int:
+        _quiet(preprocess.preprocess_data, accel, gyro, paths['imu_data.csv'])
+        return samples
+
+    def run_bumps() -> int:
+        try:
+            _quiet(
+                bumps.analyze_bumps_v2, paths['imu_data.csv'], paths['bumps.csv'], paths['bump_summary.csv'],
+                save_plot=False
+            )
+        finally:
+            plt.close('all')
+        return samples
+
+    def run_merge() -> int:
+        _quiet(
+            merge.merge_gpx_with_imu, gpx_path, paths['bumps.csv'], paths['bump_summary.csv'],
+            paths['imu_gps.csv'], paths['bump_summary_gps.csv']
+        )
+        return samples
+
+    # earlier stages produce the inputs, untimed
+    stages = [('preprocess', run_preprocess), ('bump_analysis', run_bumps), ('gps_merge', run_merge)]
+    for name, stage in stages:
+        if name == upto:
+            return stage, {'imu_seconds': seconds, 'imu_hz': 100, 'gps_hz': 1}
+        stage()
+    raise ValueError(upto)
+
+
+@case('imu_processing.preprocess')
+def bench_imu_preprocess(scale: int, workdir: str):
+    return _imu_stages(scale, workdir, 'preprocess')
+
+
+@case('imu_processing.bump_analysis')
+def bench_imu_bump_analysis(scale: int, workdir: str):
+    return _imu_stages(scale, workdir, 'bump_analysis')
+
+
+@case('imu_processing.gps_merge')
+def bench_imu_gps_merge(scale: int, workdir: str):
+    return _imu_stages(scale, workdir, 'gps_merge')
+
+
+def measure(run: Callable[[], int], repeat: int, budget: float) -> dict:
+    # at least one run; more up to `repeat` while within the time budget
+    times = []
+    items = 0
+    while len(times) < repeat and (not times or sum(times) < budget):
+        start = time.perf_counter()
+        items = run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'items': items,
+        'runs': len(times),
+        'seconds_min': round(best, 6),
+        'seconds_median': round(statistics.median(times), 6),
+        'items_per_second': round(items / best, 2) if best > 0 else None,
+    }
+
+
+def run_suite(cases: list[str], scales: list[int], repeat: int, budget: float) -> list[dict]:
+    rows = []
+    original_get_model = defect_processor.get_model
+    defect_processor.get_model = lambda *args, **kwargs: StubDetector()
+    try:
+        for name in cases:
+            for scale in scales:
+                row = {'case': name, 'scale': scale}
+                with tempfile.TemporaryDirectory() as workdir:
+                    try:
+                        run, size = CASES[name](scale, workdir)
+                        row.update(size=size, **measure(run, repeat, budget))
+                    except Exception as e:
+                        # a broken stage is reported, the rest of the suite still runs
+                        row['error'] = f"{type(e).__name__}: {e}"
+                rows.append(row)
+                print(format_row(row), flush=True)
+    finally:
+        defect_processor.get_model = original_get_model
+    return rows
+
+
+def format_row(row: dict) -> str:
+    label = f"{row['case']:<30} {row['scale']:>4}x"
+    if 'error' in row:
+        return f"{label}  error: {row['error']}"
+    return (f"{label}  {row['seconds_min']:10.4f} s  {row['items_per_second']:>12} items/s"
+            f"  ({row['items']} items, {row['runs']} runs)")
+
+
+def git_commit() -> tuple[Optional[str], bool]:
+    def git(*args: str) -> str:
+        return subprocess.run(['git', *args], cwd=PIPELINE_DIR, capture_output=True, text=True, check=True).stdout
+
+    try:
+        return git('rev-parse', 'HEAD').strip(), bool(git('status', '--porcelain', '--untracked-files=no').strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def environment() -> dict:
+    commit, dirty = git_commit()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def default_output(env: dict) -> str:
+    name = (env['commit'] or 'unknown')[:12] + ('-dirty' if env['dirty'] else '')
+    return os.path.join(RESULTS_DIR, f"{name}.json")
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[dict]:
+    # best-of-N times per (case, scale) present in both runs
+    previous = {(row['case'], row['scale']): row for row in base['results'] if 'error' not in row}
+    changes = []
+    for row in new['results']:
+        old = previous.get((row['case'], row['scale']))
+        if old is None or 'error' in row or old['seconds_min'] <= 0:
+            continue
+        ratio = row['seconds_min'] / old['seconds_min']
+        changes.append({
+            'case': row['case'],
+            'scale': row['scale'],
+            'base_seconds': old['seconds_min'],
+            'seconds': row['seconds_min'],
+            'ratio': round(ratio, 3),
+            'regression': ratio > 1 + threshold,
+        })
+    return changes
+
+
+def print_comparison(base: dict, new: dict, changes: list[dict]) -> None:
+    print(f"\n{(base.get('commit') or 'unknown')[:12]} -> {(new.get('commit') or 'unknown')[:12]}")
+    for change in changes:
+        flag = '  REGRESSION' if change['regression'] else ''
+        print(f"{change['case']:<30} {change['scale']:>4}x  {change['base_seconds']:10.4f} s -> "
+              f"{change['seconds']:10.4f} s  x{change['ratio']:<6}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', default=','.join(CASES), help="comma-separated, default all")
+    parser.add_argument('--scales', default='1,10,100')
+    parser.add_argument('--repeat', type=int, default=5, help="best of this many runs")
+    parser.add_argument('--budget', type=float, default=10,
+                        help="stop repeating a case after this many seconds")
+    parser.add_argument('--output', help="results path, default benchmarks/results/<commit>.json")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    parser.add_argument('--results', help="compare this results file instead of running the suite")
+    parser.add_argument('--threshold', type=float, default=0.1, help="slowdown counted as a regression")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            report = json.load(f)
+    else:
+        cases = [name.strip() for name in args.cases.split(',') if name.strip()]
+        unknown = [name for name in cases if name not in CASES]
+        if unknown:
+            parser.error(f"unknown cases {unknown}, expected some of {list(CASES)}")
+        scales = [int(scale) for scale in args.scales.split(',')]
+
+        env = environment()
+        report = {**env, 'scales': scales, 'repeat': args.repeat, 'results': run_suite(cases, scales, args.repeat, args.budget)}
+
+        output = args.output or default_output(env)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        changes = compare(base, report, args.threshold)
+        print_comparison(base, report, changes)
+        if any(change['regression'] for change in changes):
+            sys.exit(1)
@@ -0,0 +1,180 @@
+"""Synthetic survey data for the benchmarks: dashcam video, GPX track and
+IMU logs of one drive, at any duration and sample rate.
+
+Everything is generated from a seed, so runs on different commits see
+the same inputs.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+# degrees of latitude and longitude travelled per second, about 15 m/s
+DEGREES_PER_SECOND = 1e-4
+
+# the preprocessing in imu_processing takes the first 4 s as the stationary baseline
+STATIONARY_SECONDS = 4
+
+
+def write_video(
+    path: str,
+    seconds: float = 60,
+    fps: float = 30,
+    width: int = 1920,
+    height: int = 1080,
+    seed: int = 0
+) -> str:
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    background = (rng.random((height, width, 3)) * 60).astype(np.uint8)
+    # a new "defect" every two seconds, each on screen for about three,
+    # crossing the lower third of the frame where the road zone is
+    top, bottom = int(height * 2 / 3), int(height * 7 / 9)
+    for k in range(int(seconds * fps)):
+        frame = background.copy()
+        for start in range(0, k + 1, int(2 * fps)):
+            if k - start < 3 * fps:
+                x = int(width * 0.05 + (k - start) * width * 0.85 / (3 * fps))
+                cv2.rectangle(frame, (x, top), (x + width // 14, bottom), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def gpx_track(seconds: float = 60, rate: float = 1, start_time: datetime = START_TIME) -> str:
+    # a fix every 1 / rate seconds, with a spare second at the end
+    points = []
+    for k in range(int((seconds + 1) * rate) + 1):
+        t = k / rate
+        points.append(
+            f'<trkpt lat="{1.35 + t * DEGREES_PER_SECOND:.7f}" lon="{103.98 + t * DEGREES_PER_SECOND:.7f}">'
+            f'<ele>{15 + np.sin(t / 30):.2f}</ele>'
+            f'<time>{(start_time + timedelta(seconds=t)).isoformat()}Z</time></trkpt>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<gpx version="1.1" creator="synthetic" xmlns="http://www.topografix.com/GPX/1/1">'
+        f'<trk><trkseg>{"".join(points)}</trkseg></trk></gpx>'
+    )
+
+
+def imu_signal(seconds: float = 60, rate: float = 100, seed: int = 0) -> dict[str, np.ndarray]:
+    """Seconds since the start plus accelerometer (m/s²) and gyroscope
+    (rad/s) channels: road noise, a bump every five seconds and a turn
+    every thirty. The car stands still for the first STATIONARY_SECONDS."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    moving = t >= STATIONARY_SECONDS
+    noise = np.where(moving, 1.0, 0.05)
+
+    accel_z = 9.81 + rng.normal(0, 1, n) * noise
+    # half-sine bumps, 0.2 s long
+    phase = (t - STATIONARY_SECONDS) % 5
+    bump = moving & (phase < 0.2)
+    accel_z[bump] += 8 * np.sin(np.pi * phase[bump] / 0.2)
+
+    gyro_z = rng.normal(0, 0.01, n)
+    turning = moving & ((t % 30) > 25)
+    gyro_z[turning] += 0.3
+
+    return {
+        't_s': t,
+        'accel_x': rng.normal(0, 1, n) * noise,
+        'accel_y': rng.normal(0, 1, n) * noise,
+        'accel_z': accel_z,
+        'gyro_x': rng.normal(0, 0.01, n),
+        'gyro_y': rng.normal(0, 0.01, n),
+        'gyro_z': gyro_z,
+    }
+
+
+def imu_csv(seconds: float = 60, rate: float = 100, start_time: datetime = START_TIME, seed: int = 0) -> str:
+    # the CSV the pipeline's /process takes
+    signal = imu_signal(seconds, rate, seed)
+    channels = ('accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z')
+    rows = ['timestamp,' + ','.join(channels)]
+    columns = [signal[name] for name in channels]
+    for i, t in enumerate(signal['t_s']):
+        stamp = (start_time + timedelta(seconds=float(t))).isoformat()
+        rows.append(f'{stamp}Z,' + ','.join(f'{column[i]:.4f}' for column in columns))
+    return '\n'.join(rows)
+
+
+def imu_sensor_logs(
+    directory: str,
+    seconds: float = 60,
+    rate: float = 100,
+    start_time: datetime = START_TIME,
+    seed: int = 0
+) -> tuple[str, str]:
+    """The raw accelerometer and gyroscope exports imu_processing starts
+    from: tab separated, Unix milliseconds. Returns their paths."""
+    signal = imu_signal(seconds, rate, seed)
+    start_ms = int(start_time.timestamp() * 1000)
+    stamps = start_ms + np.round(signal['t_s'] * 1000).astype(np.int64)
+
+    paths = []
+    for name, unit, prefix in (('accel', 'm/s²', 'accel'), ('gyro', 'rad/s', 'gyro')):
+        path = os.path.join(directory, f'{name}.txt')
+        columns = [signal[f'{prefix}_{axis}'] for axis in 'xyz']
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\t'.join(['TStamp Asia/Singapore'] + [f'{axis.upper()} [{unit}]' for axis in 'xyz']) + '\n')
+            for i, stamp in enumerate(stamps):
+                f.write(f'{stamp}\t' + '\t'.join(f'{column[i]:.5f}' for column in columns) + '\n')
+        paths.append(path)
+    return paths[0], paths[1]
+
+
+def synthetic_drive(
+    directory: str,
+    seconds: float = 60,
+    fps: float = 30,
+    width: int = 1920,
+    height: int = 1080,
+    gps_rate: float = 1,
+    imu_rate: float = 100
+) -> dict:
+    # video_path, gpx_content and imu_content, as process_video takes them
+    return {
+        'video_path': write_video(os.path.join(directory, 'drive.mp4'), seconds, fps, width, height),
+        'gpx_content': gpx_track(seconds, gps_rate),
+        'imu_content': imu_csv(seconds, imu_rate),
+    }
+
+
+class StubDetector:
+    """Stands in for the YOLO model so the frame loop runs without weights:
+    bright boxes such as the ones write_video draws become potholes."""
+
+    names = {0: 'pothole', 1: 'crack'}
+    backend = 'stub'
+
+    def __init__(self, min_area: int = 500) -> None:
+        self.min_area = min_area
+        self.inference_calls = 0
+
+    def _detect(self, frame: np.ndarray, conf: float) -> Results:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        boxes = []
+        for x, y, w, h, area in stats[1:count]:
+            # varies with position, so tracks see changing scores
+            score = 0.5 + 0.4 * (x % 97) / 97
+            if area >= self.min_area and score > conf:
+                boxes.append([x, y, x + w, y + h, score, 0])
+        data = torch.tensor(boxes, dtype=torch.float32).reshape(-1, 6)
+        return Results(frame, path='', names=self.names, boxes=data)
+
+    def predict(self, frames, conf: Optional[float] = None, **kwargs) -> list[Results]:
+        self.inference_calls += 1
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        return [self._detect(frame, conf or 0.0) for frame in frames]
@@ -0,0 +1,503 @@
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import IO, Optional, Union
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from defect_processor import (
+    TRACK_LOST_BUFFER,
+    DefectTracks,
+    detection_meta,
+    gate_stats,
+    load_vehicle_zones,
+    plan_sampling,
+    recording_stats,
+    resolve_start_time,
+    roi_stats,
+    track_batches,
+    zone_roi
+)
+from utils.detection_cache import DETECTION_FLOOR, DetectionRecorder
+from utils.frame_gate import DEFAULT_GATE_THRESHOLD, FrameGate
+from utils.frame_sampler import FrameSampler
+from utils.gpx_parser import parse_gpx_track
+from utils.adaptive_sampling import MIN_SAMPLE_FPS, SAMPLE_DISTANCE_M
+from utils.imu_analyzer import calculate_iri, parse_imu_series
+from utils.metrics import StageTimer
+from utils.model_registry import get_model
+
+logger = logging.getLogger(__name__)
+
+STITCH_IOU = 0.5
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    # kept between videos so each chunk process loads its model only once;
+    # the process running the job takes a chunk itself, so this holds the others
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def plan_chunks(total_samples: int, chunks: int) -> list[tuple[int, int]]:
+    # contiguous [start, end) ranges of sample indices, near-equal in length
+    bounds = np.linspace(0, total_samples, max(1, chunks) + 1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def process_chunk(
+    video_path: str,
+    gps_track,
+    imu_data,
+    start_time: datetime,
+    start_sample: int,
+    end_sample: Optional[int],
+    warmup: int,
+    params: dict
+) -> dict:
+    """
+    Tracks one range of samples and returns the raw records of the tracks
+    first seen in it.
+
+    The tracker starts `warmup` samples early so tracks already on screen at
+    the boundary are known (and left to the previous chunk). After the range
+    ends it keeps going until its own tracks have all been finalized. The
+    last chunk (end_sample None) reads to the end of the file, whatever the
+    container's frame count said.
+    """
+    timer = StageTimer()
+    with timer.stage('model_load'):
+        model = get_model(params['weights_path'], params['device'], params['backend'])
+
+    video_info = sv.VideoInfo.from_video_path(video_path)
+    cap = cv2.VideoCapture(video_path)
+    sampler = FrameSampler(
+        cap,
+        video_info.fps,
+        params['target_fps'],
+        start_sample=max(0, start_sample - warmup),
+        schedule=params['schedule']
+    )
+    first_frame = sampler.frame_for_sample(start_sample)
+    last_frame = sampler.frame_for_sample(end_sample - 1) if end_sample is not None else None
+
+    tracks = DefectTracks(
+        params['segment_id'],
+        params['vehicle_id'],
+        video_info.fps,
+        start_time,
+        video_info.width,
+        video_info.height,
+        gps_track,
+        imu_data,
+        iou_threshold=params['iou_threshold'],
+        save_images=params['save_images'],
+        image_crop_margin=params['image_crop_margin'],
+        image_max_size=params['image_max_size'],
+        image_quality=params['image_quality'],
+        image_format=params['image_format'],
+        finalize_after=params['finalize_after'],
+        export_records=True,
+        zones=params['zones'],
+        confidence_threshold=params['confidence_threshold'],
+        timer=timer
+    )
+    tracks.accept_from = first_frame
+    tracks.accept_until = last_frame + 1 if last_frame is not None else None
+
+    gate = None
+    if params['gate_threshold'] is not None:
+        gate = FrameGate(zone_roi(params['zones'], video_info.width, video_info.height), params['gate_threshold'])
+
+    recorder = DetectionRecorder({}) if params['record_detections'] else None
+    model_confidence = params['confidence_threshold']
+    if recorder is not None:
+        model_confidence = min(model_confidence, DETECTION_FLOOR)
+
+    own_samples = 0
+
+    def stop_after(frame_number: int) -> bool:
+        nonlocal own_samples
+        if frame_number >= first_frame and (last_frame is None or frame_number <= last_frame):
+            own_samples += 1
+        return last_frame is not None and frame_number >= last_frame and tracks.open_count == 0
+
+    records = []
+    batches = track_batches(
+        model,
+        sampler,
+        tracks,
+        imu_data,
+        model_confidence,
+        params['batch_size'],
+        params['pipelined'],
+        params['queue_size'],
+        stop_after,
+        roi=params['roi'],
+        gate=gate,
+        recorder=recorder
+    )
+    try:
+        for ended, _ in batches:
+            records.extend(record for _, record in ended)
+    finally:
+        # stops the decode thread before the capture it reads goes away
+        batches.close()
+        cap.release()
+    records.extend(record for _, record in tracks.finish())
+
+    return {
+        'records': records,
+        'samples': own_samples,
+        # the chunk's own range only, warm-up and tail belong to its neighbours
+        'detections': recorder.arrays(first_frame, tracks.accept_until) if recorder is not None else None,
+        'stats': {**sampler.stats(), **tracks.stats(), **gate_stats(gate), **timer.stats()},
+    }
+
+
+def _iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _distance_m(a: Optional[dict], b: Optional[dict]) -> float:
+    if a is None or b is None:
+        return math.inf
+    # equirectangular is plenty at these distances
+    lat = math.radians((a['lat'] + b['lat']) / 2)
+    dx = math.radians(b['lng'] - a['lng']) * math.cos(lat)
+    dy = math.radians(b['lat'] - a['lat'])
+    return 6371000.0 * math.hypot(dx, dy)
+
+
+def _match_score(
+    left: dict,
+    right: dict,
+    gps_track,
+    iou_threshold: float,
+    max_distance_m: Optional[float],
+    max_gap_frames: int
+) -> float:
+    # best IoU on frames both tracks were seen in; without shared frames the
+    # tracks must line up end-to-start in time, position and on screen
+    boxes = dict(left['sightings'])
+    shared = [_iou(boxes[frame], box) for frame, box in right['sightings'] if frame in boxes]
+    if shared:
+        best = max(shared)
+        return best if best >= iou_threshold and right['type'] == left['type'] else 0.0
+    if max_distance_m is None:
+        return 0.0
+
+    gap = right['first_frame'] - left['last_frame']
+    if right['type'] != left['type'] or not 0 < gap <= max_gap_frames:
+        return 0.0
+    travelled = _distance_m(gps_track.at_time(left['last_time']), gps_track.at_time(right['first_time']))
+    if travelled > max_distance_m:
+        return 0.0
+    overlap = _iou(left['sightings'][-1][1], right['sightings'][0][1])
+    return overlap if overlap >= iou_threshold / 2 else 0.0
+
+
+def _merge(left: dict, right: dict) -> None:
+    # the earlier track keeps its identity; the best frame wins the image
+    if right['max_confidence'] > left['max_confidence']:
+        left['max_confidence'] = right['max_confidence']
+        left['bbox'] = right['bbox']
+        left['jpeg'] = right['jpeg']
+    if right['last_frame'] > left['last_frame']:
+        left['last_frame'] = right['last_frame']
+        left['last_time'] = right['last_time']
+    seen = {frame for frame, _ in left['sightings']}
+    left['sightings'] = sorted(
+        left['sightings'] + [s for s in right['sightings'] if s[0] not in seen],
+        key=lambda s: s[0]
+    )
+
+
+def stitch_tracks(
+    chunk_records: list[list[dict]],
+    gps_track,
+    iou_threshold: float = STITCH_IOU,
+    max_distance_m: Optional[float] = None,
+    max_gap_frames: int = 0
+) -> tuple[list[dict], int]:
+    """
+    Joins records of the same physical track reported by neighbouring chunks.
+
+    A chunk keeps decoding until its own tracks are finalized, so a track it
+    shares with the next chunk has frames seen by both; those are matched on
+    box IoU. With max_distance_m set, tracks that end and restart across a
+    boundary without a shared frame are joined too, when the vehicle moved
+    less than that in between and the boxes line up. The tracker itself
+    drops and re-creates ids in the same way, so this is off by default.
+
+    Returns the surviving records in first-seen order and how many were
+    merged away.
+    """
+    stitched: list[dict] = []
+    merged = 0
+    for records in chunk_records:
+        additions = []
+        for record in records:
+            best, best_score = None, 0.0
+            for candidate in stitched:
+                if candidate['last_frame'] + max_gap_frames < record['first_frame']:
+                    continue
+                score = _match_score(candidate, record, gps_track, iou_threshold, max_distance_m, max_gap_frames)
+                if score > best_score:
+                    best, best_score = candidate, score
+            if best is None:
+                additions.append(record)
+            else:
+                _merge(best, record)
+                merged += 1
+        stitched.extend(additions)
+
+    stitched.sort(key=lambda r: r['first_frame'])
+    return stitched, merged
+
+
+def iter_process_video_chunked(
+    video_path: str,
+    gpx_content: Union[str, IO],
+    imu_content: Union[str, IO],
+    segment_id: int,
+    vehicle_id: int = 1,
+    workers: int = 2,
+    chunks: Optional[int] = None,
+    weights_path: str = 'yolov8s.pt',
+    device: Optional[str] = None,
+    confidence_threshold: float = 0.3,
+    iou_threshold: float = 0.7,
+    target_fps: int = 10,
+    save_images: bool = True,
+    image_crop_margin: Optional[float] = None,
+    image_max_size: Optional[int] = None,
+    image_quality: int = 85,
+    image_format: str = 'url',
+    batch_size: int = 1,
+    pipelined: bool = True,
+    queue_size: int = 4,
+    finalize_after: Optional[int] = TRACK_LOST_BUFFER,
+    backend: Optional[str] = None,
+    roi: bool = False,
+    zones: Optional[list[np.ndarray]] = None,
+    sampling: str = 'fixed',
+    sample_distance_m: float = SAMPLE_DISTANCE_M,
+    min_fps: float = MIN_SAMPLE_FPS,
+    frame_gate: bool = False,
+    gate_threshold: float = DEFAULT_GATE_THRESHOLD,
+    detections_path: Optional[str] = None,
+    warmup: int = TRACK_LOST_BUFFER,
+    stitch_iou: float = STITCH_IOU,
+    stitch_distance_m: Optional[float] = None
+) -> Iterator[dict]:
+    """
+    Same events as iter_process_video, with the video split into `chunks`
+    sample ranges (one per worker by default) processed in parallel.
+    Defects are only known once every chunk is done and tracks have been
+    stitched across the boundaries.
+    """
+    started = time.perf_counter()
+    # summed over the chunks, which run side by side
+    timer = StageTimer()
+    with timer.stage('gpx_parse'):
+        gps_track = parse_gpx_track(gpx_content)
+    with timer.stage('imu_parse'):
+        imu_data = parse_imu_series(imu_content)
+
+    video_info = sv.VideoInfo.from_video_path(video_path)
+    original_fps = video_info.fps
+    total_frames = video_info.total_frames
+    if zones is None:
+        zones = load_vehicle_zones(vehicle_id)
+    inference_roi = zone_roi(zones, video_info.width, video_info.height) if roi else None
+
+    # chunks have to finalize their tracks to know when to stop
+    if finalize_after is None:
+        finalize_after = TRACK_LOST_BUFFER
+
+    video_start_time = resolve_start_time(gps_track, imu_data)
+    with timer.stage('sampling_plan'):
+        schedule, sampling_stats = plan_sampling(
+            sampling, gps_track, video_start_time, total_frames, original_fps, target_fps, sample_distance_m, min_fps
+        )
+    grid = FrameSampler(None, original_fps, target_fps, schedule=schedule)
+    total_samples = grid.expected_samples(total_frames)
+
+    params = {
+        'segment_id': segment_id,
+        'vehicle_id': vehicle_id,
+        'weights_path': weights_path,
+        'device': device,
+        'backend': backend,
+        'confidence_threshold': confidence_threshold,
+        'iou_threshold': iou_threshold,
+        'target_fps': target_fps,
+        'save_images': save_images,
+        'image_crop_margin': image_crop_margin,
+        'image_max_size': image_max_size,
+        'image_quality': image_quality,
+        'image_format': image_format,
+        'batch_size': batch_size,
+        'pipelined': pipelined,
+        'queue_size': queue_size,
+        'finalize_after': finalize_after,
+        'zones': zones,
+        'roi': inference_roi,
+        'schedule': schedule,
+        'gate_threshold': gate_threshold if frame_gate else None,
+        'record_detections': bool(detections_path),
+    }
+
+    ranges = plan_chunks(total_samples, chunks or workers)
+    # the frame count in the container can be short, the last chunk reads to EOF
+    ends = [end for _, end in ranges[:-1]] + [None]
+    pool = _get_pool(workers - 1) if workers > 1 and len(ranges) > 1 else None
+    futures = {
+        pool.submit(process_chunk, video_path, gps_track, imu_data, video_start_time, start, end, warmup, params): i
+        for i, ((start, _), end) in enumerate(zip(ranges, ends)) if i > 0
+    } if pool is not None else {}
+
+    # the first chunk runs here, on the model this job worker already has warm
+    local = [i for i in range(len(ranges)) if pool is None or i == 0]
+
+    def completed() -> Iterator[tuple[int, dict]]:
+        for i in local:
+            yield i, process_chunk(
+                video_path, gps_track, imu_data, video_start_time, ranges[i][0], ends[i], warmup, params
+            )
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    results: list[Optional[dict]] = [None] * len(ranges)
+    processed_count = 0
+    for index, result in completed():
+        results[index] = result
+        timer.merge(result['stats']['stage_seconds'])
+        processed_count += result['samples']
+        yield {
+            'event': 'progress',
+            'frames_processed': processed_count,
+            'frames_total': max(total_samples, processed_count)
+        }
+
+    # a track lost for up to finalize_after samples can still be the same one
+    max_gap_frames = FrameSampler(None, original_fps, target_fps).frame_for_sample(finalize_after + 1)
+    with timer.stage('stitching'):
+        records, merged = stitch_tracks(
+            [r['records'] for r in results],
+            gps_track,
+            stitch_iou,
+            stitch_distance_m,
+            max_gap_frames
+        )
+
+    if detections_path:
+        recorder = DetectionRecorder(detection_meta(
+            video_info, target_fps, sampling, inference_roi, frame_gate, weights_path, backend
+        ))
+        with timer.stage('detections_save'):
+            for result in results:
+                recorder.extend(result['detections'])
+            recorder.save(detections_path)
+
+    builder = DefectTracks(
+        segment_id,
+        vehicle_id,
+        original_fps,
+        video_start_time,
+        video_info.width,
+        video_info.height,
+        gps_track,
+        imu_data,
+        image_format=image_format,
+        zones=zones
+    )
+    for index, record in enumerate(records):
+        # only the images of the records that survived stitching are stored
+        with timer.stage('image_encode'):
+            image_fields = builder.image_fields(record['jpeg'])
+        with timer.stage('correlation'):
+            defect = builder.build_defect(record, image_fields)
+        yield {'event': 'defect', 'track_index': index, 'defect': defect}
+
+    def total(key: str) -> int:
+        return sum(r['stats'][key] for r in results)
+
+    gate_info = {'frame_gate': frame_gate}
+    if frame_gate:
+        # each chunk gates on its own, warm-up and tail frames included
+        inferred, reused = total('inferred_frames'), total('reused_frames')
+        gate_info.update({
+            'gate_threshold': gate_threshold,
+            'inferred_frames': inferred,
+            'reused_frames': reused,
+            'skip_rate': round(reused / (inferred + reused), 3) if inferred + reused else 0.0,
+        })
+
+    with timer.stage('iri'):
+        iri_value = calculate_iri(imu_data)
+
+    yield {
+        'event': 'summary',
+        'iri_measurement': {
+            'segment_id': segment_id,
+            'iri_value': iri_value,
+            'vehicle_id': vehicle_id,
+            'measured_at': datetime.now().isoformat()
+        },
+        'coverage_log': {
+            'segment_id': segment_id,
+            'vehicle_id': vehicle_id,
+            'covered_at': datetime.now().isoformat(),
+            'sweep_frequency': 1
+        },
+        'processing_info': {
+            'total_frames': total_frames,
+            'processed_frames': processed_count,
+            'original_fps': original_fps,
+            'target_fps': target_fps,
+            'batch_size': batch_size,
+            'pipelined': pipelined,
+            **roi_stats(inference_roi, video_info.width, video_info.height),
+            **sampling_stats,
+            **gate_info,
+            **recording_stats(detections_path),
+            'decoded_frames': total('decoded_frames'),
+            'skipped_frames': total('skipped_frames'),
+            'seeks': total('seeks'),
+            'finalize_after': finalize_after,
+            'peak_open_tracks': max(r['stats']['peak_open_tracks'] for r in results) if results else 0,
+            'image_encodes': total('image_encodes'),
+            'image_bytes': total('image_bytes'),
+            'chunk_workers': workers,
+            'chunks': len(ranges),
+            # decoded for warm-up and tails on top of each chunk's own range
+            'overlap_frames': total('decoded_frames') - processed_count,
+            'stitched_tracks': merged,
+            **timer.stats(),
+            'wall_seconds': round(time.perf_counter() - started, 4),
+            'detections_count': len(records)
+        }
+    }
@@ -1,16 +1,28 @@
 import cv2
+import logging
 import numpy as np
 import os
 import tempfile
+import time
 import base64
 from datetime import datetime, timedelta
-from typing import Optional
-from ultralytics import YOLO
+from collections.abc import Iterator
+from typing import IO, Callable, Optional, Union
 import supervision as sv
 
-from utils.gpx_parser import parse_gpx, get_gps_at_frame
-from utils.imu_analyzer import parse_imu_csv, calculate_iri, calculate_severity_weight, get_imu_at_frame
+from utils.adaptive_sampling import MIN_SAMPLE_FPS, SAMPLE_DISTANCE_M, SAMPLING_MODES, distance_schedule
+from utils.gpx_parser import parse_gpx_track
+from utils.imu_analyzer import parse_imu_series, calculate_iri, calculate_severity_weight, get_imu_at_frames
+from utils.model_registry import get_model
+from utils.frame_sampler import FrameSampler
+from utils.frame_gate import DEFAULT_GATE_THRESHOLD, FrameGate
+from utils.detection_cache import DETECTION_FLOOR, DetectionRecorder
+from utils.general import chunk_worker_budget, iter_batches, load_zones_config
+from utils.image_store import image_store
+from utils.metrics import StageTimer, timed
+from utils.stages import BackgroundIterator
 
+logger = logging.getLogger(__name__)
 
 DEFECT_CLASSES = {
     0: 'pothole',
@@ -26,20 +38,32 @@ SEVERITY_THRESHOLDS = {
     'low': 0.0
 }
 
+# frames a lost track is kept by ByteTrack; after that its id never comes back
+TRACK_LOST_BUFFER = 30
+
+# 'url' stores evidence images on disk and returns a key, 'base64' inlines them
+IMAGE_FORMATS = ('url', 'base64')
+
 DEFAULT_ZONE_POLYGON = np.array([[1, 928], [993, 880], [1919, 915], [1917, 662], [1, 644]])
 
+# <vehicle_id>.json in here holds the road zone polygons for that vehicle's camera mount
+ZONES_DIR = os.environ.get('ZONES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zones'))
+
+# pixels kept around the zones' bounding box when inference is cropped to it
+ROI_MARGIN = int(os.environ.get('ROI_MARGIN', 32))
+
 
 
-def determine_severity(confidence: float, imu_weight: float) -> str:
+def determine_severity(confidence: float, imu_weight: float, thresholds: dict = SEVERITY_THRESHOLDS) -> str:
     
    
     score = confidence * imu_weight
 
-    if score >= SEVERITY_THRESHOLDS['critical']:
+    if score >= thresholds['critical']:
         return 'critical'
-    elif score >= SEVERITY_THRESHOLDS['high']:
+    elif score >= thresholds['high']:
         return 'high'
-    elif score >= SEVERITY_THRESHOLDS['moderate']:
+    elif score >= thresholds['moderate']:
         return 'moderate'
     else:
         return 'low'
@@ -61,100 +85,260 @@ def estimate_defect_size(bbox: np.ndarray, frame_width: int, frame_height: int)
     return round(size_cm, 2)
 
 
-def frame_to_base64(frame: np.ndarray) -> str:
-   
-    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-    return base64.b64encode(buffer).decode('utf-8')
+def encode_jpeg(frame: np.ndarray, quality: int = 85) -> bytes:
 
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
 
-def process_video(
-    video_path: str,
-    gpx_content: str,
-    imu_content: str,
-    segment_id: int,
-    vehicle_id: int = 1,
-    weights_path: str = 'yolov8s.pt',
-    device: str = 'cpu',
-    confidence_threshold: float = 0.3,
-    iou_threshold: float = 0.7,
-    target_fps: int = 10,
-    save_images: bool = True
-) -> dict:
-   
-    #GPS and IMU data
-    gps_coordinates = parse_gpx(gpx_content)
-    imu_data = parse_imu_csv(imu_content)
-
-    model = YOLO(weights_path)
-
-    video_info = sv.VideoInfo.from_video_path(video_path)
-    original_fps = video_info.fps
-    frame_width = video_info.width
-    frame_height = video_info.height
-    total_frames = video_info.total_frames
 
-    # TODO: REMOVE AFTER
-    # annotated_video_path = "annotated_output.mp4"
-    # writer = cv2.VideoWriter(
-    #     annotated_video_path,
-    #     cv2.VideoWriter_fourcc(*"mp4v"),
-    #     target_fps,
-    #     (frame_width, frame_height)
-    # )
-
-    #frame skip 
-    frame_skip = max(1, int(original_fps / target_fps))
-
-    # tracker
-    tracker = sv.ByteTrack(minimum_matching_threshold=0.5)
-
-    # zone
-    zone = sv.PolygonZone(
-        polygon=DEFAULT_ZONE_POLYGON,
-        triggering_anchors=(sv.Position.CENTER,),
+def frame_to_base64(frame: np.ndarray, quality: int = 85) -> str:
+   
+    return base64.b64encode(encode_jpeg(frame, quality)).decode('utf-8')
+
+
+def draw_detection(frame: np.ndarray, box: tuple) -> None:
+    x1, y1, x2, y2, label = box
+    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    cv2.putText(
+        frame,
+        label,
+        (x1, y1 - 10),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.5,
+        (0, 255, 0),
+        2
     )
 
-    # Track detections
-    detections_by_tracker = {}  # tracker_id -> detection info
-
-    cap = cv2.VideoCapture(video_path)
-    frame_number = 0
-    processed_count = 0
-
-    video_start_time = None
-    timed_gps = [c for c in gps_coordinates if c['timestamp'] is not None]
-    if timed_gps:
-        video_start_time = timed_gps[0]['timestamp']
-    else:
-        timed_imu = [d for d in imu_data if d['timestamp'] is not None]
-        if timed_imu:
-            video_start_time = timed_imu[0]['timestamp']
-        else:
-            video_start_time = datetime.now()
-
-    
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
 
-        annotated_frame = frame.copy()
-
-        # Skip frames
-        if frame_number % frame_skip != 0:
-            frame_number += 1
+def render_evidence(
+    frame: np.ndarray,
+    boxes: tuple,
+    bbox: np.ndarray,
+    crop_margin: Optional[float] = None,
+    max_size: Optional[int] = None
+) -> np.ndarray:
+    # boxes are replayed in detection order, so the image matches what was
+    # on the annotated frame when this detection was drawn
+    image = frame.copy()
+    for box in boxes:
+        draw_detection(image, box)
+
+    if crop_margin is not None:
+        x1, y1, x2, y2 = bbox
+        pad_x = (x2 - x1) * crop_margin
+        pad_y = (y2 - y1) * crop_margin
+        height, width = image.shape[:2]
+        left, top = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+        right, bottom = min(width, int(x2 + pad_x) + 1), min(height, int(y2 + pad_y) + 1)
+        if right > left and bottom > top:
+            image = image[top:bottom, left:right]
+
+    if max_size:
+        height, width = image.shape[:2]
+        scale = max_size / max(height, width)
+        if scale < 1:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    return image
+
+
+def load_vehicle_zones(vehicle_id: int, zones_dir: str = ZONES_DIR) -> list[np.ndarray]:
+    # vehicles without a zones file use the default polygon
+    path = os.path.join(zones_dir, f"{vehicle_id}.json")
+    if os.path.exists(path):
+        return load_zones_config(path)
+    return [DEFAULT_ZONE_POLYGON]
+
+
+def zone_roi(zones: list[np.ndarray], frame_width: int, frame_height: int, margin: int = ROI_MARGIN) -> tuple[int, int, int, int]:
+    # bounding box of all zones plus the margin, clipped to the frame
+    points = np.concatenate(zones)
+    x1 = max(0, int(points[:, 0].min()) - margin)
+    y1 = max(0, int(points[:, 1].min()) - margin)
+    x2 = min(frame_width, int(points[:, 0].max()) + margin + 1)
+    y2 = min(frame_height, int(points[:, 1].max()) + margin + 1)
+    return x1, y1, x2, y2
+
+
+def offset_results(results, frame: np.ndarray, dx: int, dy: int):
+    # detections made on a crop, moved back into full-frame coordinates
+    from ultralytics.engine.results import Results
+
+    data = results.boxes.data.clone()
+    data[:, [0, 2]] += dx
+    data[:, [1, 3]] += dy
+    return Results(frame, path=results.path, names=results.names, boxes=data)
+
+
+def detect(model, frames: list[np.ndarray], confidence_threshold: float, roi: Optional[tuple] = None) -> list:
+    if roi is None:
+        return model.predict(frames, conf=confidence_threshold)
+    x1, y1, x2, y2 = roi
+    results = model.predict([frame[y1:y2, x1:x2] for frame in frames], conf=confidence_threshold)
+    return [offset_results(r, frame, x1, y1) for r, frame in zip(results, frames)]
+
+
+def infer_batches(
+    model,
+    batches,
+    confidence_threshold: float,
+    roi: Optional[tuple] = None,
+    gate: Optional[FrameGate] = None,
+    timer: Optional[StageTimer] = None
+):
+    # frames the gate lets through go to the model; the others get the
+    # previous detections again, so the tracker still sees every frame
+    timer = timer or StageTimer()
+    previous = None
+    for batch in batches:
+        frames = [frame for _, frame in batch]
+        if gate is None:
+            with timer.stage('inference'):
+                batch_results = detect(model, frames, confidence_threshold, roi)
+            yield batch, batch_results
             continue
 
-        results = model(frame, verbose=False, device=device, conf=confidence_threshold)[0]
-        detections = sv.Detections.from_ultralytics(results)
-        detections = detections.with_nms(threshold=iou_threshold)
-        detections = tracker.update_with_detections(detections)
+        with timer.stage('frame_gate'):
+            infer = [gate.should_infer(frame) for frame in frames]
+        inferred = [frame for frame, keep in zip(frames, infer) if keep]
+        with timer.stage('inference'):
+            fresh = iter(detect(model, inferred, confidence_threshold, roi) if inferred else [])
+        batch_results = []
+        for frame, keep in zip(frames, infer):
+            if keep:
+                previous = next(fresh)
+                batch_results.append(previous)
+            else:
+                batch_results.append(offset_results(previous, frame, 0, 0))
+        yield batch, batch_results
+
+
+class DefectTracks:
+    """Track state for one video, turned into defect records as tracks end.
+
+    A track the tracker hasn't matched for `finalize_after` sampled frames
+    can no longer be revived, so it is finalized (severity, GPS, evidence
+    image) and its state, including the best frame, is dropped.
+    """
+
+    def __init__(
+        self,
+        segment_id: int,
+        vehicle_id: int,
+        fps: float,
+        start_time: datetime,
+        frame_width: int,
+        frame_height: int,
+        gps_track,
+        imu_data,
+        iou_threshold: float = 0.7,
+        save_images: bool = True,
+        image_crop_margin: Optional[float] = None,
+        image_max_size: Optional[int] = None,
+        image_quality: int = 85,
+        image_format: str = 'url',
+        finalize_after: Optional[int] = TRACK_LOST_BUFFER,
+        export_records: bool = False,
+        zones: Optional[list[np.ndarray]] = None,
+        confidence_threshold: Optional[float] = None,
+        severity_thresholds: Optional[dict] = None,
+        timer: Optional[StageTimer] = None
+    ) -> None:
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"image_format must be one of {IMAGE_FORMATS}, got {image_format!r}")
+
+        self.segment_id = segment_id
+        self.vehicle_id = vehicle_id
+        self.fps = fps
+        self.start_time = start_time
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.gps_track = gps_track
+        self.imu_data = imu_data
+        self.iou_threshold = iou_threshold
+        self.save_images = save_images
+        self.image_crop_margin = image_crop_margin
+        self.image_max_size = image_max_size
+        self.image_quality = image_quality
+        self.image_format = image_format
+        self.finalize_after = finalize_after
+        # detections at or below it are dropped before tracking, for model
+        # output that was produced at a lower floor (see DetectionRecorder)
+        self.confidence_threshold = confidence_threshold
+        self.severity_thresholds = severity_thresholds or SEVERITY_THRESHOLDS
+        self.timer = timer or StageTimer()
+        # finalized tracks come out as raw records (with every sighting)
+        # instead of defect dicts, for stitching chunks back together
+        self.export_records = export_records
+
+        # only tracks first seen in [accept_from, accept_until) are kept
+        self.accept_from = 0
+        self.accept_until: Optional[int] = None
+
+        # tracker
+        self.tracker = sv.ByteTrack(minimum_matching_threshold=0.5, lost_track_buffer=TRACK_LOST_BUFFER)
+
+        # zones, a detection counts when it is inside any of them
+        self.zones = [
+            sv.PolygonZone(polygon=polygon, triggering_anchors=(sv.Position.CENTER,))
+            for polygon in (zones if zones is not None else [DEFAULT_ZONE_POLYGON])
+        ]
+
+        # Track detections
+        self.detections_by_tracker = {}  # tracker_id -> detection info
+        self._last_matched = {}  # tracker_id -> sample index the tracker last matched it
+        self._finalized = set()  # finalized or ignored tracker ids
+        self._next_index = 0
+        self._samples = 0
+
+        self.image_encodes = 0
+        self.image_bytes = 0
+        self.peak_open_tracks = 0
+        self.finalized_count = 0
+
+    def update(
+        self,
+        frame_number: int,
+        frame: np.ndarray,
+        results,
+        imu_row: Optional[dict] = None,
+        timestamp: Optional[datetime] = None
+    ) -> list[tuple[int, dict]]:
+        # returns (track_index, defect) for tracks that ended before this frame.
+        # With a capture timestamp (live streams) GPS and IMU are looked up
+        # when the track is finalized, since sensor pushes can lag the video
+        live = timestamp is not None
+        with self.timer.stage('nms'):
+            # results are ultralytics Results, or sv.Detections when replayed
+            if isinstance(results, sv.Detections):
+                detections = results
+            else:
+                detections = sv.Detections.from_ultralytics(results)
+            if self.confidence_threshold is not None:
+                # the same strict comparison as the model's own conf filter
+                detections = detections[detections.confidence > self.confidence_threshold]
+            detections = detections.with_nms(threshold=self.iou_threshold)
+        with self.timer.stage('tracking'):
+            detections = self.tracker.update_with_detections(detections)
+
+        # tracks the tracker is still following, in the zone or not
+        for tracker_id in detections.tracker_id:
+            if tracker_id in self.detections_by_tracker:
+                self._last_matched[tracker_id] = self._samples
 
         # Filter road zone
-        detections = detections[zone.trigger(detections)]
+        with self.timer.stage('zone_filter'):
+            detections = detections[np.logical_or.reduce([zone.trigger(detections) for zone in self.zones])]
+
+        if live:
+            current_time = timestamp
+        else:
+            current_time = self.start_time + timedelta(seconds=frame_number / self.fps)
 
-        current_time = video_start_time + timedelta(seconds=frame_number / original_fps)
+        # boxes drawn on this frame so far; the frame itself is only
+        # annotated and encoded once per track, when the track is finalized
+        frame_boxes = []
 
         # Process detection
         for i in range(len(detections)):
@@ -165,25 +349,22 @@ def process_video(
 
             defect_type = DEFECT_CLASSES.get(class_id, 'pothole')
 
-           
             x1, y1, x2, y2 = map(int, bbox)
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(
-                annotated_frame,
-                f"{defect_type} {confidence:.2f}",
-                (x1, y1 - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                (0, 255, 0),
-                2
-            )
-
-            if tracker_id not in detections_by_tracker:
-                gps = get_gps_at_frame(gps_coordinates, frame_number, original_fps, video_start_time)
-
-                image_data = frame_to_base64(annotated_frame) if save_images else None
-
-                detections_by_tracker[tracker_id] = {
+            frame_boxes.append((x1, y1, x2, y2, f"{defect_type} {confidence:.2f}"))
+
+            if tracker_id in self._finalized:
+                continue
+
+            if tracker_id not in self.detections_by_tracker:
+                if frame_number < self.accept_from or (self.accept_until is not None and frame_number >= self.accept_until):
+                    self._finalized.add(tracker_id)
+                    continue
+
+                gps = None if live else self.gps_track.at_frame(frame_number, self.fps, self.start_time)
+
+                self.detections_by_tracker[tracker_id] = {
+                    'index': self._next_index,
+                    'live': live,
                     'type': defect_type,
                     'confidence': float(confidence),
                     'first_frame': frame_number,
@@ -192,75 +373,492 @@ def process_video(
                     'last_time': current_time,
                     'bbox': bbox,
                     'gps': gps,
-                    'image_data': image_data,
+                    'imu': imu_row,
+                    'best_frame': frame if self.save_images else None,
+                    'best_boxes': tuple(frame_boxes),
                     'max_confidence': float(confidence)
                 }
+                if self.export_records:
+                    self.detections_by_tracker[tracker_id]['sightings'] = []
+                self._last_matched[tracker_id] = self._samples
+                self._next_index += 1
             else:
-                detection = detections_by_tracker[tracker_id]
+                detection = self.detections_by_tracker[tracker_id]
                 detection['last_frame'] = frame_number
                 detection['last_time'] = current_time
 
                 if confidence > detection['max_confidence']:
                     detection['max_confidence'] = float(confidence)
                     detection['bbox'] = bbox
-                    detection['image_data'] = frame_to_base64(annotated_frame) if save_images else None
-
-        # write this frame regardless of detections
-        # writer.write(annotated_frame)
-
-        frame_number += 1
-        processed_count += 1
-
-    cap.release()
-    #TODO: remove after
-    # writer.release()
-
-    iri_value = calculate_iri(imu_data)
-
-    defects = []
-
-    for tracker_id, detection in detections_by_tracker.items():
+                    detection['best_frame'] = frame if self.save_images else None
+                    detection['best_boxes'] = tuple(frame_boxes)
+
+            if self.export_records:
+                self.detections_by_tracker[tracker_id]['sightings'].append((frame_number, tuple(map(float, bbox))))
+
+        self.peak_open_tracks = max(self.peak_open_tracks, len(self.detections_by_tracker))
+        self._samples += 1
+
+        if self.finalize_after is None:
+            return []
+        ended = [
+            tracker_id for tracker_id, last in self._last_matched.items()
+            if self._samples - 1 - last > self.finalize_after
+        ]
+        return [self._finalize(tracker_id) for tracker_id in ended]
+
+    @property
+    def open_count(self) -> int:
+        return len(self.detections_by_tracker)
+
+    def finish(self) -> list[tuple[int, dict]]:
+        # every remaining track, in the order they were first seen
+        return [self._finalize(tracker_id) for tracker_id in list(self.detections_by_tracker)]
+
+    def _finalize(self, tracker_id) -> tuple[int, dict]:
+        detection = self.detections_by_tracker.pop(tracker_id)
+        del self._last_matched[tracker_id]
+        self._finalized.add(tracker_id)
+        self.finalized_count += 1
+
+        if self.export_records:
+            # the image is stored once the records are stitched, so a
+            # record merged into another never leaves an orphan behind
+            with self.timer.stage('image_encode'):
+                jpeg = self._encode_jpeg(detection)
+            record = {k: v for k, v in detection.items() if k not in ('best_frame', 'best_boxes')}
+            return detection['index'], {**record, 'jpeg': jpeg}
+        with self.timer.stage('image_encode'):
+            image_fields = self.image_fields(self._encode_jpeg(detection))
+        with self.timer.stage('correlation'):
+            return detection['index'], self.build_defect(detection, image_fields)
+
+    def _encode_jpeg(self, detection: dict) -> Optional[bytes]:
+        if detection['best_frame'] is None:
+            return None
+        image = render_evidence(
+            detection['best_frame'],
+            detection['best_boxes'],
+            detection['bbox'],
+            self.image_crop_margin,
+            self.image_max_size
+        )
+        jpeg = encode_jpeg(image, self.image_quality)
+        self.image_encodes += 1
+        self.image_bytes += len(jpeg)
+        return jpeg
+
+    def image_fields(self, jpeg: Optional[bytes]) -> dict:
+        image_fields = {}
+        if jpeg is not None:
+            if self.image_format == 'base64':
+                image_fields['image_base64'] = base64.b64encode(jpeg).decode('utf-8')
+            else:
+                key = image_store.put(jpeg)
+                image_fields['image_key'] = key
+                image_fields['image_url'] = f"/images/{key}"
+        elif self.image_format == 'base64':
+            image_fields['image_base64'] = None
+        return image_fields
+
+    def build_defect(self, detection: dict, image_fields: dict) -> dict:
         imu_weight = calculate_severity_weight(
-            imu_data,
+            self.imu_data,
             detection['first_time'],
             detection['last_time']
         )
 
-        severity = determine_severity(detection['max_confidence'], imu_weight)
+        severity = determine_severity(detection['max_confidence'], imu_weight, self.severity_thresholds)
 
 
         size = estimate_defect_size(
             detection['bbox'],
-            frame_width,
-            frame_height
+            self.frame_width,
+            self.frame_height
         )
 
+        if detection['live']:
+            self._resolve_sensors(detection)
+
         # gPS coordinates
         gps = detection['gps']
         if gps is None:
             # Use first available GPS as fallback
-            if gps_coordinates:
-                gps = {'lat': gps_coordinates[0]['lat'], 'lng': gps_coordinates[0]['lng']}
-            else:
-                gps = {'lat': 0.0, 'lng': 0.0}
+            gps = self.gps_track.first() or {'lat': 0.0, 'lng': 0.0}
+
+        imu = detection['imu']
+        if imu is not None and imu['timestamp'] is not None:
+            imu = {**imu, 'timestamp': imu['timestamp'].isoformat()}
 
-        defects.append({
+        return {
             'type': detection['type'],
             'severity': severity,
             'status': 'for_checking',
             'priority': 'normal',
-            'segment_id': segment_id,
-            'vehicle_id': vehicle_id,
+            'segment_id': self.segment_id,
+            'vehicle_id': self.vehicle_id,
             'coordinates_lat': gps['lat'],
             'coordinates_lng': gps['lng'],
             'size': size,
             'detected_at': detection['first_time'].isoformat(),
-            'image_base64': detection['image_data']
-        })
+            'imu_reading': imu,
+            **image_fields
+        }
 
-    
-    response = {
-        'defects': defects,
+    def _resolve_sensors(self, detection: dict) -> None:
+        detection['gps'] = self.gps_track.at_time(detection['first_time'])
+        if len(self.imu_data.time_index):
+            row = self.imu_data.time_index.nearest([detection['first_time']])[0]
+            detection['imu'] = self.imu_data.row(int(row))
+
+    def stats(self) -> dict:
+        return {
+            'finalize_after': self.finalize_after,
+            'peak_open_tracks': self.peak_open_tracks,
+            'image_encodes': self.image_encodes,
+            'image_bytes': self.image_bytes,
+        }
+
+
+def resolve_start_time(gps_track, imu_data) -> datetime:
+
+    video_start_time = None
+    if gps_track.start_time is not None:
+        video_start_time = gps_track.start_time
+    else:
+        if imu_data.start_time is not None:
+            video_start_time = imu_data.start_time
+        else:
+            video_start_time = datetime.now()
+    return video_start_time
+
+
+def plan_sampling(
+    sampling: str,
+    gps_track,
+    start_time: Optional[datetime],
+    total_frames: int,
+    fps: float,
+    target_fps: float,
+    sample_distance_m: float = SAMPLE_DISTANCE_M,
+    min_fps: float = MIN_SAMPLE_FPS
+) -> tuple[Optional[np.ndarray], dict]:
+    # frame schedule for FrameSampler (None for the fixed-rate grid), and
+    # how it compares with sampling at target_fps
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"sampling must be one of {SAMPLING_MODES}, got {sampling!r}")
+    fixed = FrameSampler(None, fps, target_fps).expected_samples(total_frames)
+
+    if sampling == 'distance':
+        planned = distance_schedule(
+            gps_track, start_time, total_frames, fps, sample_distance_m, min_fps, max_fps=min(target_fps, fps)
+        )
+        if planned is not None:
+            schedule, stats = planned
+            return schedule, {
+                'sampling': 'distance',
+                **stats,
+                'fixed_rate_samples': fixed,
+                'frames_saved': fixed - len(schedule),
+            }
+        logger.warning("GPS track has no timestamps, sampling at a fixed %s fps instead", target_fps)
+
+    return None, {'sampling': 'fixed', 'fixed_rate_samples': fixed, 'frames_saved': 0}
+
+
+def detection_meta(video_info, target_fps, sampling, roi, frame_gate, weights_path, backend) -> dict:
+    # what a rescore needs to know about the pass that recorded the detections
+    return {
+        'floor': DETECTION_FLOOR,
+        'fps': video_info.fps,
+        'width': video_info.width,
+        'height': video_info.height,
+        'total_frames': video_info.total_frames,
+        'target_fps': target_fps,
+        'sampling': sampling,
+        'roi': list(roi) if roi is not None else None,
+        'frame_gate': frame_gate,
+        'weights': os.path.basename(weights_path),
+        'backend': backend,
+    }
+
+
+def recording_stats(detections_path: Optional[str]) -> dict:
+    # the detection store names its files by key
+    key = os.path.splitext(os.path.basename(detections_path))[0] if detections_path else None
+    return {'detections_key': key}
+
+
+def gate_stats(gate: Optional[FrameGate]) -> dict:
+    if gate is None:
+        return {'frame_gate': False}
+    return {'frame_gate': True, **gate.stats()}
+
+
+def roi_stats(roi: Optional[tuple], frame_width: int, frame_height: int) -> dict:
+    if roi is None:
+        return {'roi': None, 'roi_pixel_ratio': 1.0}
+    x1, y1, x2, y2 = roi
+    return {'roi': list(roi), 'roi_pixel_ratio': round((x2 - x1) * (y2 - y1) / (frame_width * frame_height), 3)}
+
+
+def track_batches(
+    model,
+    sampler: FrameSampler,
+    tracks: DefectTracks,
+    imu_data,
+    confidence_threshold: float,
+    batch_size: int = 1,
+    pipelined: bool = True,
+    queue_size: int = 4,
+    stop_after: Optional[Callable[[int], bool]] = None,
+    roi: Optional[tuple] = None,
+    gate: Optional[FrameGate] = None,
+    recorder: Optional[DetectionRecorder] = None,
+    timer: Optional[StageTimer] = None
+) -> Iterator[tuple[list[tuple[int, dict]], int]]:
+    # yields (tracks finalized, frames processed) per batch; stop_after is
+    # asked after every frame whether to stop there. With an roi
+    # (x1, y1, x2, y2) only that part of each frame goes through the model,
+    # with a gate only the frames that changed since the last inferred one.
+    # A recorder gets the model output of every frame before tracking.
+    # Decode and inference time go to `timer`, the tracks time their own stages
+
+    # one forward pass per batch, results are consumed in frame order so
+    # the tracker sees exactly the same sequence as single-frame inference
+    timer = timer or tracks.timer
+    batches = iter_batches(timed(sampler, timer, 'decode'), batch_size)
+    if pipelined:
+        # decode and inference run on their own threads; the bounded queues
+        # between them cap how many frames can be in flight at once
+        batches = BackgroundIterator(batches, queue_size, name='decode')
+    inferred = infer_batches(model, batches, confidence_threshold, roi, gate, timer)
+    if pipelined:
+        inferred = BackgroundIterator(inferred, queue_size, name='inference')
+
+    try:
+        for batch, batch_results in inferred:
+            # IMU reading for every frame of the batch in one lookup
+            batch_imu = None
+            if len(imu_data.time_index):
+                with timer.stage('imu_lookup'):
+                    batch_imu = get_imu_at_frames(imu_data, [n for n, _ in batch], tracks.fps, tracks.start_time)
+
+            ended = []
+            processed = 0
+            stop = False
+            for j, ((frame_number, frame), results) in enumerate(zip(batch, batch_results)):
+                imu_row = batch_imu.row(j) if batch_imu is not None else None
+                if recorder is not None:
+                    recorder.add(frame_number, results)
+                ended.extend(tracks.update(frame_number, frame, results, imu_row))
+                processed += 1
+                if stop_after is not None and stop_after(frame_number):
+                    stop = True
+                    break
+
+            yield ended, processed
+            if stop:
+                return
+    finally:
+        if pipelined:
+            inferred.close()
+            batches.close()
+
+
+def iter_process_video(
+    video_path: str,
+    gpx_content: Union[str, IO],
+    imu_content: Union[str, IO],
+    segment_id: int,
+    vehicle_id: int = 1,
+    weights_path: str = 'yolov8s.pt',
+    device: Optional[str] = None,
+    confidence_threshold: float = 0.3,
+    iou_threshold: float = 0.7,
+    target_fps: int = 10,
+    save_images: bool = True,
+    image_crop_margin: Optional[float] = None,
+    image_max_size: Optional[int] = None,
+    image_quality: int = 85,
+    image_format: str = 'url',
+    batch_size: int = 1,
+    pipelined: bool = True,
+    queue_size: int = 4,
+    finalize_after: Optional[int] = TRACK_LOST_BUFFER,
+    chunk_workers: int = 1,
+    backend: Optional[str] = None,
+    roi: bool = False,
+    zones: Optional[list[np.ndarray]] = None,
+    sampling: str = 'fixed',
+    sample_distance_m: float = SAMPLE_DISTANCE_M,
+    min_fps: float = MIN_SAMPLE_FPS,
+    frame_gate: bool = False,
+    gate_threshold: float = DEFAULT_GATE_THRESHOLD,
+    detections_path: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Yields 'defect' events as soon as each track is finalized, a 'progress'
+    event after every batch, and a closing 'summary' event with the IRI
+    measurement, coverage log and processing info.
+
+    With chunk_workers > 1 the video is split across that many processes
+    (see chunked_processor, and chunk_worker_budget for the cap); defects
+    then all arrive at the end.
+
+    Zones default to the vehicle's zones file (see load_vehicle_zones). With
+    roi set, frames are cropped to the zones' bounding box before inference.
+
+    sampling='distance' picks a frame every sample_distance_m of travel
+    (between min_fps and target_fps) from GPS speed and skips stationary
+    stretches; 'fixed' samples at target_fps.
+
+    With frame_gate set, a sampled frame whose zones differ from the last
+    inferred frame by less than gate_threshold (mean gray level) reuses that
+    frame's detections instead of running the model (see FrameGate).
+
+    With a detections_path, the model output of every sampled frame (down
+    to DETECTION_FLOOR) is saved there for rescoring (see rescore).
+    """
+    if zones is None:
+        zones = load_vehicle_zones(vehicle_id)
+
+    # nested in a job worker, so capped to the job's share of PIPELINE_PROCESS_BUDGET
+    chunk_workers = chunk_worker_budget(chunk_workers)
+    if chunk_workers > 1:
+        from chunked_processor import iter_process_video_chunked
+        yield from iter_process_video_chunked(
+            video_path,
+            gpx_content,
+            imu_content,
+            segment_id,
+            vehicle_id,
+            workers=chunk_workers,
+            weights_path=weights_path,
+            device=device,
+            confidence_threshold=confidence_threshold,
+            iou_threshold=iou_threshold,
+            target_fps=target_fps,
+            save_images=save_images,
+            image_crop_margin=image_crop_margin,
+            image_max_size=image_max_size,
+            image_quality=image_quality,
+            image_format=image_format,
+            batch_size=batch_size,
+            pipelined=pipelined,
+            queue_size=queue_size,
+            finalize_after=finalize_after,
+            backend=backend,
+            roi=roi,
+            zones=zones,
+            sampling=sampling,
+            sample_distance_m=sample_distance_m,
+            min_fps=min_fps,
+            frame_gate=frame_gate,
+            gate_threshold=gate_threshold,
+            detections_path=detections_path
+        )
+        return
+
+    started = time.perf_counter()
+    timer = StageTimer()
+
+    #GPS and IMU data
+    # sorted arrays for binary-search lookups, built once per video
+    with timer.stage('gpx_parse'):
+        gps_track = parse_gpx_track(gpx_content)
+    # columnar arrays instead of one dict per sample
+    with timer.stage('imu_parse'):
+        imu_data = parse_imu_series(imu_content)
+
+    # shared, already warmed model from the process-wide registry
+    with timer.stage('model_load'):
+        model = get_model(weights_path, device, backend)
+
+    video_info = sv.VideoInfo.from_video_path(video_path)
+    original_fps = video_info.fps
+    frame_width = video_info.width
+    frame_height = video_info.height
+    total_frames = video_info.total_frames
+    inference_roi = zone_roi(zones, frame_width, frame_height) if roi else None
+    gate = FrameGate(zone_roi(zones, frame_width, frame_height), gate_threshold) if frame_gate else None
+    recorder = None
+    if detections_path:
+        recorder = DetectionRecorder(detection_meta(
+            video_info, target_fps, sampling, inference_roi, frame_gate, weights_path, backend
+        ))
+
+    video_start_time = resolve_start_time(gps_track, imu_data)
+    with timer.stage('sampling_plan'):
+        schedule, sampling_stats = plan_sampling(
+            sampling, gps_track, video_start_time, total_frames, original_fps, target_fps, sample_distance_m, min_fps
+        )
+
+    cap = cv2.VideoCapture(video_path)
+    # only sampled frames are decoded, the rest are grabbed or seeked over
+    sampler = FrameSampler(cap, original_fps, target_fps, schedule=schedule)
+    expected_frames = sampler.expected_samples(total_frames)
+    processed_count = 0
+
+    tracks = DefectTracks(
+        segment_id,
+        vehicle_id,
+        original_fps,
+        video_start_time,
+        frame_width,
+        frame_height,
+        gps_track,
+        imu_data,
+        iou_threshold=iou_threshold,
+        save_images=save_images,
+        image_crop_margin=image_crop_margin,
+        image_max_size=image_max_size,
+        image_quality=image_quality,
+        image_format=image_format,
+        finalize_after=finalize_after,
+        zones=zones,
+        confidence_threshold=confidence_threshold,
+        timer=timer
+    )
+
+    # when recording, the model keeps everything above the floor and the
+    # tracks filter at confidence_threshold, which gives the same detections
+    model_confidence = min(confidence_threshold, DETECTION_FLOOR) if recorder is not None else confidence_threshold
+
+    batches = track_batches(
+        model, sampler, tracks, imu_data, model_confidence, batch_size, pipelined, queue_size,
+        roi=inference_roi,
+        gate=gate,
+        recorder=recorder
+    )
+    try:
+        for ended, processed in batches:
+            for index, defect in ended:
+                yield {'event': 'defect', 'track_index': index, 'defect': defect}
+
+            processed_count += processed
+            yield {
+                'event': 'progress',
+                'frames_processed': processed_count,
+                'frames_total': max(expected_frames, processed_count)
+            }
+    finally:
+        # stops the decode thread before the capture it reads goes away
+        batches.close()
+        cap.release()
+
+    for index, defect in tracks.finish():
+        yield {'event': 'defect', 'track_index': index, 'defect': defect}
+
+    if recorder is not None:
+        with timer.stage('detections_save'):
+            recorder.save(detections_path)
+
+    with timer.stage('iri'):
+        iri_value = calculate_iri(imu_data)
+
+    yield {
+        'event': 'summary',
         'iri_measurement': {
             'segment_id': segment_id,
             'iri_value': iri_value,
@@ -278,8 +876,109 @@ def process_video(
             'processed_frames': processed_count,
             'original_fps': original_fps,
             'target_fps': target_fps,
-            'detections_count': len(defects)
+            'batch_size': batch_size,
+            'pipelined': pipelined,
+            **roi_stats(inference_roi, frame_width, frame_height),
+            **sampling_stats,
+            **gate_stats(gate),
+            **recording_stats(detections_path),
+            **sampler.stats(),
+            **tracks.stats(),
+            **timer.stats(),
+            'wall_seconds': round(time.perf_counter() - started, 4),
+            'detections_count': tracks.finalized_count
         }
     }
 
-    return response
+
+def collect_events(
+    events: Iterator[dict],
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    defect_callback: Optional[Callable[[dict], None]] = None
+) -> dict:
+    # folds an event stream back into the single /process response
+    defects = []
+    summary = {}
+    for event in events:
+        kind = event['event']
+        if kind == 'defect':
+            defects.append((event['track_index'], event['defect']))
+            if defect_callback is not None:
+                defect_callback(event)
+        elif kind == 'progress':
+            if progress_callback is not None:
+                progress_callback(event['frames_processed'], event['frames_total'])
+        elif kind == 'summary':
+            summary = {key: value for key, value in event.items() if key != 'event'}
+
+    defects.sort(key=lambda item: item[0])
+    return {'defects': [defect for _, defect in defects], **summary}
+
+
+def process_video(
+    video_path: str,
+    gpx_content: Union[str, IO],
+    imu_content: Union[str, IO],
+    segment_id: int,
+    vehicle_id: int = 1,
+    weights_path: str = 'yolov8s.pt',
+    device: Optional[str] = None,
+    confidence_threshold: float = 0.3,
+    iou_threshold: float = 0.7,
+    target_fps: int = 10,
+    save_images: bool = True,
+    image_crop_margin: Optional[float] = None,
+    image_max_size: Optional[int] = None,
+    image_quality: int = 85,
+    image_format: str = 'url',
+    batch_size: int = 1,
+    pipelined: bool = True,
+    queue_size: int = 4,
+    finalize_after: Optional[int] = TRACK_LOST_BUFFER,
+    chunk_workers: int = 1,
+    backend: Optional[str] = None,
+    roi: bool = False,
+    zones: Optional[list[np.ndarray]] = None,
+    sampling: str = 'fixed',
+    sample_distance_m: float = SAMPLE_DISTANCE_M,
+    min_fps: float = MIN_SAMPLE_FPS,
+    frame_gate: bool = False,
+    gate_threshold: float = DEFAULT_GATE_THRESHOLD,
+    detections_path: Optional[str] = None,
+    *,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> dict:
+   
+    # same pipeline as iter_process_video, with defects in first-seen order
+    events = iter_process_video(
+        video_path,
+        gpx_content,
+        imu_content,
+        segment_id,
+        vehicle_id,
+        weights_path=weights_path,
+        device=device,
+        confidence_threshold=confidence_threshold,
+        iou_threshold=iou_threshold,
+        target_fps=target_fps,
+        save_images=save_images,
+        image_crop_margin=image_crop_margin,
+        image_max_size=image_max_size,
+        image_quality=image_quality,
+        image_format=image_format,
+        batch_size=batch_size,
+        pipelined=pipelined,
+        queue_size=queue_size,
+        finalize_after=finalize_after,
+        chunk_workers=chunk_workers,
+        backend=backend,
+        roi=roi,
+        zones=zones,
+        sampling=sampling,
+        sample_distance_m=sample_distance_m,
+        min_fps=min_fps,
+        frame_gate=frame_gate,
+        gate_threshold=gate_threshold,
+        detections_path=detections_path
+    )
+    return collect_events(events, progress_callback)
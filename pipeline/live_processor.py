@@ -0,0 +1,372 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Optional
+from urllib.parse import urlsplit
+
+from defect_processor import TRACK_LOST_BUFFER, DefectTracks, detect, load_vehicle_zones, zone_roi
+from utils.general import deep_clean, get_stream_frames_generator
+from utils.imu_analyzer import calculate_iri
+from utils.model_registry import get_model
+from utils.sensor_buffer import SensorBuffer
+
+logger = logging.getLogger(__name__)
+
+MAX_LIVE_SESSIONS = int(os.environ.get('LIVE_MAX_SESSIONS', 2))
+# finalized defects a session keeps for clients to fetch, oldest dropped first
+MAX_LIVE_DEFECTS = int(os.environ.get('LIVE_MAX_DEFECTS', 10000))
+# stopped or failed sessions are forgotten this long after they end
+DEFAULT_SESSION_TTL = float(os.environ.get('LIVE_SESSION_TTL_SECONDS', 3600))
+
+# URL schemes an API caller may open; local files and camera indices only
+# with LIVE_ALLOW_LOCAL_SOURCES=1, they are read by the server itself
+LIVE_SOURCE_SCHEMES = tuple(
+    scheme.strip().lower() for scheme in os.environ.get('LIVE_SOURCE_SCHEMES', 'rtsp,rtsps').split(',') if scheme.strip()
+)
+LIVE_ALLOW_LOCAL_SOURCES = bool(int(os.environ.get('LIVE_ALLOW_LOCAL_SOURCES', 0)))
+
+STARTING = 'starting'
+RUNNING = 'running'
+STOPPED = 'stopped'
+FAILED = 'failed'
+
+
+class TooManySessions(Exception):
+    pass
+
+
+class SourceNotAllowed(ValueError):
+    pass
+
+
+def check_source(source: str, schemes: tuple[str, ...] = LIVE_SOURCE_SCHEMES, allow_local: bool = LIVE_ALLOW_LOCAL_SOURCES) -> None:
+    scheme = urlsplit(source).scheme.lower()
+    # 'C:\\video.mp4' parses as scheme 'c'
+    if len(scheme) > 1:
+        if scheme not in schemes:
+            raise SourceNotAllowed(f"{scheme}:// sources are not allowed, use one of: {', '.join(schemes)}")
+        return
+    if not allow_local:
+        raise SourceNotAllowed("Local files and camera devices are not allowed as live sources")
+
+
+class LatestFrame:
+    """Single-slot hand-off between the capture and inference threads.
+
+    A new frame replaces one that hasn't been picked up yet, so a slow
+    consumer always gets the most recent frame instead of a growing backlog.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._item = None
+        self.captured = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame) -> None:
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = (self.captured, datetime.now(timezone.utc), frame)
+            self.captured += 1
+            self._cond.notify()
+
+    def get(self, timeout: float):
+        with self._cond:
+            if self._item is None and not self.closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class LiveSession:
+    """Runs detection and tracking on an RTSP (or looping file) source.
+
+    Frames are timestamped on capture and matched against GPS/IMU samples
+    pushed to the session's SensorBuffer. Defects are appended to
+    `self.defects` as their tracks are finalized; only the last max_defects
+    are kept, cursors from defects_since count every defect ever published.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        segment_id: int,
+        vehicle_id: int = 1,
+        weights_path: str = 'yolov8s.pt',
+        device: Optional[str] = None,
+        confidence_threshold: float = 0.3,
+        iou_threshold: float = 0.7,
+        target_fps: float = 10,
+        loop: bool = False,
+        realtime: bool = False,
+        image_format: str = 'url',
+        finalize_after: Optional[int] = TRACK_LOST_BUFFER,
+        backend: Optional[str] = None,
+        roi: bool = False,
+        max_defects: int = MAX_LIVE_DEFECTS
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.segment_id = segment_id
+        self.vehicle_id = vehicle_id
+        self.weights_path = weights_path
+        self.device = device
+        self.backend = backend
+        self.confidence_threshold = confidence_threshold
+        self.target_fps = target_fps
+        self.loop = loop
+        self.realtime = realtime
+        self.roi = roi
+        self.zones = load_vehicle_zones(vehicle_id)
+        # known once the first frame arrives
+        self.inference_roi: Optional[tuple] = None
+
+        self.sensors = SensorBuffer()
+        self.frames = LatestFrame()
+        self.defects: deque[dict] = deque(maxlen=max(1, max_defects))
+        self.defects_total = 0
+        self.status = STARTING
+        self.error: Optional[str] = None
+        self.started_at = datetime.now()
+        self.stopped_at: Optional[datetime] = None
+        self.summary: Optional[dict] = None
+
+        self.processed = 0
+        self.skipped = 0
+        self.latency_ms = 0.0
+        self.inference_ms = 0.0
+
+        # fps/start time are unused: every frame carries its capture time
+        self.tracks = DefectTracks(
+            segment_id,
+            vehicle_id,
+            target_fps,
+            self.started_at,
+            0,
+            0,
+            self.sensors.gps_track(),
+            self.sensors.imu_series(),
+            iou_threshold=iou_threshold,
+            image_format=image_format,
+            finalize_after=finalize_after,
+            zones=self.zones
+        )
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, name=f'live-read-{self.id[:8]}', daemon=True)
+        self._worker = threading.Thread(target=self._process, name=f'live-infer-{self.id[:8]}', daemon=True)
+
+    def start(self) -> None:
+        self._reader.start()
+        self._worker.start()
+
+    def _fail(self, error: BaseException) -> None:
+        logger.exception("Live session %s failed", self.id, exc_info=error)
+        self.error = str(error) or error.__class__.__name__
+        self.status = FAILED
+        if self.stopped_at is None:
+            self.stopped_at = datetime.now()
+        self._stop.set()
+
+    def _read(self) -> None:
+        try:
+            # a bare number is a camera index
+            source = int(self.source) if self.source.isdigit() else self.source
+            for frame in get_stream_frames_generator(source, loop=self.loop, realtime=self.realtime):
+                if self._stop.is_set():
+                    break
+                self.frames.put(frame)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self.frames.close()
+
+    def _process(self) -> None:
+        try:
+            model = get_model(self.weights_path, self.device, self.backend)
+            if self.status == STARTING:
+                self.status = RUNNING
+
+            min_interval = 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+            last_time = None
+
+            while not self._stop.is_set():
+                item = self.frames.get(timeout=0.5)
+                if item is None:
+                    if self.frames.closed:
+                        break
+                    continue
+                frame_number, captured_at, frame = item
+
+                # the source may run faster than the processing rate asked for
+                if last_time is not None and (captured_at - last_time).total_seconds() < min_interval:
+                    self.skipped += 1
+                    continue
+                last_time = captured_at
+
+                if self.roi and self.inference_roi is None:
+                    self.inference_roi = zone_roi(self.zones, frame.shape[1], frame.shape[0])
+
+                start = time.perf_counter()
+                results = detect(model, [frame], self.confidence_threshold, self.inference_roi)[0]
+                self.inference_ms = (time.perf_counter() - start) * 1000
+
+                self._update(frame_number, frame, results, captured_at)
+                self.processed += 1
+                self.latency_ms = (datetime.now(timezone.utc) - captured_at).total_seconds() * 1000
+
+            self._finish()
+        except Exception as e:
+            self._fail(e)
+
+    def _update(self, frame_number: int, frame, results, captured_at: datetime) -> None:
+        # latest pushed samples, rebuilt only when something new arrived
+        self.tracks.gps_track = self.sensors.gps_track()
+        self.tracks.imu_data = self.sensors.imu_series()
+        if not self.tracks.frame_width:
+            self.tracks.frame_height, self.tracks.frame_width = frame.shape[:2]
+
+        ended = self.tracks.update(frame_number, frame, results, timestamp=captured_at)
+        self._publish(ended)
+
+    def _publish(self, ended: list[tuple[int, dict]]) -> None:
+        if not ended:
+            return
+        with self._lock:
+            self.defects.extend(deep_clean(defect) for _, defect in ended)
+            self.defects_total += len(ended)
+
+    def _finish(self) -> None:
+        self.tracks.gps_track = self.sensors.gps_track()
+        self.tracks.imu_data = self.sensors.imu_series()
+        self._publish(self.tracks.finish())
+
+        self.summary = deep_clean({
+            'iri_measurement': {
+                'segment_id': self.segment_id,
+                'iri_value': calculate_iri(self.tracks.imu_data),
+                'vehicle_id': self.vehicle_id,
+                'measured_at': datetime.now().isoformat()
+            },
+            'coverage_log': {
+                'segment_id': self.segment_id,
+                'vehicle_id': self.vehicle_id,
+                'covered_at': datetime.now().isoformat(),
+                'sweep_frequency': 1
+            },
+            'processing_info': self.stats()
+        })
+        if self.status != FAILED:
+            self.status = STOPPED
+        if self.stopped_at is None:
+            self.stopped_at = datetime.now()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        self.frames.close()
+        self._reader.join(timeout=timeout)
+        self._worker.join(timeout=timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STOPPED, FAILED)
+
+    def defects_since(self, cursor: int) -> tuple[list[dict], int]:
+        # defects already dropped from the buffer are skipped
+        with self._lock:
+            dropped = self.defects_total - len(self.defects)
+            return list(islice(self.defects, max(cursor - dropped, 0), None)), self.defects_total
+
+    def stats(self) -> dict:
+        return {
+            'frames_captured': self.frames.captured,
+            'frames_processed': self.processed,
+            'frames_dropped': self.frames.dropped,
+            'frames_skipped': self.skipped,
+            'latency_ms': round(self.latency_ms, 1),
+            'inference_ms': round(self.inference_ms, 1),
+            'roi': list(self.inference_roi) if self.inference_roi else None,
+            **self.sensors.stats(),
+            **self.tracks.stats(),
+            'detections_count': self.tracks.finalized_count,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            'session_id': self.id,
+            'source': self.source,
+            'status': self.status,
+            'error': self.error,
+            'segment_id': self.segment_id,
+            'vehicle_id': self.vehicle_id,
+            'started_at': self.started_at.isoformat(),
+            'stopped_at': self.stopped_at.isoformat() if self.stopped_at else None,
+            'defects': self.defects_total,
+            'stats': self.stats(),
+        }
+
+
+class LiveManager:
+    """Live sessions running in this process, at most `max_sessions` at once."""
+
+    def __init__(self, max_sessions: int = MAX_LIVE_SESSIONS, session_ttl: float = DEFAULT_SESSION_TTL) -> None:
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self._sessions: dict[str, LiveSession] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.session_ttl
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if session.finished and session.stopped_at is not None and session.stopped_at.timestamp() < cutoff
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+    def start(self, **params) -> LiveSession:
+        check_source(params['source'])
+        with self._lock:
+            self._prune()
+            running = sum(1 for s in self._sessions.values() if not s.finished)
+            if running >= self.max_sessions:
+                raise TooManySessions(f"{running} live sessions already running")
+            session = LiveSession(**params)
+            self._sessions[session.id] = session
+        session.start()
+        return session
+
+    def get(self, session_id: str) -> Optional[LiveSession]:
+        return self._sessions.get(session_id)
+
+    def list_sessions(self) -> list[LiveSession]:
+        with self._lock:
+            self._prune()
+            return list(self._sessions.values())
+
+    def stop(self, session_id: str) -> Optional[LiveSession]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.stop()
+        return session
+
+    def remove(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def shutdown(self) -> None:
+        for session in self.list_sessions():
+            session.stop()
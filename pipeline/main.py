@@ -1,34 +1,98 @@
+import asyncio
+import json
+import logging
 import os
+import queue
+import shutil
 import tempfile
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import time
+import numpy as np
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional
 
-from defect_processor import process_video
-import numpy as np
+from utils.image_store import DEFAULT_CLEANUP_INTERVAL, image_store, is_valid_key
+from defect_processor import SEVERITY_THRESHOLDS, load_vehicle_zones
+from live_processor import LiveManager, SourceNotAllowed, TooManySessions
+from utils.jobs import QUEUED, RUNNING, JobManager, JobQueueFull
+from utils.adaptive_sampling import MIN_SAMPLE_FPS, SAMPLE_DISTANCE_M
+from utils.frame_gate import DEFAULT_GATE_THRESHOLD
+from utils.metrics import metrics, stage_seconds
+from utils.model_registry import BACKENDS, DEFAULT_BACKEND, detect_device, get_model, registry
+from utils.result_cache import cache_key, file_sha256, result_cache
+from utils.detection_cache import DETECTION_FLOOR, detection_store
+from utils.uploads import (
+    MAX_GPX_BYTES, MAX_IMU_BYTES, MAX_VIDEO_BYTES, MultipartUpload, RequestSizeLimit, UploadTarget, UploadTooLarge,
+    multipart_openapi
+)
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_weights_path() -> str:
+    weights_path = os.environ.get('YOLO_WEIGHTS', 'weights/road_defects.pt')
+
+    custom_weights = os.path.join(os.path.dirname(__file__), 'weights', 'road_defects.pt')
+    if os.path.exists(custom_weights):
+        weights_path = custom_weights
+
+    return weights_path
+
+
+# the device is probed in lifespan, importing torch here would slow every import of main
+job_manager = JobManager(weights_path=resolve_weights_path(), cache=result_cache)
+live_manager = LiveManager()
 
-def clean_value(v):
-    if isinstance(v, (np.float32, np.float64, np.int32, np.int64)):
-        return v.item()
-    if isinstance(v, np.ndarray):
-        return v.tolist()
-    return v
+metrics.gauge('pipeline_queue_depth', "Jobs waiting for a worker", lambda: job_manager.count(QUEUED))
+metrics.gauge('pipeline_active_jobs', "Jobs being processed", lambda: job_manager.count(RUNNING))
+metrics.gauge('pipeline_live_sessions', "Live stream sessions", lambda: len(live_manager.list_sessions()))
 
-def deep_clean(data):
-    if isinstance(data, dict):
-        return {k: deep_clean(v) for k, v in data.items()}
-    if isinstance(data, list):
-        return [deep_clean(v) for v in data]
-    return clean_value(data)
+
+async def clean_images_periodically(interval: float) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(image_store.cleanup)
+        except Exception:
+            logger.exception("Image cleanup failed")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # workers load and warm the default weights once so the first upload doesn't pay for it
+    weights_path = resolve_weights_path()
+    job_manager.device = await asyncio.to_thread(detect_device)
+    job_manager.start()
+
+    # live sessions run the model in this process, so it gets its own warm copy
+    if os.path.exists(weights_path):
+        try:
+            await asyncio.to_thread(get_model, weights_path, job_manager.device)
+        except Exception:
+            logger.exception("API warm-up failed for %s", weights_path)
+    else:
+        logger.warning("Weights not found at %s, skipping warm-up", weights_path)
+    cleanup_task = asyncio.create_task(clean_images_periodically(DEFAULT_CLEANUP_INTERVAL))
+    yield
+    cleanup_task.cancel()
+    live_manager.shutdown()
+    job_manager.shutdown()
 
 
 app = FastAPI(
     title="Road Safety Pipeline",
     description="Microservice for road defect detection and IRI calculation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# oversized bodies are refused before they are read; added first so it
+# sits inside CORS and the 413 still carries its headers
+app.add_middleware(RequestSizeLimit)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -46,6 +110,26 @@ class ProcessingResponse(BaseModel):
     processing_info: dict
 
 
+class LiveStreamRequest(BaseModel):
+
+    source: str
+    segment_id: int
+    vehicle_id: int = 1
+    confidence_threshold: float = 0.3
+    target_fps: float = 10
+    loop: bool = False
+    realtime: bool = False
+    image_format: str = 'url'
+    backend: str = DEFAULT_BACKEND
+    roi: bool = False
+
+
+class SensorPush(BaseModel):
+
+    gps: list[dict] = []
+    imu: list[dict] = []
+
+
 @app.get("/")
 async def root():
     return {"status": "ok", "service": "road-safety-pipeline"}
@@ -60,16 +144,355 @@ async def health_check():
     }
 
 
-@app.post("/process", response_model=ProcessingResponse)
-async def process_upload(
-    video: UploadFile = File(..., description="MP4 video file"),
-    gpx: UploadFile = File(..., description="GPX file with GPS coordinates"),
-    imu: UploadFile = File(..., description="CSV file with IMU data"),
-    segment_id: int = Form(..., description="Road segment ID"),
-    vehicle_id: int = Form(1, description="Vehicle ID"),
-    confidence_threshold: float = Form(0.3, description="Detection confidence threshold"),
-    target_fps: int = Form(10, description="Target frames per second for processing")
-):
+@app.get("/models")
+async def list_models():
+    return {
+        "device": detect_device(),
+        "default_backend": DEFAULT_BACKEND,
+        "max_models": registry.max_models,
+        "models": registry.list_models(),
+        "workers": job_manager.worker_models()
+    }
+
+
+VIDEO_FILE = "MP4 video file"
+GPX_FILE = "GPX file with GPS coordinates"
+IMU_FILE = "CSV file with IMU data"
+
+
+def video_target(path: str) -> UploadTarget:
+    return UploadTarget(path, MAX_VIDEO_BYTES, ('.mp4', '.avi', '.mov', '.mkv'), "Video must be MP4, AVI, MOV, or MKV format")
+
+
+def gpx_target(path: str) -> UploadTarget:
+    return UploadTarget(path, MAX_GPX_BYTES, ('.gpx',), "GPS file must be GPX format")
+
+
+def imu_target(path: str) -> UploadTarget:
+    return UploadTarget(path, MAX_IMU_BYTES, ('.csv',), "IMU file must be CSV format")
+
+
+def validate_form(model: type[BaseModel], fields: dict):
+    # the body is parsed by hand, so the form fields are validated the same way FastAPI would
+    try:
+        return model.model_validate(fields)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, 'loc': ('body', *error['loc'])} for error in e.errors()])
+
+
+class ProcessingForm(BaseModel):
+
+    segment_id: int = Field(..., description="Road segment ID")
+    vehicle_id: int = Field(1, description="Vehicle ID")
+    confidence_threshold: float = Field(0.3, description="Detection confidence threshold")
+    target_fps: int = Field(10, description="Target frames per second for processing")
+    batch_size: int = Field(4, ge=1, le=64, description="Sampled frames per inference batch")
+    pipelined: bool = Field(True, description="Overlap decoding, inference and post-processing")
+    image_crop_margin: Optional[float] = Field(None, ge=0, description="Crop evidence images to the bbox plus this fraction of its size")
+    image_max_size: Optional[int] = Field(None, ge=16, description="Longest side of evidence images, in pixels")
+    image_quality: int = Field(85, ge=1, le=100, description="JPEG quality of evidence images")
+    image_format: str = Field('url', pattern='^(url|base64)$', description="'url' for /images links, 'base64' to inline the JPEGs")
+    chunk_workers: int = Field(1, ge=1, le=16, description="Processes to split the video across; defects arrive at the end when > 1")
+    backend: str = Field(DEFAULT_BACKEND, pattern='^(torch|onnx|onnx-int8)$', description="Detector backend; the onnx ones run on CPU through ONNX Runtime")
+    roi: bool = Field(False, description="Run detection on the road zones' bounding box instead of the full frame")
+    sampling: str = Field('fixed', pattern='^(fixed|distance)$', description="'distance' samples every sample_distance_m of GPS travel, capped at target_fps")
+    sample_distance_m: float = Field(SAMPLE_DISTANCE_M, gt=0, description="Metres of travel between sampled frames")
+    min_fps: float = Field(MIN_SAMPLE_FPS, ge=0, description="Lowest sampling rate while moving")
+    frame_gate: bool = Field(False, description="Reuse the previous detections for frames whose road zones barely changed")
+    gate_threshold: float = Field(DEFAULT_GATE_THRESHOLD, ge=0, description="Mean gray-level difference below which a frame counts as unchanged")
+    record_detections: bool = Field(False, description="Keep the model output of every sampled frame for /rescore, under processing_info.detections_key")
+
+
+PROCESSING_BODY = multipart_openapi(ProcessingForm.model_json_schema(), {'video': VIDEO_FILE, 'gpx': GPX_FILE, 'imu': IMU_FILE})
+
+
+def processing_params(form: ProcessingForm) -> dict:
+    return {
+        **form.model_dump(exclude={'record_detections'}),
+        'weights_path': resolve_weights_path(),
+        'device': detect_device(),
+        'save_images': True,
+    }
+
+
+# how frames are scheduled through the model, not what comes out of them
+SCHEDULING_PARAMS = ('batch_size', 'pipelined')
+
+
+def result_cache_key(inputs: dict, params: dict) -> Optional[str]:
+    # the weights and the vehicle's zones by content, so editing either is a miss
+    weights_path = params['weights_path']
+    if not os.path.exists(weights_path):
+        return None
+    ignored = ('weights_path', 'detections_path', *SCHEDULING_PARAMS)
+    return cache_key({
+        **{name: info['sha256'] for name, info in inputs.items()},
+        **{name: value for name, value in params.items() if name not in ignored},
+        'record_detections': 'detections_path' in params,
+        'weights_sha256': file_sha256(weights_path),
+        'zones': [zone.tolist() for zone in load_vehicle_zones(params['vehicle_id'])],
+    })
+
+
+def detections_cache_key(inputs: dict, params: dict) -> Optional[str]:
+    # only what changes the model output of each sampled frame; thresholds,
+    # zones and sensors are applied afterwards and can be rescored
+    weights_path = params['weights_path']
+    if not os.path.exists(weights_path):
+        return None
+    fields = {
+        'video': inputs['video']['sha256'],
+        'weights_sha256': file_sha256(weights_path),
+        'floor': DETECTION_FLOOR,
+        **{name: params[name] for name in (
+            'backend', 'roi', 'target_fps', 'sampling', 'sample_distance_m', 'min_fps', 'frame_gate', 'gate_threshold'
+        )},
+    }
+    if params['roi'] or params['frame_gate']:
+        fields['zones'] = [zone.tolist() for zone in load_vehicle_zones(params['vehicle_id'])]
+    if params['sampling'] == 'distance':
+        fields['gpx'] = inputs['gpx']['sha256']
+    return cache_key(fields)
+
+
+async def submit_job(request: Request, stream: bool = False):
+    # temporary files, removed by the job manager once the job finishes
+    temp_dir = tempfile.mkdtemp()
+    try:
+        upload_started = time.perf_counter()
+        paths = {
+            'video_path': os.path.join(temp_dir, "video.mp4"),
+            'gpx_path': os.path.join(temp_dir, "track.gpx"),
+            'imu_path': os.path.join(temp_dir, "imu.csv"),
+        }
+        # written and hashed straight from the request body, each file checked against its own limit
+        fields, inputs = await MultipartUpload({
+            'video': video_target(paths['video_path']),
+            'gpx': gpx_target(paths['gpx_path']),
+            'imu': imu_target(paths['imu_path']),
+        }).receive(request)
+        form = validate_form(ProcessingForm, fields)
+        params = processing_params(form)
+        detections_key = None
+        if form.record_detections and detection_store.enabled:
+            detections_key = await asyncio.to_thread(detections_cache_key, inputs, params)
+        if detections_key:
+            params['detections_path'] = detection_store.path_for(detections_key)
+        key = await asyncio.to_thread(result_cache_key, inputs, params) if result_cache.enabled else None
+
+        upload_seconds = time.perf_counter() - upload_started
+        stage_seconds.observe(upload_seconds, stage='upload')
+        # the cache lookup reads the stored result from disk, kept off the event loop
+        job = await asyncio.to_thread(
+            job_manager.submit, {**params, **paths}, work_dir=temp_dir, inputs=inputs, stream=stream, cache_key=key
+        )
+        job.upload_seconds = upload_seconds
+        if detections_key:
+            # the worker wrote the file, the store only has to account for it
+            job.future.add_done_callback(lambda _: detection_store.register(detections_key))
+        return job
+    except UploadTooLarge as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise HTTPException(
+            status_code=413,
+            detail=str(e)
+        )
+    except JobQueueFull as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Processing queue is full, retry later ({e})"
+        )
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def with_request_stages(result: dict, job) -> dict:
+    # upload and queue time next to the worker's own stages, without
+    # touching the job's (possibly cached) result
+    info = result.get('processing_info', {})
+    stages = job.request_stages()
+    if not job.cached:
+        stages.update(info.get('stage_seconds', {}))
+    return {**result, 'processing_info': {**info, 'stage_seconds': stages, 'cached': job.cached}}
+
+
+@app.post("/jobs", status_code=202, openapi_extra=PROCESSING_BODY)
+async def create_job(request: Request):
+    """
+    Queues a video for processing and returns immediately.
+
+    Poll GET /jobs/{job_id} for status, progress and, once completed, the
+    same payload /process returns.
+    """
+    job = await submit_job(request)
+    return job.to_dict(include_result=False)
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return {
+        "workers": job_manager.max_workers,
+        "max_queue": job_manager.max_queue,
+        "active": job_manager.active_count(),
+        "jobs": [job.to_dict(include_result=False) for job in job_manager.list_jobs()]
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: per-stage latency, frames/s, queue depth and active jobs."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/cache")
+async def cache_stats():
+    return result_cache.stats()
+
+
+@app.delete("/cache")
+async def clear_cache():
+    removed = await asyncio.to_thread(result_cache.invalidate)
+    return {"removed": removed}
+
+
+@app.delete("/cache/{key}")
+async def invalidate_cache_entry(key: str):
+    """Drops one cached result; the key is the cache_key of the job that produced it."""
+    if not is_valid_key(key):
+        raise HTTPException(status_code=404, detail="Cache entry not found")
+    removed = await asyncio.to_thread(result_cache.invalidate, key)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Cache entry not found")
+    return {"removed": removed}
+
+
+class RescoreForm(BaseModel):
+
+    detections_key: str = Field(..., description="processing_info.detections_key of an earlier /process run with record_detections")
+    segment_id: int = Field(..., description="Road segment ID")
+    vehicle_id: int = Field(1, description="Vehicle ID")
+    confidence_threshold: float = Field(0.3, description="Detection confidence threshold")
+    iou_threshold: float = Field(0.7, gt=0, le=1, description="IoU above which overlapping detections are merged")
+    zones: Optional[str] = Field(None, description="JSON list of polygons ([[x, y], ...]) instead of the vehicle's zones")
+    critical_threshold: float = Field(SEVERITY_THRESHOLDS['critical'], description="Severity score for 'critical'")
+    high_threshold: float = Field(SEVERITY_THRESHOLDS['high'], description="Severity score for 'high'")
+    moderate_threshold: float = Field(SEVERITY_THRESHOLDS['moderate'], description="Severity score for 'moderate'")
+
+
+@app.post(
+    "/rescore",
+    response_model=ProcessingResponse,
+    openapi_extra=multipart_openapi(RescoreForm.model_json_schema(), {'gpx': GPX_FILE, 'imu': IMU_FILE})
+)
+async def rescore_upload(request: Request):
+    """
+    Re-runs everything after inference (thresholds, NMS, tracking, zones,
+    GPS/IMU correlation, severity) on the detections recorded by an earlier
+    /process of the same video with record_detections set, in seconds
+    rather than a full pass, on the worker pool. Counts against the same
+    queue bound as processing jobs (429 past it).
+    Defects come without evidence images.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        gpx_path = os.path.join(temp_dir, "track.gpx")
+        imu_path = os.path.join(temp_dir, "imu.csv")
+        try:
+            fields, _ = await MultipartUpload({
+                'gpx': gpx_target(gpx_path),
+                'imu': imu_target(imu_path),
+            }).receive(request)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        form = validate_form(RescoreForm, fields)
+
+        path = detection_store.get_path(form.detections_key) if is_valid_key(form.detections_key) else None
+        if path is None:
+            raise HTTPException(status_code=404, detail="No recorded detections for this key, process the video with record_detections first")
+
+        zone_polygons = None
+        if form.zones is not None:
+            try:
+                zone_polygons = [np.array(polygon, np.int32).reshape(-1, 2) for polygon in json.loads(form.zones)]
+            except (TypeError, ValueError) as e:
+                raise HTTPException(status_code=422, detail=f"Invalid zones: {e}")
+            if not zone_polygons or any(len(polygon) < 3 for polygon in zone_polygons):
+                raise HTTPException(status_code=422, detail="Invalid zones: every polygon needs at least 3 points")
+
+        params = {
+            'detections_path': path,
+            'gpx_path': gpx_path,
+            'imu_path': imu_path,
+            'segment_id': form.segment_id,
+            'vehicle_id': form.vehicle_id,
+            'confidence_threshold': form.confidence_threshold,
+            'iou_threshold': form.iou_threshold,
+            'zones': zone_polygons,
+            'severity_thresholds': {
+                'critical': form.critical_threshold,
+                'high': form.high_threshold,
+                'moderate': form.moderate_threshold,
+                'low': 0.0,
+            },
+        }
+        # on the worker pool, like /process, so parsing and tracking stay out of the API process
+        try:
+            future = job_manager.rescore(params)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=f"Processing queue is full, retry later ({e})")
+        try:
+            return await asyncio.wrap_future(future)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/detections")
+async def detection_cache_stats():
+    return detection_store.stats()
+
+
+@app.get("/images/{key}")
+async def get_image(key: str, request: Request):
+    path = image_store.get_path(key)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # the key is the hash of the bytes, so the content never changes
+    headers = {
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'ETag': f'"{key}"',
+    }
+    if request.headers.get('if-none-match') == headers['ETag']:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type='image/jpeg', headers=headers)
+
+
+@app.put("/images/{key}/pin", status_code=204)
+async def pin_image(key: str):
+    # pinned images are exempt from IMAGE_RETENTION_SECONDS, for links stored elsewhere
+    if not image_store.pin(key):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(status_code=204)
+
+
+@app.delete("/images/{key}/pin", status_code=204)
+async def unpin_image(key: str):
+    if not image_store.unpin(key):
+        raise HTTPException(status_code=404, detail="Image not pinned")
+    return Response(status_code=204)
+
+
+@app.post("/process", response_model=ProcessingResponse, openapi_extra=PROCESSING_BODY)
+async def process_upload(request: Request):
     """
     
     1. Receives video, GPX, and IMU files
@@ -77,87 +500,162 @@ async def process_upload(
     3. Correlates detections with GPS coordinates and IMU data
     4. Calculates IRI measurement for the segment
     5. Returns structured data for database storage
+
+    Runs as a job on the worker pool and waits for it, so the event loop
+    stays free while the video is processed. An upload identical to an
+    earlier successful one (same files, weights, zones and parameters)
+    returns that result from the cache instead.
     """
-    if not video.filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-        raise HTTPException(
-            status_code=400,
-            detail="Video must be MP4, AVI, MOV, or MKV format"
-        )
+    job = await submit_job(request)
 
-    if not gpx.filename.lower().endswith('.gpx'):
+    try:
+        return with_request_stages(await asyncio.wrap_future(job.future), job)
+    except Exception as e:
         raise HTTPException(
-            status_code=400,
-            detail="GPS file must be GPX format"
+            status_code=500,
+            detail=f"Processing failed: {str(e)}"
         )
 
-    if not imu.filename.lower().endswith('.csv'):
-        raise HTTPException(
-            status_code=400,
-            detail="IMU file must be CSV format"
-        )
 
-    # temporary files
-    temp_dir = tempfile.mkdtemp()
-    video_path = os.path.join(temp_dir, "video.mp4")
+async def stream_job_events(job, poll_interval: float = 1.0):
+    # relays defect/progress events as they arrive, then the summary
+    idle_after_done = 0
+    while True:
+        try:
+            event = await asyncio.to_thread(job.events.get, True, poll_interval)
+        except queue.Empty:
+            # a worker that died can't send its end marker
+            if job.future.done():
+                idle_after_done += 1
+                if idle_after_done > 2:
+                    break
+            continue
+        if event is None:
+            break
+        yield json.dumps(event) + "\n"
 
     try:
-        # Save video to temp file
-        video_content = await video.read()
-        with open(video_path, "wb") as f:
-            f.write(video_content)
+        result = await asyncio.wrap_future(job.future)
+    except Exception as e:
+        yield json.dumps({'event': 'error', 'detail': f"Processing failed: {str(e)}"}) + "\n"
+        return
 
-       
-        gpx_content = (await gpx.read()).decode('utf-8')
-        imu_content = (await imu.read()).decode('utf-8')
+    result = with_request_stages(result, job)
+    summary = {key: value for key, value in result.items() if key != 'defects'}
+    yield json.dumps({'event': 'summary', **summary}) + "\n"
 
-        device = 'cpu'
-        
-        try:
-            import torch
-            if torch.cuda.is_available():
-                device = 'cuda'
-            elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
-                device = 'mps'
-        except ImportError:
-            pass
-
-
-        weights_path = os.environ.get('YOLO_WEIGHTS', 'weights/road_defects.pt')
-        
-        custom_weights = os.path.join(os.path.dirname(__file__), 'weights', 'road_defects.pt')
-        if os.path.exists(custom_weights):
-            weights_path = custom_weights
-
-        
-        result = process_video(
-            video_path=video_path,
-            gpx_content=gpx_content,
-            imu_content=imu_content,
-            segment_id=segment_id,
-            vehicle_id=vehicle_id,
-            weights_path=weights_path,
-            device=device,
-            confidence_threshold=confidence_threshold,
-            target_fps=target_fps,
-            save_images=True
-        )
-        cleaned = deep_clean(result)
 
-        return cleaned
-    except Exception as e:
+@app.post("/process/stream", openapi_extra=PROCESSING_BODY)
+async def process_upload_stream(request: Request):
+    """
+    Same processing as /process, returned as newline-delimited JSON.
+
+    Each defect is sent as soon as its track ends ({"event": "defect"}),
+    progress after every batch ({"event": "progress"}), and the last line
+    is the IRI measurement, coverage log and processing info
+    ({"event": "summary"}).
+    """
+    job = await submit_job(request, stream=True)
+    return StreamingResponse(stream_job_events(job), media_type="application/x-ndjson")
+
+
+def get_live_session(session_id: str):
+    session = live_manager.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Stream session not found")
+    return session
+
+
+@app.post("/streams", status_code=201)
+async def start_stream(request: LiveStreamRequest):
+    """
+    Starts detection on an RTSP URL (or, with LIVE_ALLOW_LOCAL_SOURCES=1, a
+    camera index or a video file, optionally looped and played at its own
+    frame rate). GPS/IMU samples go to POST /streams/{session_id}/sensors
+    while it runs. Stopped sessions are kept for LIVE_SESSION_TTL_SECONDS.
+    """
+    if request.image_format not in ('url', 'base64'):
+        raise HTTPException(status_code=422, detail="image_format must be 'url' or 'base64'")
+    if request.backend not in BACKENDS:
+        raise HTTPException(status_code=422, detail=f"backend must be one of {', '.join(BACKENDS)}")
+    try:
+        session = live_manager.start(
+            **request.model_dump(),
+            weights_path=resolve_weights_path(),
+            device=detect_device()
+        )
+    except SourceNotAllowed as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except TooManySessions as e:
         raise HTTPException(
-            status_code=500,
-            detail=f"Processing failed: {str(e)}"
+            status_code=429,
+            detail=f"Too many live streams, stop one first ({e})"
         )
+    return session.to_dict()
 
-    finally:
-       
-        try:
-            if os.path.exists(video_path):
-                os.remove(video_path)
-            os.rmdir(temp_dir)
-        except Exception:
-            pass
+
+@app.get("/streams")
+async def list_streams():
+    return {
+        "max_sessions": live_manager.max_sessions,
+        "sessions": [session.to_dict() for session in live_manager.list_sessions()]
+    }
+
+
+@app.get("/streams/{session_id}")
+async def get_stream(session_id: str):
+    return get_live_session(session_id).to_dict()
+
+
+@app.post("/streams/{session_id}/sensors")
+async def push_sensors(session_id: str, push: SensorPush):
+    session = get_live_session(session_id)
+    try:
+        gps = session.sensors.add_gps(push.gps) if push.gps else 0
+        imu = session.sensors.add_imu(push.imu) if push.imu else 0
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid sensor sample: {e}")
+    return {"gps_accepted": gps, "imu_accepted": imu}
+
+
+@app.get("/streams/{session_id}/defects")
+async def get_stream_defects(session_id: str, after: int = 0):
+    defects, cursor = get_live_session(session_id).defects_since(after)
+    return {"defects": defects, "next": cursor}
+
+
+async def stream_live_events(session, poll_interval: float = 0.5):
+    cursor = 0
+    while True:
+        finished = session.finished
+        defects, cursor = session.defects_since(cursor)
+        for defect in defects:
+            yield json.dumps({'event': 'defect', 'defect': defect}) + "\n"
+        if finished:
+            break
+        yield json.dumps({'event': 'status', 'status': session.status, **session.stats()}) + "\n"
+        await asyncio.sleep(poll_interval)
+
+    if session.error:
+        yield json.dumps({'event': 'error', 'detail': session.error}) + "\n"
+    elif session.summary is not None:
+        yield json.dumps({'event': 'summary', **session.summary}) + "\n"
+
+
+@app.get("/streams/{session_id}/events")
+async def stream_events(session_id: str):
+    """NDJSON: defects as tracks are finalized, periodic status, then the summary."""
+    session = get_live_session(session_id)
+    return StreamingResponse(stream_live_events(session), media_type="application/x-ndjson")
+
+
+@app.delete("/streams/{session_id}")
+async def stop_stream(session_id: str):
+    session = get_live_session(session_id)
+    await asyncio.to_thread(session.stop)
+    live_manager.remove(session_id)
+    defects, _ = session.defects_since(0)
+    return {**session.to_dict(), 'result': {'defects': defects, **(session.summary or {})}}
 
 
 if __name__ == "__main__":
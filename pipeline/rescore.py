@@ -0,0 +1,131 @@
+from collections.abc import Iterator
+from datetime import datetime
+from typing import IO, Optional, Union
+
+import numpy as np
+
+from defect_processor import (
+    TRACK_LOST_BUFFER,
+    DefectTracks,
+    collect_events,
+    load_vehicle_zones,
+    resolve_start_time
+)
+from utils.detection_cache import RecordedDetections
+from utils.gpx_parser import parse_gpx_track
+from utils.imu_analyzer import calculate_iri, get_imu_at_frames, parse_imu_series
+
+
+def iter_rescore(
+    detections_path: str,
+    gpx_content: Union[str, IO],
+    imu_content: Union[str, IO],
+    segment_id: int,
+    vehicle_id: int = 1,
+    confidence_threshold: float = 0.3,
+    iou_threshold: float = 0.7,
+    zones: Optional[list[np.ndarray]] = None,
+    severity_thresholds: Optional[dict] = None,
+    finalize_after: Optional[int] = TRACK_LOST_BUFFER,
+    image_format: str = 'url'
+) -> Iterator[dict]:
+    """
+    Same 'defect' and 'summary' events as iter_process_video, from the
+    detections a previous run recorded instead of the video: confidence
+    filter, NMS, tracking, zone filter, GPS/IMU correlation and severity
+    are all replayed, inference and decoding are not.
+
+    There are no frames to draw evidence images from, so defects come
+    without them. Detections outside the ROI of the recorded run (if it
+    had one) were never made, so widening the zones can't find them.
+    """
+    recorded = RecordedDetections(detections_path)
+    if confidence_threshold < recorded.floor:
+        raise ValueError(
+            f"confidence_threshold {confidence_threshold} is below the recording floor {recorded.floor}"
+        )
+    meta = recorded.meta
+
+    gps_track = parse_gpx_track(gpx_content)
+    imu_data = parse_imu_series(imu_content)
+    if zones is None:
+        zones = load_vehicle_zones(vehicle_id)
+    video_start_time = resolve_start_time(gps_track, imu_data)
+
+    tracks = DefectTracks(
+        segment_id,
+        vehicle_id,
+        meta['fps'],
+        video_start_time,
+        meta['width'],
+        meta['height'],
+        gps_track,
+        imu_data,
+        iou_threshold=iou_threshold,
+        save_images=False,
+        image_format=image_format,
+        finalize_after=finalize_after,
+        zones=zones,
+        confidence_threshold=confidence_threshold,
+        severity_thresholds=severity_thresholds
+    )
+
+    # IMU reading for every recorded frame in one lookup
+    frame_imu = None
+    if len(imu_data.time_index):
+        frame_imu = get_imu_at_frames(imu_data, recorded.frames, meta['fps'], video_start_time)
+
+    for j, (frame_number, detections) in enumerate(recorded):
+        imu_row = frame_imu.row(j) if frame_imu is not None else None
+        for index, defect in tracks.update(frame_number, None, detections, imu_row):
+            yield {'event': 'defect', 'track_index': index, 'defect': defect}
+
+    for index, defect in tracks.finish():
+        yield {'event': 'defect', 'track_index': index, 'defect': defect}
+
+    yield {
+        'event': 'summary',
+        'iri_measurement': {
+            'segment_id': segment_id,
+            'iri_value': calculate_iri(imu_data),
+            'vehicle_id': vehicle_id,
+            'measured_at': datetime.now().isoformat()
+        },
+        'coverage_log': {
+            'segment_id': segment_id,
+            'vehicle_id': vehicle_id,
+            'covered_at': datetime.now().isoformat(),
+            'sweep_frequency': 1
+        },
+        'processing_info': {
+            'rescored': True,
+            'total_frames': meta['total_frames'],
+            'processed_frames': len(recorded),
+            'original_fps': meta['fps'],
+            'target_fps': meta['target_fps'],
+            'sampling': meta['sampling'],
+            'roi': meta['roi'],
+            'frame_gate': meta['frame_gate'],
+            'detection_floor': recorded.floor,
+            'recorded_detections': len(recorded.scores),
+            'confidence_threshold': confidence_threshold,
+            'iou_threshold': iou_threshold,
+            'severity_thresholds': tracks.severity_thresholds,
+            **tracks.stats(),
+            **tracks.timer.stats(),
+            'detections_count': tracks.finalized_count
+        }
+    }
+
+
+def rescore(
+    detections_path: str,
+    gpx_content: Union[str, IO],
+    imu_content: Union[str, IO],
+    segment_id: int,
+    vehicle_id: int = 1,
+    **options
+) -> dict:
+    # the /process response shape, defects in first-seen order
+    events = iter_rescore(detections_path, gpx_content, imu_content, segment_id, vehicle_id, **options)
+    return collect_events(events)
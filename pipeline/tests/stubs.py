@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+import supervision as sv
+
+
+class StubModel:
+    """Finds bright boxes on a dark frame, in place of YOLO.
+
+    Every box gets `confidence`, or confidence(x1) when it is callable.
+    """
+
+    backend = 'stub'
+
+    def __init__(self, confidence=0.8) -> None:
+        self.confidence = confidence
+        self.inference_calls = 0
+
+    def predict(self, frames, conf=None, **kwargs) -> list:
+        self.inference_calls += 1
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        results = []
+        for frame in frames:
+            mask = (frame[:, :, 0] > 200).astype(np.uint8)
+            count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            xyxy = np.array([[x, y, x + w, y + h] for x, y, w, h, _ in stats[1:count]], dtype=np.float32).reshape(-1, 4)
+            results.append(sv.Detections(
+                xyxy=xyxy,
+                confidence=np.array([self._confidence(box[0]) for box in xyxy], dtype=float),
+                class_id=np.zeros(len(xyxy), dtype=int)
+            ))
+        return results
+
+    def _confidence(self, x1: float) -> float:
+        return self.confidence(x1) if callable(self.confidence) else self.confidence
+
+
+def install_stub_model() -> None:
+    # pool initializer: spawned chunk processes detect with StubModel too
+    import chunked_processor
+    chunked_processor.get_model = lambda *args, **kwargs: StubModel()
+
+
+def stub_job(job_id: str, params: dict, stream: bool = False) -> dict:
+    # stands in for utils.jobs._run_job in a worker: reports `frames` of
+    # progress, then returns, raises params['fail'] or kills the worker
+    import os
+    import time
+
+    from utils import jobs
+
+    frames = params.get('frames', 3)
+    jobs._progress_queue.put(('started', job_id))
+    for k in range(1, frames + 1):
+        jobs._progress_queue.put(('progress', job_id, k, frames))
+        if stream:
+            jobs._progress_queue.put(('defect', job_id, {'event': 'defect', 'track_index': k - 1, 'defect': {}}))
+    # held open until the test creates params['release']
+    release = params.get('release')
+    deadline = time.monotonic() + 30
+    while release and not os.path.exists(release) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if params.get('crash'):
+        os._exit(1)
+    jobs._progress_queue.put(('finished', job_id))
+    if params.get('fail'):
+        raise ValueError(params['fail'])
+    return {'defects': [], 'processing_info': {'processed_frames': frames}}
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from defect_processor import plan_sampling
+from utils.adaptive_sampling import STATIONARY_SPEED, distance_schedule, frame_speeds
+from utils.general import datetime_to_ns
+from utils.gpx_parser import GpsTrack
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+FPS = 30
+# degrees of latitude per metre
+METRE = 1 / 111195
+
+
+def drive(speeds: list[float]) -> GpsTrack:
+    # one fix a second, heading north at speeds[k] m/s during second k
+    position = np.concatenate([[0.0], np.cumsum(speeds)])
+    n = len(position)
+    return GpsTrack(
+        times_ns=datetime_to_ns(START_TIME) + np.arange(n, dtype=np.int64) * 10 ** 9,
+        lat=1.35 + position * METRE,
+        lng=np.full(n, 103.98),
+        elevation=np.full(n, np.nan),
+        start_time=START_TIME
+    )
+
+
+# 22 s: 6 s at 10 m/s, a 10 s stop, 6 s at 10 m/s
+STOP_AND_GO = [10.0] * 6 + [0.0] * 10 + [10.0] * 6
+
+
+def test_frame_speeds():
+    speeds = frame_speeds(drive(STOP_AND_GO), START_TIME, 25 * FPS, FPS)
+
+    assert speeds[3 * FPS] == pytest.approx(10, abs=1e-3)
+    assert speeds[11 * FPS] == pytest.approx(0, abs=1e-3)
+    assert speeds[19 * FPS] == pytest.approx(10, abs=1e-3)
+    # past the end of the track
+    assert np.isnan(speeds[23 * FPS:]).all()
+    assert not np.isnan(speeds[:22 * FPS + 1]).any()
+
+
+def test_stationary_stretches_get_no_frames():
+    track = drive(STOP_AND_GO)
+    frames, stats = distance_schedule(track, START_TIME, 22 * FPS, FPS)
+
+    speeds = frame_speeds(track, START_TIME, 22 * FPS, FPS)
+    assert (speeds[frames] >= STATIONARY_SPEED).all()
+    # nothing while standing still, the speed window blurs the edges
+    assert not ((frames > 8 * FPS) & (frames < 14 * FPS)).any()
+    assert 7 < stats['stationary_seconds'] < 8
+    # and every 1.5 m while driving: 0.15 s at 10 m/s
+    gaps = np.diff(frames[(frames > 2 * FPS) & (frames < 4 * FPS)])
+    assert set(gaps) == {5}
+
+
+def test_fast_driving_is_capped_at_max_fps():
+    frames, _ = distance_schedule(drive([50.0] * 10), START_TIME, 10 * FPS, FPS, max_fps=10)
+    assert set(np.diff(frames)) == {3}
+
+
+def test_slow_driving_still_gets_min_fps():
+    # 5 m at 3 m/s is 1.7 s, more than the 1 s min_fps allows
+    frames, _ = distance_schedule(drive([3.0] * 10), START_TIME, 10 * FPS, FPS, distance_m=5, min_fps=1)
+    assert set(np.diff(frames)) == {FPS}
+    assert frames[0] == 0
+
+
+def test_frames_outside_the_track_are_sampled_at_max_fps():
+    # the video starts 3 s before the first fix
+    start = START_TIME - timedelta(seconds=3)
+    frames, _ = distance_schedule(drive([10.0] * 10), start, 13 * FPS, FPS, max_fps=10)
+
+    assert frames[frames < 3 * FPS].tolist() == list(range(0, 3 * FPS, 3))
+    assert len(frames[frames >= 3 * FPS]) > 0
+
+
+def test_a_track_without_timestamps_falls_back_to_the_fixed_rate():
+    track = GpsTrack.from_coordinates([
+        {'lat': 1.35 + k * METRE, 'lng': 103.98, 'elevation': None, 'timestamp': None} for k in range(10)
+    ])
+
+    assert distance_schedule(track, START_TIME, 10 * FPS, FPS) is None
+    schedule, stats = plan_sampling('distance', track, START_TIME, 10 * FPS, FPS, 10)
+    assert schedule is None
+    assert stats == {'sampling': 'fixed', 'fixed_rate_samples': 100, 'frames_saved': 0}
+
+
+def test_frames_saved_against_the_fixed_rate():
+    schedule, stats = plan_sampling('distance', drive(STOP_AND_GO), START_TIME, 22 * FPS, FPS, 10)
+
+    assert stats['sampling'] == 'distance'
+    assert stats['fixed_rate_samples'] == 220
+    assert stats['frames_saved'] == 220 - len(schedule)
+    # the stop alone is 10 s at 10 fps
+    assert stats['frames_saved'] > 100
+
+
+def test_unknown_sampling_mode():
+    with pytest.raises(ValueError, match="sampling must be one of"):
+        plan_sampling('time', drive(STOP_AND_GO), START_TIME, 22 * FPS, FPS, 10)
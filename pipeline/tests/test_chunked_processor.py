@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import pytest
+import supervision as sv
+
+import chunked_processor
+import defect_processor
+from chunked_processor import iter_process_video_chunked, plan_chunks
+from defect_processor import collect_events, iter_process_video
+from tests.stubs import StubModel, install_stub_model
+from utils.general import chunk_worker_budget
+from utils.image_store import ImageStore
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+FPS = 10
+WIDTH, HEIGHT = 320, 240
+ZONES = [np.array([[0, 0], [WIDTH - 1, 0], [WIDTH - 1, HEIGHT - 1], [0, HEIGHT - 1]])]
+
+
+def write_video(path: str, frames: int, shown: int = 10, phase: int = 0) -> str:
+    # a box crossing the frame every two seconds, on screen for `shown` frames
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+    for k in range(frames):
+        frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        step = (k + phase) % 20
+        if step < shown:
+            x = 20 + step * 5
+            frame[100:160, x:x + 60] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def gpx(seconds: int) -> str:
+    points = ''.join(
+        f'<trkpt lat="{1.35 + t * 1e-4:.6f}" lon="{103.98 + t * 1e-4:.6f}">'
+        f'<time>{(START_TIME + timedelta(seconds=t)).isoformat()}Z</time></trkpt>'
+        for t in range(seconds + 2)
+    )
+    return f'<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>{points}</trkseg></trk></gpx>'
+
+
+def imu(seconds: int) -> str:
+    rows = ''.join(
+        f'{(START_TIME + timedelta(seconds=k / 100)).isoformat()},0,0,{9.81 + (k % 9) * 0.05}\n'
+        for k in range(seconds * 100)
+    )
+    return 'timestamp,accel_x,accel_y,accel_z\n' + rows
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    monkeypatch.setattr(chunked_processor, 'get_model', lambda *args, **kwargs: StubModel())
+
+
+@pytest.fixture
+def stub_pool(monkeypatch, stub_model):
+    # real spawn processes for the chunks, detecting with StubModel as well
+    pools = []
+
+    def get_pool(workers):
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=install_stub_model)
+        pools.append(pool)
+        return pool
+
+    monkeypatch.setattr(chunked_processor, '_get_pool', get_pool)
+    monkeypatch.setattr(defect_processor, 'get_model', lambda *args, **kwargs: StubModel())
+    # the process budget would cap the workers to this machine's cores
+    monkeypatch.setattr(defect_processor, 'chunk_worker_budget', lambda requested: requested)
+    yield
+    for pool in pools:
+        pool.shutdown()
+
+
+def run_sequential(video_path: str, seconds: int, chunk_workers: int = 1) -> dict:
+    events = iter_process_video(
+        video_path, gpx(seconds), imu(seconds), segment_id=1,
+        chunk_workers=chunk_workers, target_fps=FPS, save_images=False, zones=ZONES, pipelined=False
+    )
+    return collect_events(events)
+
+
+def run_chunked(video_path: str, seconds: int, chunks: int, **params) -> dict:
+    events = iter_process_video_chunked(
+        video_path, gpx(seconds), imu(seconds), segment_id=1,
+        **{'workers': 1, 'chunks': chunks, 'target_fps': FPS, 'save_images': False, 'zones': ZONES, 'pipelined': False,
+           **params}
+    )
+    return collect_events(events)
+
+
+def test_plan_chunks():
+    assert plan_chunks(10, 3) == [(0, 3), (3, 7), (7, 10)]
+    assert plan_chunks(2, 4) == [(0, 1), (1, 2)]
+    assert plan_chunks(0, 2) == []
+
+
+def test_last_chunk_reads_past_an_underreported_frame_count(tmp_path, monkeypatch, stub_model):
+    video_path = write_video(str(tmp_path / 'drive.mp4'), 60)
+    full = run_chunked(video_path, 6, chunks=3)
+
+    from_video_path = sv.VideoInfo.from_video_path
+
+    def short_count(path):
+        info = from_video_path(path)
+        info.total_frames = 40
+        return info
+
+    monkeypatch.setattr(sv.VideoInfo, 'from_video_path', short_count)
+    short = run_chunked(video_path, 6, chunks=3)
+
+    assert full['processing_info']['processed_frames'] == 60
+    assert short['processing_info']['processed_frames'] == 60
+    assert len(short['defects']) == len(full['defects']) == 3
+
+
+@pytest.mark.parametrize('chunk_workers', [2, 3, 4, 8])
+def test_chunked_output_matches_sequential(tmp_path, stub_pool, chunk_workers):
+    # boxes on screen across the chunk boundaries, handed over through the warm-up
+    video_path = write_video(str(tmp_path / 'drive.mp4'), 120, shown=15, phase=5)
+
+    sequential = run_sequential(video_path, 12)
+    chunked = run_sequential(video_path, 12, chunk_workers=chunk_workers)
+
+    assert chunked['processing_info']['chunks'] == chunk_workers
+    assert len(sequential['defects']) == 7
+    assert chunked['defects'] == sequential['defects']
+
+
+# boundaries inside a box's run, never on its first frame: ByteTrack confirms
+# a track on its very first frame only, a chunk started there without warm-up
+# would report it one frame earlier than the sequential run
+@pytest.mark.parametrize('chunk_workers', [2, 3, 6])
+def test_stitched_output_matches_sequential(tmp_path, stub_pool, chunk_workers):
+    video_path = write_video(str(tmp_path / 'drive.mp4'), 120, shown=15, phase=5)
+
+    sequential = run_sequential(video_path, 12)
+    # without warm-up every boundary track is reported by both chunks and
+    # joined again on the IoU of the frames they share
+    stitched = run_chunked(video_path, 12, chunks=chunk_workers, workers=chunk_workers, warmup=0)
+
+    assert stitched['processing_info']['stitched_tracks'] > 0
+    assert stitched['defects'] == sequential['defects']
+
+
+def test_stitched_away_records_leave_no_image_behind(tmp_path, monkeypatch):
+    # later sightings score higher, so the record a track is merged into
+    # takes the image of the one merged away
+    monkeypatch.setattr(
+        chunked_processor, 'get_model', lambda *args, **kwargs: StubModel(confidence=lambda x1: 0.5 + x1 / 1000)
+    )
+    store = ImageStore(str(tmp_path / 'images'))
+    monkeypatch.setattr(defect_processor, 'image_store', store)
+    # boxes on screen across both chunk boundaries
+    video_path = write_video(str(tmp_path / 'drive.mp4'), 60, shown=15, phase=5)
+
+    # without warm-up every boundary track is reported by both chunks
+    result = run_chunked(video_path, 6, chunks=3, save_images=True, warmup=0)
+
+    assert result['processing_info']['stitched_tracks'] >= 2
+    stored = {name[:-4] for _, _, names in os.walk(store.root) for name in names}
+    assert stored == {defect['image_key'] for defect in result['defects']}
+
+
+@pytest.mark.parametrize('requested, job_workers, budget, expected', [
+    (4, 1, 8, 4),
+    (4, 2, 4, 2),
+    (4, 4, 4, 1),
+    (4, 8, 4, 1),
+    (1, 1, 16, 1),
+])
+def test_chunk_worker_budget(requested, job_workers, budget, expected):
+    assert chunk_worker_budget(requested, job_workers, budget) == expected
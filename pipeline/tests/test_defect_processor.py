@@ -0,0 +1,255 @@
+import base64
+import threading
+
+import cv2
+import numpy as np
+import pytest
+import supervision as sv
+
+import defect_processor
+from defect_processor import (
+    DEFECT_CLASSES, TRACK_LOST_BUFFER, DefectTracks, encode_jpeg, iter_process_video, process_video, render_evidence
+)
+from tests.stubs import StubModel
+from tests.test_chunked_processor import FPS, HEIGHT, START_TIME, WIDTH, ZONES, gpx, imu, write_video
+from utils.gpx_parser import parse_gpx_track
+from utils.image_store import ImageStore
+from utils.imu_analyzer import parse_imu_series
+
+SECONDS = 12
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = StubModel()
+    monkeypatch.setattr(defect_processor, 'get_model', lambda *args, **kwargs: model)
+    return model
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    # boxes entering and leaving every two seconds, 7 defects
+    return write_video(str(tmp_path_factory.mktemp('video') / 'drive.mp4'), SECONDS * FPS, shown=15, phase=5)
+
+
+def run(video_path: str, **params) -> dict:
+    return process_video(
+        video_path, gpx(SECONDS), imu(SECONDS), segment_id=1,
+        **{'target_fps': FPS, 'save_images': False, 'zones': ZONES, 'pipelined': False, **params}
+    )
+
+
+@pytest.mark.parametrize('queue_size', [1, 4])
+def test_pipelined_output_matches_sequential(video, model, queue_size):
+    sequential = run(video)
+    pipelined = run(video, pipelined=True, queue_size=queue_size)
+
+    assert len(sequential['defects']) == 7
+    assert pipelined['defects'] == sequential['defects']
+    assert pipelined['processing_info']['processed_frames'] == sequential['processing_info']['processed_frames']
+
+
+def test_an_inference_error_reaches_the_caller(video, model, monkeypatch):
+    predict = model.predict
+
+    def fail_later(frames, **kwargs):
+        if model.inference_calls == 30:
+            raise RuntimeError("CUDA out of memory")
+        return predict(frames, **kwargs)
+
+    monkeypatch.setattr(model, 'predict', fail_later)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        run(video, pipelined=True)
+    # the decode and inference threads are gone with it
+    assert not [t for t in threading.enumerate() if t.name in ('decode', 'inference')]
+
+
+@pytest.mark.parametrize('pipelined', [False, True])
+@pytest.mark.parametrize('batch_size', [1, 3, 8])
+def test_batched_output_matches_single_frames(video, model, batch_size, pipelined):
+    single = run(video)
+    model.inference_calls = 0
+
+    batched = run(video, batch_size=batch_size, pipelined=pipelined)
+
+    # 120 frames, one forward pass per batch, the last one short
+    assert model.inference_calls == -(-SECONDS * FPS // batch_size)
+    assert batched['defects'] == single['defects']
+
+
+def test_early_finalization_matches_finalizing_at_the_end(video, model):
+    at_the_end = run(video, finalize_after=None)
+
+    events = list(iter_process_video(
+        video, gpx(SECONDS), imu(SECONDS), segment_id=1,
+        target_fps=FPS, save_images=False, zones=ZONES, pipelined=False, finalize_after=TRACK_LOST_BUFFER
+    ))
+    early = run(video, finalize_after=TRACK_LOST_BUFFER)
+
+    # some tracks did end mid-video, ahead of the last progress event
+    kinds = [event['event'] for event in events]
+    last_progress = len(kinds) - 1 - kinds[::-1].index('progress')
+    assert 'defect' in kinds[:last_progress]
+    assert early['defects'] == at_the_end['defects']
+    assert early['processing_info']['processed_frames'] == at_the_end['processing_info']['processed_frames']
+
+
+def box(x: int) -> sv.Detections:
+    return sv.Detections(
+        xyxy=np.array([[x, 100, x + 60, 160]], dtype=np.float32),
+        confidence=np.array([0.8]),
+        class_id=np.array([0])
+    )
+
+
+def test_a_track_leaving_the_zone_for_a_while_is_not_cut_short():
+    # the box drifts out of the left-half zone for 25 frames, five times
+    # finalize_after, while the tracker keeps following it, then comes back
+    left_half = [np.array([[0, 0], [WIDTH // 2 - 1, 0], [WIDTH // 2 - 1, HEIGHT - 1], [0, HEIGHT - 1]])]
+    tracks = DefectTracks(
+        1, 1, FPS, START_TIME, WIDTH, HEIGHT, parse_gpx_track(gpx(SECONDS)), parse_imu_series(imu(SECONDS)),
+        save_images=False, finalize_after=5, export_records=True, zones=left_half
+    )
+    path = [40 + 4 * k for k in range(26)] + [140] * 20 + [136 - 4 * k for k in range(20)]
+    in_zone = [n for n, x in enumerate(path) if x + 30 < WIDTH // 2]
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    ended = []
+    for frame_number, x in enumerate(path):
+        ended += tracks.update(frame_number, frame, box(x))
+    assert ended == []
+
+    for frame_number in range(len(path), len(path) + 10):
+        ended += tracks.update(frame_number, frame, sv.Detections.empty())
+
+    assert len(ended) == 1
+    record = ended[0][1]
+    assert record['first_frame'] == 0
+    assert record['last_frame'] == len(path) - 1
+    assert len(path) - len(in_zone) == 25
+    assert [n for n, _ in record['sightings']] == in_zone
+
+
+# ---------- evidence images, against the per-frame annotation they replaced ----------
+
+def busy_frames(n: int, seed: int = 0) -> list[np.ndarray]:
+    # noisy road, so the JPEG bytes depend on every pixel
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def two_boxes(k: int) -> sv.Detections:
+    # side by side, labels overlapping the neighbour; confidences take
+    # turns peaking, so each track's best frame moves around
+    return sv.Detections(
+        xyxy=np.array([[40 + k, 100, 110 + k, 160], [130 + k, 90, 210 + k, 150]], dtype=np.float32),
+        confidence=np.array([0.5 + 0.3 * abs(np.sin(k)), 0.5 + 0.3 * abs(np.cos(k))]),
+        class_id=np.array([0, 1])
+    )
+
+
+def reference_images(frames, detections_per_frame, quality: int = 85) -> list[str]:
+    # the annotated frame as it stood when each track's best detection was drawn
+    tracker = sv.ByteTrack(minimum_matching_threshold=0.5, lost_track_buffer=TRACK_LOST_BUFFER)
+    zone = sv.PolygonZone(polygon=ZONES[0], triggering_anchors=(sv.Position.CENTER,))
+    images, best = {}, {}
+    for frame, detections in zip(frames, detections_per_frame):
+        annotated = frame.copy()
+        detections = tracker.update_with_detections(detections.with_nms(threshold=0.7))
+        detections = detections[zone.trigger(detections)]
+        for i in range(len(detections)):
+            tracker_id, confidence = detections.tracker_id[i], detections.confidence[i]
+            x1, y1, x2, y2 = map(int, detections.xyxy[i])
+            label = f"{DEFECT_CLASSES.get(detections.class_id[i], 'pothole')} {confidence:.2f}"
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(annotated, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            if tracker_id not in best or confidence > best[tracker_id]:
+                best[tracker_id] = confidence
+                _, buffer = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                images[tracker_id] = base64.b64encode(buffer).decode('utf-8')
+    return list(images.values())
+
+
+def evidence(frames, detections_per_frame, **params) -> list[dict]:
+    tracks = DefectTracks(
+        1, 1, FPS, START_TIME, WIDTH, HEIGHT, parse_gpx_track(gpx(SECONDS)), parse_imu_series(imu(SECONDS)),
+        zones=ZONES, **{'image_format': 'base64', **params}
+    )
+    for frame_number, (frame, detections) in enumerate(zip(frames, detections_per_frame)):
+        tracks.update(frame_number, frame, detections)
+    return [defect for _, defect in sorted(tracks.finish(), key=lambda item: item[0])]
+
+
+def decode(image_base64: str) -> np.ndarray:
+    return cv2.imdecode(np.frombuffer(base64.b64decode(image_base64), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_evidence_images_match_the_per_frame_annotation():
+    frames = busy_frames(12)
+    detections = [two_boxes(k) for k in range(12)]
+
+    defects = evidence(frames, detections)
+
+    assert len(defects) == 2
+    assert [d['image_base64'] for d in defects] == reference_images(frames, detections)
+
+
+def test_evidence_image_quality():
+    frames = busy_frames(6)
+    detections = [two_boxes(k) for k in range(6)]
+
+    defects = evidence(frames, detections, image_quality=40)
+
+    assert [d['image_base64'] for d in defects] == reference_images(frames, detections, quality=40)
+    assert len(defects[0]['image_base64']) < len(evidence(frames, detections)[0]['image_base64'])
+
+
+def test_evidence_crop_and_resize():
+    frame = busy_frames(1)[0]
+    boxes = ((40, 100, 110, 160, 'pothole 0.80'), (130, 90, 210, 150, 'crack 0.70'))
+    bbox = np.array([130.0, 90.0, 210.0, 150.0])
+    full = render_evidence(frame, boxes, bbox)
+
+    # the bbox plus half its size on every side, every box still drawn
+    cropped = render_evidence(frame, boxes, bbox, crop_margin=0.5)
+    np.testing.assert_array_equal(cropped, full[60:181, 90:251])
+    # clipped to the frame
+    edge = render_evidence(frame, boxes, np.array([0.0, 0.0, 50.0, 40.0]), crop_margin=1.0)
+    assert edge.shape == (81, 101, 3)
+    # longest side scaled down, the aspect ratio kept; never scaled up
+    assert render_evidence(frame, boxes, bbox, max_size=80).shape == (60, 80, 3)
+    assert render_evidence(frame, boxes, bbox, crop_margin=0.5, max_size=400).shape == cropped.shape
+    assert encode_jpeg(cropped, 90) == cv2.imencode('.jpg', cropped, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def test_evidence_options_reach_the_defects():
+    frames = busy_frames(6)
+    detections = [two_boxes(k) for k in range(6)]
+
+    defects = evidence(frames, detections, image_crop_margin=0.25, image_max_size=48)
+
+    for defect in defects:
+        height, width = decode(defect['image_base64']).shape[:2]
+        assert max(height, width) == 48
+        assert width > height
+
+
+def test_evidence_images_by_url(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / 'images'))
+    monkeypatch.setattr(defect_processor, 'image_store', store)
+    frames = busy_frames(6)
+    detections = [two_boxes(k) for k in range(6)]
+
+    defects = evidence(frames, detections, image_format='url')
+
+    for defect, expected in zip(defects, reference_images(frames, detections)):
+        assert 'image_base64' not in defect
+        assert defect['image_url'] == f"/images/{defect['image_key']}"
+        with open(store.get_path(defect['image_key']), 'rb') as f:
+            assert f.read() == base64.b64decode(expected)
+
+
+def test_no_images_when_not_saving():
+    frames = busy_frames(3)
+    defects = evidence(frames, [two_boxes(k) for k in range(3)], save_images=False)
+    assert [d['image_base64'] for d in defects] == [None, None]
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('onnx')
+torch = pytest.importorskip('torch')
+ultralytics = pytest.importorskip('ultralytics')
+
+from utils.detector_backends import OnnxModel, export_onnx, onnx_path_for
+from utils.model_registry import LoadedModel
+
+
+@pytest.fixture(scope='module')
+def weights(tmp_path_factory):
+    # an untrained yolov8n, built from its yaml: no download, and the
+    # comparison doesn't need it to find anything real
+    torch.manual_seed(0)
+    path = str(tmp_path_factory.mktemp('weights') / 'tiny.pt')
+    ultralytics.YOLO('yolov8n.yaml').save(path)
+    return path
+
+
+@pytest.fixture(scope='module')
+def onnx_model(weights):
+    return OnnxModel(export_onnx(weights, imgsz=320), weights, os.path.getmtime(weights), 'onnx')
+
+
+def frame(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    image[80:160, 100:220] = 255
+    return image
+
+
+def test_export_is_cached_next_to_the_weights(weights, onnx_model):
+    target = onnx_path_for(weights)
+    assert onnx_model.onnx_path == target
+    exported_at = os.path.getmtime(target)
+
+    assert export_onnx(weights, imgsz=320) == target
+    assert os.path.getmtime(target) == exported_at
+
+
+def test_graph_output_matches_torch(weights, onnx_model):
+    inputs = onnx_model._preprocess([frame(0), frame(1)])
+    network = ultralytics.YOLO(weights).model.float().eval()
+
+    with torch.no_grad():
+        expected = network(torch.from_numpy(inputs))[0].numpy()
+    actual = onnx_model.session.run(None, {onnx_model._input_name: inputs})[0]
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-3, atol=1e-3)
+
+
+def test_boxes_match_torch(weights, onnx_model):
+    image = frame()
+    torch_model = LoadedModel(ultralytics.YOLO(weights), weights, None, 'cpu')
+    # an untrained head scores everything about the same: take the widest
+    # gap among the top scores as the threshold, so near-ties can't flip
+    inputs = onnx_model._preprocess([image])
+    scores = np.sort(onnx_model.session.run(None, {onnx_model._input_name: inputs})[0][0, 4:].max(axis=0))[::-1][:20]
+    gap = int(np.argmax(scores[:-1] - scores[1:]))
+    conf = float(scores[gap] + scores[gap + 1]) / 2
+
+    expected = torch_model.predict(image, conf=conf, imgsz=onnx_model.imgsz)[0].boxes.data.numpy()
+    actual = onnx_model.predict(image, conf=conf)[0].boxes.data.numpy()
+
+    assert len(actual) == len(expected) > 0
+    order_expected, order_actual = np.argsort(-expected[:, 4]), np.argsort(-actual[:, 4])
+    np.testing.assert_allclose(actual[order_actual, :4], expected[order_expected, :4], atol=1.0)
+    np.testing.assert_allclose(actual[order_actual, 4], expected[order_expected, 4], atol=1e-3)
+    np.testing.assert_array_equal(actual[order_actual, 5], expected[order_expected, 5])
+    assert onnx_model.names == torch_model.names
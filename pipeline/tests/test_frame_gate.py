@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+import defect_processor
+from defect_processor import infer_batches
+from utils.frame_gate import FrameGate
+from tests.stubs import StubModel
+
+WIDTH, HEIGHT = 320, 240
+
+
+def road(seed: int = 1) -> np.ndarray:
+    # patchy asphalt, dark enough that StubModel sees nothing in it; twice
+    # the frame height so it can scroll
+    rng = np.random.default_rng(seed)
+    patches = rng.integers(40, 140, (HEIGHT * 2 // 8, WIDTH // 8), dtype=np.uint8)
+    texture = np.kron(patches, np.ones((8, 8), dtype=np.uint8))
+    return np.repeat(texture[..., None], 3, axis=2)
+
+
+def road_frame(offset: int = 0) -> np.ndarray:
+    # with one bright box for StubModel to find
+    frame = road()[HEIGHT - offset:2 * HEIGHT - offset].copy()
+    frame[150:190, 100:160] = 255
+    return frame
+
+
+def test_identical_frames_are_reused_up_to_max_reuse():
+    gate = FrameGate(max_reuse=30)
+    frame = road_frame()
+
+    decisions = [gate.should_infer(frame.copy()) for _ in range(63)]
+
+    # the first frame and every 31st after it are forced through
+    assert [k for k, infer in enumerate(decisions) if infer] == [0, 31, 62]
+    assert gate.inferred == 3
+    assert gate.reused == 60
+    assert gate.stats()['skip_rate'] == round(60 / 63, 3)
+
+
+def test_sensor_noise_and_exposure_wobble_are_reused():
+    rng = np.random.default_rng(2)
+    gate = FrameGate()
+    for k in range(100):
+        frame = road_frame() + 2 * np.sin(k / 30) + rng.normal(0, 2, (HEIGHT, WIDTH, 1))
+        gate.should_infer(np.clip(frame, 0, 255).astype(np.uint8))
+
+    assert gate.stats()['skip_rate'] >= 0.9
+
+
+def test_shifted_frame_passes_the_gate():
+    gate = FrameGate()
+    assert gate.should_infer(road_frame())
+    assert not gate.should_infer(road_frame())
+    # the road scrolls under a moving vehicle
+    assert gate.should_infer(road_frame(offset=16))
+    assert not gate.should_infer(road_frame(offset=16))
+
+
+def test_changes_outside_the_region_are_ignored():
+    gate = FrameGate(region=(0, 120, WIDTH, HEIGHT))
+    frame = road_frame()
+    assert gate.should_infer(frame)
+
+    sky = frame.copy()
+    sky[:120] = 255 - sky[:120]
+    assert not gate.should_infer(sky)
+
+    pothole = frame.copy()
+    pothole[120:] = 255 - pothole[120:]
+    assert gate.should_infer(pothole)
+
+
+def test_reused_frames_get_the_last_inferred_detections(monkeypatch):
+    offsets = []
+
+    def fake_offset_results(results, frame, dx, dy):
+        offsets.append((results, frame, dx, dy))
+        return results
+
+    monkeypatch.setattr(defect_processor, 'offset_results', fake_offset_results)
+    model = StubModel()
+    frames = [road_frame(), road_frame(), road_frame(), road_frame(offset=16), road_frame(offset=16)]
+    batches = [[(0, frames[0]), (1, frames[1])], [(2, frames[2]), (3, frames[3]), (4, frames[4])]]
+
+    out = list(infer_batches(model, batches, 0.25, gate=FrameGate()))
+
+    results = [r for _, batch_results in out for r in batch_results]
+    assert [batch for batch, _ in out] == batches
+    # one forward pass per batch, on the frames the gate let through only
+    assert model.inference_calls == 2
+    assert results[1] is results[0] and results[2] is results[0]
+    assert results[3] is not results[0] and results[4] is results[3]
+    assert len(results[0]) == 1
+    # reused detections are re-attached to the frame they now stand for, unmoved
+    assert len(offsets) == 3
+    for (r, f, dx, dy), source, frame in zip(offsets, (0, 0, 3), (1, 2, 4)):
+        assert r is results[source] and f is frames[frame] and (dx, dy) == (0, 0)
+
+
+def test_offset_results_moves_boxes_onto_the_frame():
+    pytest.importorskip('ultralytics')
+    import torch
+    from ultralytics.engine.results import Results
+
+    crop = road_frame()[100:, 50:]
+    frame = road_frame()
+    boxes = torch.tensor([[10.0, 20.0, 60.0, 80.0, 0.9, 0.0]])
+    results = Results(crop, path='clip.mp4', names={0: 'pothole'}, boxes=boxes)
+
+    moved = defect_processor.offset_results(results, frame, 50, 100)
+
+    assert moved.orig_img is frame
+    assert moved.path == 'clip.mp4'
+    assert torch.allclose(moved.boxes.data, torch.tensor([[60.0, 120.0, 110.0, 180.0, 0.9, 0.0]]))
+    # the crop's own detections are left alone
+    assert torch.equal(results.boxes.data, boxes)
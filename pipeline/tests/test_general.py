@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.general import datetime_to_ns, iter_batches, ns_to_datetime
+from utils.imu_analyzer import _parse_timestamps
+
+
+@pytest.mark.parametrize('items, batch_size, expected', [
+    (range(7), 3, [[0, 1, 2], [3, 4, 5], [6]]),
+    (range(6), 3, [[0, 1, 2], [3, 4, 5]]),
+    (range(2), 8, [[0, 1]]),
+    (range(3), 1, [[0], [1], [2]]),
+    # anything below one is one
+    (range(2), 0, [[0], [1]]),
+    ([], 4, []),
+])
+def test_iter_batches(items, batch_size, expected):
+    assert list(iter_batches(items, batch_size)) == expected
+
+
+def test_iter_batches_is_lazy():
+    pulled = []
+
+    def frames():
+        for k in range(10):
+            pulled.append(k)
+            yield k
+
+    batches = iter_batches(frames(), 4)
+    assert next(batches) == [0, 1, 2, 3]
+    # only what the first batch needed was read
+    assert pulled == [0, 1, 2, 3]
+
+
+def test_datetime_to_ns_reads_naive_times_as_wall_clock():
+    naive = datetime(2025, 1, 1, 8, 0, 0, 123456)
+
+    assert datetime_to_ns(naive) == 1735718400_123456_000
+    # as if it were UTC, whatever the local zone
+    assert datetime_to_ns(naive) == datetime_to_ns(naive.replace(tzinfo=timezone.utc))
+    assert datetime_to_ns(naive.replace(tzinfo=timezone(timedelta(hours=8)))) == 1735689600_123456_000
+    assert ns_to_datetime(datetime_to_ns(naive)) == naive
+    assert ns_to_datetime(datetime_to_ns(naive), timezone.utc) == naive.replace(tzinfo=timezone.utc)
+
+
+def test_unix_timestamps_land_on_the_same_wall_clock():
+    # a unix time read the way imu_analyzer reads it, as naive local time
+    seconds = 1735718400
+    ns, _, tzinfo = _parse_timestamps([str(seconds), str(seconds + 1)])
+    assert tzinfo is None
+    assert ns.tolist() == [datetime_to_ns(datetime.fromtimestamp(s)) for s in (seconds, seconds + 1)]
@@ -0,0 +1,301 @@
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from utils.gpx_parser import GpsTrack, get_gps_at_frame, get_gps_at_time, parse_gpx, parse_gpx_track
+
+GPX_10 = 'http://www.topografix.com/GPX/1/0'
+GPX_11 = 'http://www.topografix.com/GPX/1/1'
+
+
+# ---------- the implementation GpsTrack replaced ----------
+
+def reference_parse_gpx(gpx_content):
+    root = ET.fromstring(gpx_content)
+    namespaces = {'gpx': GPX_11, 'gpx10': GPX_10}
+    track_points = root.findall('.//gpx:trkpt', namespaces)
+    if not track_points:
+        track_points = root.findall('.//gpx10:trkpt', namespaces)
+    if not track_points:
+        track_points = root.findall('.//trkpt')
+
+    coordinates = []
+    for point in track_points:
+        elevation = None
+        # an Element without children is falsy, so only the last lookup
+        # ever counts: elevation and time were read from GPX 1.1 files only
+        ele_elem = point.find('gpx:ele', namespaces) or point.find('ele') or point.find(f'{{{GPX_11}}}ele')
+        if ele_elem is not None and ele_elem.text:
+            elevation = float(ele_elem.text)
+        timestamp = None
+        time_elem = point.find('gpx:time', namespaces) or point.find('time') or point.find(f'{{{GPX_11}}}time')
+        if time_elem is not None and time_elem.text:
+            time_str = time_elem.text
+            if time_str.endswith('Z'):
+                time_str = time_str[:-1] + '+00:00'
+            try:
+                timestamp = datetime.fromisoformat(time_str)
+            except ValueError:
+                timestamp = datetime.strptime(time_str.split('.')[0], '%Y-%m-%dT%H:%M:%S')
+        coordinates.append({
+            'lat': float(point.get('lat')), 'lng': float(point.get('lon')), 'elevation': elevation, 'timestamp': timestamp
+        })
+    return coordinates
+
+
+def reference_gps_at_time(coordinates, target_time):
+    if not coordinates:
+        return None
+    timed_coords = [c for c in coordinates if c['timestamp'] is not None]
+    if not timed_coords:
+        return {'lat': coordinates[0]['lat'], 'lng': coordinates[0]['lng']}
+    timed_coords.sort(key=lambda x: x['timestamp'])
+
+    before = after = None
+    for coord in timed_coords:
+        if coord['timestamp'] <= target_time:
+            before = coord
+        if coord['timestamp'] >= target_time and after is None:
+            after = coord
+            break
+    if before is None:
+        return {'lat': timed_coords[0]['lat'], 'lng': timed_coords[0]['lng']}
+    if after is None:
+        return {'lat': timed_coords[-1]['lat'], 'lng': timed_coords[-1]['lng']}
+    if before['timestamp'] == after['timestamp']:
+        return {'lat': before['lat'], 'lng': before['lng']}
+
+    total_time = (after['timestamp'] - before['timestamp']).total_seconds()
+    elapsed_time = (target_time - before['timestamp']).total_seconds()
+    ratio = elapsed_time / total_time if total_time > 0 else 0
+    return {
+        'lat': before['lat'] + (after['lat'] - before['lat']) * ratio,
+        'lng': before['lng'] + (after['lng'] - before['lng']) * ratio,
+    }
+
+
+def reference_gps_at_frame(coordinates, frame_number, fps, video_start_time=None):
+    if not coordinates:
+        return None
+    if video_start_time is None:
+        timed_coords = [c for c in coordinates if c['timestamp'] is not None]
+        if timed_coords:
+            video_start_time = timed_coords[0]['timestamp']
+        else:
+            if len(coordinates) == 1:
+                return {'lat': coordinates[0]['lat'], 'lng': coordinates[0]['lng']}
+            idx = min(int(frame_number / (fps * 60) * len(coordinates)), len(coordinates) - 1)
+            return {'lat': coordinates[idx]['lat'], 'lng': coordinates[idx]['lng']}
+    return reference_gps_at_time(coordinates, video_start_time + timedelta(seconds=frame_number / fps))
+
+
+# ---------- synthetic tracks ----------
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def document(points, namespace=GPX_11) -> str:
+    # points are (lat, lon, elevation, time text), None for a missing child
+    body = ''
+    for lat, lon, elevation, time in points:
+        children = ''
+        if elevation is not None:
+            children += f'<ele>{elevation}</ele>'
+        if time is not None:
+            children += f'<time>{time}</time>'
+        body += f'<trkpt lat="{lat}" lon="{lon}">{children}</trkpt>'
+    xmlns = f' xmlns="{namespace}"' if namespace else ''
+    return f'<gpx version="1.1"{xmlns}><trk><name>drive</name><trkseg>{body}</trkseg></trk></gpx>'
+
+
+def drive(n: int = 40, suffix: str = 'Z', seed: int = 0) -> list[tuple]:
+    # a wandering track, one fix a second with jittered sub-second times,
+    # some repeated, some out of order and some missing
+    rng = np.random.default_rng(seed)
+    points = []
+    for k in range(n):
+        time = START_TIME + timedelta(seconds=k, milliseconds=int(rng.integers(0, 900)))
+        if k % 7 == 3:
+            time = START_TIME + timedelta(seconds=k - 1)
+        text = time.isoformat(timespec='milliseconds') + suffix
+        if k % 13 == 8:
+            text = points[-1][3]
+        if k % 11 == 5:
+            text = None
+        lat = round(1.35 + k * 1e-4 + float(rng.normal(0, 2e-5)), 7)
+        lon = round(103.98 + k * 1e-4, 7)
+        points.append((lat, lon, round(float(rng.uniform(5, 20)), 1) if k % 4 else None, text))
+    # two fixes swapped
+    if n > 12:
+        points[10], points[12] = points[12], points[10]
+    return points
+
+
+def targets(zone=None) -> list[datetime]:
+    # before, across and after the track, with exact fix times among them
+    times = [START_TIME + timedelta(milliseconds=int(ms)) for ms in np.arange(-3000, 45000, 137)]
+    times += [START_TIME + timedelta(seconds=k) for k in range(40)]
+    return [t.replace(tzinfo=zone) for t in times]
+
+
+def assert_same_position(expected, actual):
+    assert actual['lat'] == pytest.approx(expected['lat'], rel=0, abs=1e-9)
+    assert actual['lng'] == pytest.approx(expected['lng'], rel=0, abs=1e-9)
+
+
+# ---------- parsing ----------
+
+@pytest.mark.parametrize('suffix', ['Z', '+08:00', ''])
+def test_parse_gpx_matches_the_reference(suffix):
+    content = document(drive(suffix=suffix))
+    assert parse_gpx(content) == reference_parse_gpx(content)
+
+
+def test_parse_gpx_track_columns_match_the_reference():
+    content = document(drive())
+    expected = reference_parse_gpx(content)
+    track = parse_gpx_track(content)
+
+    timed = [c for c in expected if c['timestamp'] is not None]
+    ordered = sorted(timed, key=lambda c: c['timestamp'])
+    assert track.lat.tolist() == [c['lat'] for c in ordered]
+    assert track.lng.tolist() == [c['lng'] for c in ordered]
+    np.testing.assert_array_equal(
+        track.elevation, [np.nan if c['elevation'] is None else c['elevation'] for c in ordered]
+    )
+    assert track.times_ns.tolist() == [int(c['timestamp'].timestamp() * 10 ** 6) * 1000 for c in ordered]
+    # the video is aligned to the first timestamp in file order, not the earliest
+    assert track.start_time == timed[0]['timestamp']
+    assert track.untimed_lat.tolist() == [c['lat'] for c in expected]
+    assert len(track) == len(expected)
+
+
+@pytest.mark.parametrize('namespace', [GPX_10, None])
+def test_gpx_10_and_unnamespaced_files(namespace):
+    points = drive(10)
+    content = document(points, namespace)
+
+    coordinates = parse_gpx(content)
+    # the reference found the points but never their elevation or time
+    assert [(c['lat'], c['lng']) for c in coordinates] == [
+        (c['lat'], c['lng']) for c in reference_parse_gpx(content)
+    ]
+    assert coordinates == parse_gpx(document(points))
+    assert parse_gpx_track(content).times_ns.tolist() == parse_gpx_track(document(points)).times_ns.tolist()
+
+
+# ---------- lookups ----------
+
+@pytest.mark.parametrize('suffix, zone', [('Z', timezone.utc), ('', None)])
+def test_at_time_matches_the_reference(suffix, zone):
+    # aware times against aware targets, naive against naive
+    content = document(drive(suffix=suffix))
+    coordinates = reference_parse_gpx(content)
+    track = parse_gpx_track(content)
+
+    for target in targets(zone):
+        expected = reference_gps_at_time(coordinates, target)
+        assert_same_position(expected, track.at_time(target))
+        assert_same_position(expected, get_gps_at_time(coordinates, target))
+
+
+def test_other_offsets_are_compared_in_utc():
+    content = document(drive(suffix='+08:00'))
+    coordinates = reference_parse_gpx(content)
+    track = parse_gpx_track(content)
+
+    for target in targets(timezone(timedelta(hours=8))):
+        assert_same_position(reference_gps_at_time(coordinates, target), track.at_time(target))
+    # the same instants written in UTC
+    for target in targets(timezone(timedelta(hours=8)))[::10]:
+        utc = target.astimezone(timezone.utc)
+        assert_same_position(reference_gps_at_time(coordinates, utc), track.at_time(utc))
+
+
+def test_duplicate_times_take_the_first_fix():
+    track = GpsTrack.from_coordinates([
+        {'lat': 1.0, 'lng': 2.0, 'elevation': None, 'timestamp': START_TIME},
+        {'lat': 5.0, 'lng': 6.0, 'elevation': None, 'timestamp': START_TIME + timedelta(seconds=2)},
+        {'lat': 7.0, 'lng': 8.0, 'elevation': None, 'timestamp': START_TIME + timedelta(seconds=2)},
+        {'lat': 9.0, 'lng': 10.0, 'elevation': None, 'timestamp': START_TIME + timedelta(seconds=4)},
+    ])
+
+    assert track.at_time(START_TIME + timedelta(seconds=2)) == {'lat': 5.0, 'lng': 6.0}
+    assert track.at_time(START_TIME + timedelta(seconds=1)) == {'lat': 3.0, 'lng': 4.0}
+    # past the duplicates, interpolated from the last of them
+    assert track.at_time(START_TIME + timedelta(seconds=3)) == {'lat': 8.0, 'lng': 9.0}
+
+
+def test_times_outside_the_track_clamp_to_its_ends():
+    content = document(drive())
+    coordinates = reference_parse_gpx(content)
+    track = parse_gpx_track(content)
+
+    early, late = datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2030, 1, 1, tzinfo=timezone.utc)
+    assert track.at_time(early) == {'lat': track.lat[0], 'lng': track.lng[0]}
+    assert track.at_time(late) == {'lat': track.lat[-1], 'lng': track.lng[-1]}
+    assert track.at_time(early) == reference_gps_at_time(coordinates, early)
+    assert track.at_time(late) == reference_gps_at_time(coordinates, late)
+
+
+@pytest.mark.parametrize('video_start_time', [None, START_TIME.replace(tzinfo=timezone.utc) - timedelta(seconds=2)])
+def test_at_frame_matches_the_reference(video_start_time):
+    content = document(drive())
+    coordinates = reference_parse_gpx(content)
+    track = parse_gpx_track(content)
+
+    frames = list(range(0, 30 * 45, 7))
+    lat, lng = track.at_frames(frames, 30, video_start_time)
+    for k, frame in enumerate(frames):
+        expected = reference_gps_at_frame(coordinates, frame, 30, video_start_time)
+        assert_same_position(expected, {'lat': lat[k], 'lng': lng[k]})
+        assert_same_position(expected, track.at_frame(frame, 30, video_start_time))
+        assert_same_position(expected, get_gps_at_frame(coordinates, frame, 30, video_start_time))
+
+
+@pytest.mark.parametrize('n', [1, 5])
+def test_untimed_tracks_match_the_reference(n):
+    content = document([(1.35 + k * 1e-4, 103.98, None, None) for k in range(n)])
+    coordinates = reference_parse_gpx(content)
+    track = parse_gpx_track(content)
+
+    assert not track.timed
+    assert track.start_time is None
+    target = START_TIME.replace(tzinfo=timezone.utc)
+    assert track.at_time(target) == reference_gps_at_time(coordinates, target)
+    for frame in range(0, 30 * 90, 97):
+        assert track.at_frame(frame, 30) == reference_gps_at_frame(coordinates, frame, 30)
+        assert track.at_frame(frame, 30, target) == reference_gps_at_frame(coordinates, frame, 30, target)
+
+
+def test_empty_tracks():
+    content = document([])
+    assert parse_gpx(content) == []
+    track = parse_gpx_track(content)
+    assert track.at_time(START_TIME) is None
+    assert track.at_frame(0, 30) is None
+    assert get_gps_at_time([], START_TIME) is None
+
+
+def test_waypoints_and_routes_do_not_pile_up_in_memory():
+    n = 20000
+    waypoints = ''.join(f'<wpt lat="1.{k:05d}" lon="103.9"><ele>1</ele><name>w{k}</name></wpt>' for k in range(n))
+    route = '<rte>' + ''.join(f'<rtept lat="1.{k:05d}" lon="103.9"><name>r</name></rtept>' for k in range(n)) + '</rte>'
+    points = ''.join(
+        f'<trkpt lat="1.{k:05d}" lon="103.9"><time>2025-01-01T08:00:{k:02d}Z</time></trkpt>' for k in range(10)
+    )
+    content = f'<gpx version="1.1" xmlns="{GPX_11}">{waypoints}{route}<trk><trkseg>{points}</trkseg></trk></gpx>'.encode()
+
+    tracemalloc.start()
+    try:
+        track = parse_gpx_track(content)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert len(track) == 10
+    # some 20 MB with all 40000 elements kept in the tree
+    assert peak < 5_000_000
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from utils.image_store import ImageStore
+
+JPEG = b'\xff\xd8\xff\xe0' + b'evidence' * 100
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(str(tmp_path / 'images'), retention_seconds=3600)
+
+
+def age(store: ImageStore, key: str, seconds: float) -> None:
+    then = time.time() - seconds
+    os.utime(store.path_for(key), (then, then))
+
+
+def test_put_names_images_by_their_hash(store):
+    key = store.put(JPEG)
+
+    assert key == hashlib.sha256(JPEG).hexdigest()
+    assert store.get_path(key) == store.path_for(key)
+    with open(store.get_path(key), 'rb') as f:
+        assert f.read() == JPEG
+    # no temporary files left next to it
+    assert os.listdir(os.path.dirname(store.path_for(key))) == [f'{key}.jpg']
+
+
+def test_storing_an_image_again_refreshes_it(store):
+    key = store.put(JPEG)
+    age(store, key, 7200)
+
+    assert store.put(JPEG) == key
+    assert time.time() - os.path.getmtime(store.path_for(key)) < 60
+    assert store.cleanup() == 0
+
+
+def test_an_image_cleaned_up_while_being_stored_is_written_again(store, monkeypatch):
+    key = store.put(JPEG)
+    utime = os.utime
+
+    def cleaned_up_first(path, *args, **kwargs):
+        # cleanup removes the file between the exists() check and the utime
+        os.remove(path)
+        return utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'utime', cleaned_up_first)
+    assert store.put(JPEG) == key
+    monkeypatch.undo()
+
+    with open(store.get_path(key), 'rb') as f:
+        assert f.read() == JPEG
+
+
+def test_get_path_rejects_anything_but_a_key(store):
+    store.put(JPEG)
+    assert store.get_path('../../etc/passwd') is None
+    assert store.get_path('0' * 64) is None
+
+
+def test_pin_and_unpin(store):
+    key = store.put(JPEG)
+
+    assert store.pin(key)
+    assert store.is_pinned(key)
+    # pinning twice is fine, one unpin undoes it
+    assert store.pin(key)
+    assert store.unpin(key)
+    assert not store.is_pinned(key)
+    assert not store.unpin(key)
+    assert not store.pin('0' * 64)
+    assert not store.unpin('not a key')
+
+
+def test_cleanup_keeps_pinned_and_recent_images(store):
+    old, pinned, recent = (store.put(JPEG + bytes([k])) for k in range(3))
+    age(store, old, 7200)
+    age(store, pinned, 7200)
+    store.pin(pinned)
+
+    assert store.cleanup() == 1
+
+    assert store.get_path(old) is None
+    assert store.get_path(pinned) is not None
+    assert store.get_path(recent) is not None
+    # unpinned, it goes with the next run
+    store.unpin(pinned)
+    assert store.cleanup() == 1
+    assert store.get_path(pinned) is None
+
+
+def test_cleanup_of_a_missing_directory(store):
+    assert store.cleanup() == 0
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(main, 'image_store', store)
+    # no lifespan: the cleanup task and the job manager are not started
+    return TestClient(main.app)
+
+
+def test_images_are_served_with_an_etag(client, store):
+    key = store.put(JPEG)
+
+    response = client.get(f'/images/{key}')
+
+    assert response.status_code == 200
+    assert response.content == JPEG
+    assert response.headers['content-type'] == 'image/jpeg'
+    assert response.headers['etag'] == f'"{key}"'
+    assert 'immutable' in response.headers['cache-control']
+
+
+def test_a_matching_etag_gets_a_304(client, store):
+    key = store.put(JPEG)
+
+    response = client.get(f'/images/{key}', headers={'If-None-Match': f'"{key}"'})
+
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == f'"{key}"'
+    other = client.get(f'/images/{key}', headers={'If-None-Match': '"something else"'})
+    assert other.status_code == 200
+
+
+def test_unknown_images_are_404(client):
+    assert client.get(f'/images/{"0" * 64}').status_code == 404
+    assert client.get('/images/not-a-key').status_code == 404
+
+
+def test_pin_endpoints(client, store):
+    key = store.put(JPEG)
+
+    assert client.put(f'/images/{key}/pin').status_code == 204
+    assert store.is_pinned(key)
+    assert client.delete(f'/images/{key}/pin').status_code == 204
+    assert client.delete(f'/images/{key}/pin').status_code == 404
+    assert client.put(f'/images/{"0" * 64}/pin').status_code == 404
@@ -0,0 +1,160 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils.general import datetime_to_ns
+from utils.imu_analyzer import ImuSeries, _parse_timestamp, parse_imu_series
+
+
+def row_by_row(values: list[str]) -> list:
+    # what the original per-row parser made of each timestamp
+    parsed = [_parse_timestamp(v) for v in values]
+    return [datetime_to_ns(t) if t is not None else None for t in parsed]
+
+
+def parsed(values: list[str]) -> list:
+    csv = 'timestamp,accel_x,accel_y,accel_z\n' + ''.join(f'{v},0,0,9.81\n' for v in values)
+    series = parse_imu_series(csv)
+    return [int(ns) if ok else None for ns, ok in zip(series.timestamps_ns, series.has_time)]
+
+
+@pytest.fixture
+def berlin_time(monkeypatch):
+    if not hasattr(time, 'tzset'):
+        pytest.skip("needs time.tzset")
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_unix_seconds_across_dst_change(berlin_time):
+    # 2024-03-31 01:00 UTC, Berlin moves from +01:00 to +02:00
+    values = [str(1711846800 + i * 600) for i in range(-3, 4)]
+    assert parsed(values) == row_by_row(values)
+
+
+def test_unix_milliseconds_across_dst_change(berlin_time):
+    values = [str((1711846800 + i * 600) * 1000 + 250) for i in range(-3, 4)]
+    assert parsed(values) == row_by_row(values)
+
+
+def test_iso_timestamps_match_row_parser():
+    values = ['2025-01-01T08:00:00', '2025-01-01T08:00:00.250000', '2025-01-01T08:00:01']
+    assert parsed(values) == row_by_row(values)
+
+
+def test_offsets_are_applied_per_row():
+    values = ['2025-01-01T08:00:00+08:00', '2025-01-01T01:00:00+01:00', '2025-01-01T00:00:00.500000+00:00']
+    assert parsed(values) == row_by_row(values)
+
+
+def test_date_only_and_minute_precision_stay_untimed():
+    values = ['2025-01-01 08:00:00', '2025-01-01', '2025-01-01 08:00', '2025-01-01 08:00:01.5']
+    result = parsed(values)
+    assert result == row_by_row(values)
+    assert result[1] is None and result[2] is None
+
+
+def series_from(seconds: list, accel_z: list, has_time: list = None) -> ImuSeries:
+    n = len(seconds)
+    timestamps = np.array([int(s * 1e9) for s in seconds], dtype=np.int64)
+    channels = {
+        'accel_x': np.linspace(0.1, 0.5, n),
+        'accel_y': np.linspace(-0.2, 0.3, n),
+        'accel_z': np.array(accel_z, dtype=np.float64),
+    }
+    return ImuSeries(timestamps, np.ones(n, dtype=bool) if has_time is None else np.array(has_time), channels)
+
+
+def scan_window(series: ImuSeries, start_ns: int, end_ns: int) -> tuple[int, float, float]:
+    # the mask-and-reduce the prefix sums replace
+    mask = series.has_time & (series.timestamps_ns >= start_ns) & (series.timestamps_ns <= end_ns)
+    count = int(mask.sum())
+    if not count:
+        return 0, 0.0, 0.0
+    magnitude = np.sqrt(series.accel_x[mask]**2 + series.accel_y[mask]**2 + series.accel_z[mask]**2)
+    z = series.accel_z[mask]
+    return count, float(np.var(magnitude)), float(np.sqrt(np.mean((z - z.mean())**2)))
+
+
+def scan_nearest(series: ImuSeries, t: int) -> int:
+    # first-minimum argmin over the timed rows, as get_imu_at_frame did
+    timed = np.flatnonzero(series.has_time)
+    return int(timed[np.argmin(np.abs(series.timestamps_ns[timed] - t))])
+
+
+@pytest.fixture
+def series():
+    # out of file order, one duplicate timestamp and one untimed row
+    return series_from(
+        [3.0, 1.0, 2.0, 2.0, 5.0, 4.0, 0.0, 6.5],
+        [9.9, 9.7, 10.4, 8.8, 9.81, 11.2, 9.5, 9.0],
+        [True, True, True, True, True, True, True, False]
+    )
+
+
+@pytest.mark.parametrize('start, end', [
+    (0.0, 6.0),     # everything timed
+    (1.0, 2.0),     # inclusive on both ends, with the duplicate
+    (2.0, 2.0),     # a single instant
+    (1.5, 1.9),     # between two samples
+    (-5.0, -1.0),   # before the first sample
+    (-5.0, 0.0),    # ending on the first sample
+    (5.5, 9.0),     # after the last timed sample, over the untimed one
+    (4.0, 3.0),     # start after end
+])
+def test_window_stats_match_scan(series, start, end):
+    start_ns, end_ns = int(start * 1e9), int(end * 1e9)
+    count, variance, rms = scan_window(series, start_ns, end_ns)
+
+    counts, variances = series.windows.magnitude_variance(np.array([start_ns]), np.array([end_ns]))
+    _, z_rms = series.windows.accel_z_rms(np.array([start_ns]), np.array([end_ns]))
+
+    assert counts[0] == count
+    if count:
+        assert variances[0] == pytest.approx(variance, abs=1e-12)
+        assert z_rms[0] == pytest.approx(rms, abs=1e-12)
+
+
+def test_window_stats_batch_matches_single_windows(series):
+    starts = np.array([0, 1, 3, -2], dtype=np.int64) * 1_000_000_000
+    ends = starts + 2_000_000_000
+
+    counts, variances = series.windows.magnitude_variance(starts, ends)
+
+    for i, (s, e) in enumerate(zip(starts, ends)):
+        count, variance, _ = scan_window(series, s, e)
+        assert counts[i] == count
+        if count:
+            assert variances[i] == pytest.approx(variance, abs=1e-12)
+
+
+@pytest.mark.parametrize('t', [
+    -3.0,   # before the first sample
+    0.0,    # exactly on a sample
+    1.5,    # tie between 1.0 and the duplicated 2.0
+    2.0,    # the duplicate: the earlier row wins
+    2.5,    # tie between the duplicate and 3.0
+    4.49,
+    4.5,    # tie between rows 5 and 4, in reverse file order
+    6.4,    # nearer the untimed row than any timed one
+    100.0,  # after the last sample
+])
+def test_nearest_matches_argmin(series, t):
+    t_ns = int(t * 1e9)
+    assert series.time_index.nearest(np.array([t_ns]))[0] == scan_nearest(series, t_ns)
+
+
+def test_nearest_batch(series):
+    targets = (np.arange(-10, 80) * 1e8).astype(np.int64)
+    expected = [scan_nearest(series, t) for t in targets]
+    assert series.time_index.nearest(targets).tolist() == expected
+
+
+def test_nearest_without_timestamps():
+    series = series_from([0.0, 1.0], [9.8, 9.8], [False, False])
+    with pytest.raises(ValueError):
+        series.time_index.nearest(np.array([0]))
@@ -0,0 +1,229 @@
+import os
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+import supervision as sv
+
+from defect_processor import detection_meta
+from rescore import rescore
+from tests.test_chunked_processor import FPS, HEIGHT, WIDTH, ZONES, gpx, imu
+from utils.detection_cache import DetectionRecorder
+from utils.general import deep_clean
+from utils import jobs
+from utils.jobs import COMPLETED, FAILED, RUNNING, JobManager, JobQueueFull
+from tests.stubs import stub_job
+
+
+def record(path: str, seconds: int) -> str:
+    # a box crossing the frame every two seconds, as the model would have seen it
+    video_info = sv.VideoInfo(width=WIDTH, height=HEIGHT, fps=FPS, total_frames=seconds * FPS)
+    recorder = DetectionRecorder(detection_meta(video_info, FPS, 'fixed', None, False, 'stub.pt', 'stub'))
+    frames, boxes = [], []
+    for k in range(seconds * FPS):
+        frames.append(k)
+        if k % 20 < 10:
+            x = 20 + (k % 20) * 5
+            boxes.append([x, 100, x + 60, 160])
+    counts = [1 if k % 20 < 10 else 0 for k in frames]
+    recorder.extend({
+        'frames': np.array(frames),
+        'counts': np.array(counts),
+        'boxes': np.array(boxes, dtype=np.float32),
+        'scores': np.full(len(boxes), 0.8, dtype=np.float32),
+        'classes': np.zeros(len(boxes), dtype=np.uint8),
+    })
+    recorder.save(path)
+    return path
+
+
+@pytest.fixture
+def job_manager():
+    manager = JobManager(max_workers=1)
+    manager.start()
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def stub_jobs(monkeypatch):
+    # pickled by name, so the workers import and run tests.stubs.stub_job
+    monkeypatch.setattr(jobs, '_run_job', stub_job)
+
+
+def wait_until(condition, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def work_dir(tmp_path, name: str = 'job') -> str:
+    path = tmp_path / name
+    path.mkdir()
+    (path / 'video.mp4').write_bytes(b'upload')
+    return str(path)
+
+
+def events(job) -> list:
+    received = []
+    while (event := job.events.get(timeout=60)) is not None:
+        received.append(event)
+    return received
+
+
+def test_submit_runs_the_job_and_removes_its_work_dir(tmp_path, stub_jobs, job_manager):
+    job = job_manager.submit({'frames': 3}, work_dir=work_dir(tmp_path), inputs={'video': {'size': 6}})
+
+    assert job.future.result(timeout=60) == {'defects': [], 'processing_info': {'processed_frames': 3}}
+    wait_until(lambda: not os.path.exists(job.work_dir))
+    assert job.status == COMPLETED
+    assert job.started_at is not None
+    assert job_manager.get(job.id) is job
+    assert job.to_dict()['inputs'] == {'video': {'size': 6}}
+
+
+def test_progress_and_defects_reach_a_streaming_job(tmp_path, stub_jobs, job_manager):
+    release = str(tmp_path / 'release')
+    job = job_manager.submit({'frames': 3, 'release': release}, work_dir=work_dir(tmp_path), stream=True)
+
+    # progress still arriving once the job has finished is dropped, so
+    # look while it is held open
+    wait_until(lambda: job.frames_processed == 3)
+    assert job.status == RUNNING
+    assert job.to_dict()['progress'] == {'frames_processed': 3, 'frames_total': 3, 'fraction': 1.0}
+    open(release, 'w').close()
+    received = events(job)
+
+    assert [(e['frames_processed'], e['frames_total']) for e in received if e['event'] == 'progress'] == [
+        (1, 3), (2, 3), (3, 3)
+    ]
+    assert [e['track_index'] for e in received if e['event'] == 'defect'] == [0, 1, 2]
+    job.future.result(timeout=60)
+    wait_until(lambda: job.finished_at is not None)
+    assert job.status == COMPLETED
+
+
+def test_a_failed_job_reports_its_error_and_is_cleaned_up(tmp_path, stub_jobs, job_manager):
+    job = job_manager.submit({'fail': "no frames"}, work_dir=work_dir(tmp_path))
+
+    with pytest.raises(ValueError):
+        job.future.result(timeout=60)
+    wait_until(lambda: not os.path.exists(job.work_dir))
+    assert job.status == FAILED
+    assert job.error == "no frames"
+
+
+def test_the_queue_is_bounded(tmp_path, stub_jobs):
+    manager = JobManager(max_workers=1, max_queue=1)
+    release = str(tmp_path / 'release')
+    try:
+        running = manager.submit({'release': release}, work_dir=work_dir(tmp_path, 'running'))
+        queued = manager.submit({'release': release}, work_dir=work_dir(tmp_path, 'queued'))
+        assert manager.active_count() == 2
+
+        with pytest.raises(JobQueueFull):
+            manager.submit({}, work_dir=work_dir(tmp_path, 'rejected'))
+        assert manager.active_count() == 2
+
+        open(release, 'w').close()
+        running.future.result(timeout=60)
+        queued.future.result(timeout=60)
+        wait_until(lambda: manager.active_count() == 0)
+        manager.submit({}).future.result(timeout=60)
+    finally:
+        manager.shutdown()
+
+
+def test_a_job_that_fails_to_submit_frees_its_slot(monkeypatch):
+    manager = JobManager(max_workers=1, max_queue=0)
+
+    def shut_down(fn, *args):
+        raise RuntimeError("cannot schedule new futures after shutdown")
+
+    monkeypatch.setattr(manager, '_submit', shut_down)
+    with pytest.raises(RuntimeError):
+        manager.submit({})
+    assert manager.active_count() == 0
+    assert manager.list_jobs() == []
+
+
+def test_a_crashed_worker_gets_a_new_pool(tmp_path, stub_jobs, job_manager):
+    broken = job_manager._executor
+    crashed = job_manager.submit({'crash': True}, work_dir=work_dir(tmp_path, 'crashed'), stream=True)
+
+    with pytest.raises(BrokenProcessPool):
+        crashed.future.result(timeout=60)
+    wait_until(lambda: not os.path.exists(crashed.work_dir))
+    assert crashed.status == FAILED
+    # the stream still ends, without the 'finished' a dead worker never sent
+    events(crashed)
+
+    wait_until(lambda: job_manager._executor is not broken)
+    job = job_manager.submit({'frames': 2}, work_dir=work_dir(tmp_path))
+    assert job.future.result(timeout=60)['processing_info']['processed_frames'] == 2
+
+
+def test_rescore_runs_in_a_worker(tmp_path, job_manager):
+    seconds = 6
+    detections_path = record(str(tmp_path / 'detections.npz'), seconds)
+    (tmp_path / 'track.gpx').write_text(gpx(seconds))
+    (tmp_path / 'imu.csv').write_text(imu(seconds))
+    options = {'segment_id': 1, 'vehicle_id': 1, 'confidence_threshold': 0.5, 'zones': ZONES}
+
+    result = job_manager.rescore({
+        'detections_path': detections_path,
+        'gpx_path': str(tmp_path / 'track.gpx'),
+        'imu_path': str(tmp_path / 'imu.csv'),
+        **options,
+    }).result(timeout=60)
+    expected = deep_clean(rescore(detections_path, gpx(seconds), imu(seconds), **options))
+
+    assert len(result['defects']) == 3
+    assert result['defects'] == expected['defects']
+    assert result['processing_info']['rescored']
+
+
+def test_rescore_errors_come_back_from_the_worker(tmp_path, job_manager):
+    detections_path = record(str(tmp_path / 'detections.npz'), 2)
+    (tmp_path / 'track.gpx').write_text(gpx(2))
+    (tmp_path / 'imu.csv').write_text(imu(2))
+
+    future = job_manager.rescore({
+        'detections_path': detections_path,
+        'gpx_path': str(tmp_path / 'track.gpx'),
+        'imu_path': str(tmp_path / 'imu.csv'),
+        'segment_id': 1,
+        'confidence_threshold': 0.0,
+    })
+    # below the recording floor, which /rescore answers with a 422
+    with pytest.raises(ValueError, match="recording floor"):
+        future.result(timeout=60)
+
+
+def test_rescores_count_against_the_queue_bound(monkeypatch):
+    manager = JobManager(max_workers=1, max_queue=1)
+    futures = []
+
+    def submit(fn, *args):
+        futures.append(Future())
+        return futures[-1], None
+
+    monkeypatch.setattr(manager, '_submit', submit)
+    manager.rescore({})
+    manager.rescore({})
+    assert manager.active_count() == 2
+
+    with pytest.raises(JobQueueFull):
+        manager.rescore({})
+    # processing jobs wait behind the same rescores
+    with pytest.raises(JobQueueFull):
+        manager.submit({})
+
+    futures[0].set_result({})
+    assert manager.active_count() == 1
+    manager.rescore({})
+    assert manager.active_count() == 2
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import live_processor
+from live_processor import FAILED, STOPPED, LatestFrame, LiveManager, LiveSession, SourceNotAllowed, check_source
+from tests.stubs import StubModel
+
+WIDTH, HEIGHT = 1920, 1080
+
+
+def drive_frames(pattern: str) -> list[np.ndarray]:
+    # '#' is a frame with a box in the road zone, '.' an empty road
+    frames = []
+    for k, cell in enumerate(pattern):
+        frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        if cell == '#':
+            x = 400 + 20 * k
+            frame[700:850, x:x + 150] = 255
+        frames.append(frame)
+    return frames
+
+
+def run_session(monkeypatch, pattern: str, **params) -> tuple[LiveSession, list[int]]:
+    # the source hands over one frame at a time and waits for it to be
+    # processed, so no frame is dropped; published[k] is defects_total after frame k
+    published = []
+    session = None
+
+    def frames(source, loop=False, realtime=False):
+        for frame in drive_frames(pattern):
+            expected = session.processed + 1
+            yield frame
+            deadline = time.monotonic() + 5
+            while session.processed < expected and time.monotonic() < deadline:
+                time.sleep(0.001)
+            published.append(session.defects_total)
+
+    monkeypatch.setattr(live_processor, 'get_stream_frames_generator', frames)
+    monkeypatch.setattr(live_processor, 'get_model', lambda *args, **kwargs: StubModel())
+
+    session = LiveSession('rtsp://camera/stream', segment_id=7, target_fps=0, image_format='base64', **params)
+    now = time.time()
+    session.sensors.add_gps([{'timestamp': now + t, 'lat': 1.35 + t * 1e-5, 'lng': 103.98 + t * 1e-5} for t in range(-30, 60)])
+    session.sensors.add_imu([
+        {'timestamp': now - 30 + k / 100, 'accel_x': 0.0, 'accel_y': 0.0, 'accel_z': 9.81 + (k % 7) * 0.1}
+        for k in range(9000)
+    ])
+    session.start()
+    session._worker.join(timeout=30)
+    session._reader.join(timeout=5)
+    return session, published
+
+
+def test_latest_frame_keeps_only_the_newest():
+    frames = LatestFrame()
+    for k in range(3):
+        frames.put(f'frame {k}')
+
+    frame_number, captured_at, frame = frames.get(timeout=0)
+
+    assert (frame_number, frame) == (2, 'frame 2')
+    assert frames.captured == 3
+    assert frames.dropped == 2
+    assert frames.get(timeout=0) is None
+
+
+def test_latest_frame_picked_up_frames_are_not_dropped():
+    frames = LatestFrame()
+    for k in range(3):
+        frames.put(k)
+        assert frames.get(timeout=0)[2] == k
+
+    assert frames.dropped == 0
+
+
+def test_latest_frame_close_wakes_a_waiting_consumer():
+    frames = LatestFrame()
+    got = []
+    consumer = threading.Thread(target=lambda: got.append(frames.get(timeout=10)))
+    consumer.start()
+    time.sleep(0.05)
+
+    frames.close()
+    consumer.join(timeout=1)
+
+    assert not consumer.is_alive()
+    assert got == [None]
+
+
+def test_session_finalizes_tracks_as_they_end(monkeypatch):
+    session, published = run_session(monkeypatch, '#####' + '.' * 8 + '#####' + '..', finalize_after=3)
+
+    assert session.status == STOPPED, session.error
+    defects, cursor = session.defects_since(0)
+    assert cursor == len(defects) == 2
+
+    # the first box's track ended while the stream was still running
+    assert published[4] == 0
+    assert published[12] == 1
+
+    for defect in defects:
+        assert 1.34 < defect['coordinates_lat'] < 1.36
+        assert 103.97 < defect['coordinates_lng'] < 103.99
+        assert defect['image_base64']
+
+    summary = session.summary
+    assert summary['processing_info']['frames_processed'] == len(published)
+    assert summary['iri_measurement']['segment_id'] == 7
+
+
+def test_session_keeps_only_the_last_defects(monkeypatch):
+    session, _ = run_session(monkeypatch, '###' + '.' * 6 + '###' + '.' * 6 + '###', finalize_after=2, max_defects=2)
+
+    assert session.defects_total == 3
+    defects, cursor = session.defects_since(0)
+    assert cursor == 3
+    assert len(defects) == 2
+    assert session.defects_since(2) == ([defects[-1]], 3)
+    assert session.defects_since(3) == ([], 3)
+
+
+def test_session_fails_when_the_source_cannot_be_read(monkeypatch):
+    def broken(source, loop=False, realtime=False):
+        raise Exception("Error: Could not open video stream.")
+        yield
+
+    monkeypatch.setattr(live_processor, 'get_stream_frames_generator', broken)
+    monkeypatch.setattr(live_processor, 'get_model', lambda *args, **kwargs: StubModel())
+    session = LiveSession('rtsp://camera/stream', segment_id=1)
+    session.start()
+    session.stop()
+
+    assert session.status == FAILED
+    assert session.stopped_at is not None
+
+
+def test_manager_forgets_ended_sessions_after_the_ttl(monkeypatch):
+    manager = LiveManager(session_ttl=0)
+    monkeypatch.setattr(LiveSession, 'start', lambda self: None)
+    session = manager.start(source='rtsp://camera/stream', segment_id=1)
+    assert manager.list_sessions() == [session]
+
+    session.status = STOPPED
+    session.stopped_at = session.started_at
+    assert manager.list_sessions() == []
+
+
+@pytest.mark.parametrize('source, allow_local, allowed', [
+    ('rtsp://camera/stream', False, True),
+    ('RTSPS://camera/stream', False, True),
+    ('http://example.com/video.mp4', False, False),
+    ('file:///etc/passwd', False, False),
+    ('/data/drive.mp4', False, False),
+    ('0', False, False),
+    ('/data/drive.mp4', True, True),
+    ('0', True, True),
+])
+def test_check_source(source, allow_local, allowed):
+    if allowed:
+        check_source(source, allow_local=allow_local)
+    else:
+        with pytest.raises(SourceNotAllowed):
+            check_source(source, allow_local=allow_local)
@@ -0,0 +1,148 @@
+import math
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from utils.metrics import Counter, MetricsRegistry, StageTimer, _Metric, jobs_total, stage_seconds, timed
+
+SAMPLE = re.compile(
+    r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)'
+    r'(?:\{(?P<labels>[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"(?:,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*")*)\})?'
+    r' (?P<value>[-+]?(?:[0-9.]+(?:e[-+]?[0-9]+)?|Inf|NaN))$'
+)
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text: str) -> dict[str, dict]:
+    # the Prometheus text format (0.0.4), strictly: HELP and TYPE once per
+    # family, before its samples, and every sample in the family it follows
+    assert text.endswith('\n')
+    families: dict[str, dict] = {}
+    current = None
+    for line in text[:-1].split('\n'):
+        if line.startswith('# HELP '):
+            name, help_text = line[7:].split(' ', 1)
+            assert name not in families
+            current = families[name] = {'help': help_text, 'type': None, 'samples': []}
+        elif line.startswith('# TYPE '):
+            name, kind = line[7:].split(' ')
+            assert current is families[name] and current['type'] is None and not current['samples']
+            assert kind in ('counter', 'gauge', 'histogram')
+            current['type'] = kind
+        else:
+            match = SAMPLE.match(line)
+            assert match, line
+            name = match['name']
+            family = name
+            if current['type'] == 'histogram':
+                family = re.sub(r'_(bucket|sum|count)$', '', name)
+            assert family in families and families[family] is current, line
+            labels = dict(LABEL.findall(match['labels'] or ''))
+            current['samples'].append((name, labels, float(match['value'].replace('Inf', 'inf'))))
+    return families
+
+
+def check_histogram(family: dict) -> None:
+    series: dict[tuple, list] = {}
+    for name, labels, value in family['samples']:
+        key = tuple(sorted((k, v) for k, v in labels.items() if k != 'le'))
+        series.setdefault(key, []).append((name, labels.get('le'), value))
+    for samples in series.values():
+        buckets = [(float(le.replace('Inf', 'inf')), value) for name, le, value in samples if name.endswith('_bucket')]
+        counts = [value for _, value in buckets]
+        # cumulative, ending with +Inf at the total count
+        assert [le for le, _ in buckets] == sorted(le for le, _ in buckets)
+        assert buckets[-1][0] == math.inf
+        assert counts == sorted(counts)
+        count = [value for name, _, value in samples if name.endswith('_count')]
+        assert count == [counts[-1]]
+        assert len([name for name, _, _ in samples if name.endswith('_sum')]) == 1
+
+
+def test_registry_renders_every_kind():
+    registry = MetricsRegistry()
+    counter = registry.counter('jobs_total', "Jobs finished")
+    registry.gauge('queue_depth', "Jobs waiting", lambda: 3)
+    histogram = registry.histogram('job_seconds', "Job run time", buckets=(1, 10))
+    counter.inc(status='completed')
+    counter.inc(2, status='failed')
+    counter.inc(status='completed')
+    histogram.observe(0.5, stage='decode')
+    histogram.observe(4, stage='decode')
+    histogram.observe(50, stage='decode')
+
+    assert registry.render() == (
+        '# HELP jobs_total Jobs finished\n'
+        '# TYPE jobs_total counter\n'
+        'jobs_total{status="completed"} 2\n'
+        'jobs_total{status="failed"} 2\n'
+        '# HELP queue_depth Jobs waiting\n'
+        '# TYPE queue_depth gauge\n'
+        'queue_depth 3\n'
+        '# HELP job_seconds Job run time\n'
+        '# TYPE job_seconds histogram\n'
+        'job_seconds_bucket{stage="decode",le="1"} 1\n'
+        'job_seconds_bucket{stage="decode",le="10"} 2\n'
+        'job_seconds_bucket{stage="decode",le="+Inf"} 3\n'
+        'job_seconds_sum{stage="decode"} 54.5\n'
+        'job_seconds_count{stage="decode"} 3\n'
+    )
+    check_histogram(parse(registry.render())['job_seconds'])
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('errors_total', "Errors").inc(message='bad "path"\\\nhere')
+
+    families = parse(registry.render())
+
+    assert families['errors_total']['samples'] == [('errors_total', {'message': 'bad \\"path\\"\\\\\\nhere'}, 1.0)]
+
+
+def test_a_metric_must_provide_samples():
+    with pytest.raises(TypeError):
+        _Metric('broken', "No samples")
+
+    class Broken(_Metric):
+        kind = 'gauge'
+
+    with pytest.raises(TypeError):
+        Broken('broken', "No samples")
+    assert isinstance(Counter('ok_total', "Fine"), _Metric)
+
+
+def test_registering_a_name_twice_returns_the_first_metric():
+    registry = MetricsRegistry()
+    first = registry.counter('jobs_total', "Jobs finished")
+    assert registry.counter('jobs_total', "Jobs finished") is first
+
+
+def test_stage_timer():
+    timer = StageTimer()
+    with timer.stage('decode'):
+        pass
+    assert list(timed(range(3), timer, 'read')) == [0, 1, 2]
+
+    assert timer.calls == {'decode': 1, 'read': 4}
+    assert set(timer.stats()['stage_seconds']) == {'decode', 'read'}
+
+
+def test_metrics_endpoint_serves_valid_exposition_text():
+    stage_seconds.observe(0.02, stage='test_metrics')
+    jobs_total.inc(status='test_metrics')
+
+    response = TestClient(main.app).get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'text/plain; version=0.0.4; charset=utf-8'
+    families = parse(response.text)
+    assert families['pipeline_jobs_total']['type'] == 'counter'
+    assert ('pipeline_jobs_total', {'status': 'test_metrics'}, 1.0) in families['pipeline_jobs_total']['samples']
+    assert families['pipeline_queue_depth']['type'] == 'gauge'
+    assert families['pipeline_queue_depth']['samples'] == [('pipeline_queue_depth', {}, 0.0)]
+    assert families['pipeline_stage_seconds']['type'] == 'histogram'
+    for family in families.values():
+        if family['type'] == 'histogram':
+            check_histogram(family)
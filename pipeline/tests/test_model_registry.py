@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+
+import pytest
+
+from utils.model_registry import LoadedModel, ModelRegistry
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    # keys _load was called for, in order; no weights are read
+    calls = []
+
+    def load(self, weights_path, key):
+        calls.append(key)
+        path, mtime, device, _ = key
+        return LoadedModel(object(), path, mtime, device)
+
+    monkeypatch.setattr(ModelRegistry, '_load', load)
+    return calls
+
+
+def weights(tmp_path, name: str) -> str:
+    path = tmp_path / name
+    path.write_bytes(b'weights')
+    return str(path)
+
+
+def test_models_are_cached_per_key(tmp_path, loads):
+    registry = ModelRegistry(max_models=2)
+    path = weights(tmp_path, 'a.pt')
+
+    model = registry.get(path, 'cpu', warm_up=False)
+
+    assert registry.get(path, 'cpu', warm_up=False) is model
+    assert registry.get(path, 'cuda', warm_up=False) is not model
+    assert len(loads) == 2
+    assert loads[0] == (path, os.path.getmtime(path), 'cpu', 'torch')
+
+
+def test_least_recently_used_model_is_evicted(tmp_path, loads):
+    registry = ModelRegistry(max_models=2)
+    a, b, c = (weights(tmp_path, name) for name in ('a.pt', 'b.pt', 'c.pt'))
+
+    first = registry.get(a, 'cpu', warm_up=False)
+    registry.get(b, 'cpu', warm_up=False)
+    # a is used again, so b is now the oldest
+    registry.get(a, 'cpu', warm_up=False)
+    registry.get(c, 'cpu', warm_up=False)
+
+    assert [m['weights_path'] for m in registry.list_models()] == [a, c]
+    assert registry.get(a, 'cpu', warm_up=False) is first
+    registry.get(b, 'cpu', warm_up=False)
+    assert [key[0] for key in loads] == [a, b, c, b]
+
+
+def test_changed_weights_are_reloaded(tmp_path, loads):
+    registry = ModelRegistry()
+    path = weights(tmp_path, 'a.pt')
+    old = registry.get(path, 'cpu', warm_up=False)
+
+    mtime = os.path.getmtime(path) + 60
+    os.utime(path, (mtime, mtime))
+    new = registry.get(path, 'cpu', warm_up=False)
+
+    assert new is not old
+    assert new.mtime == mtime
+    assert registry.get(path, 'cpu', warm_up=False) is new
+    assert len(loads) == 2
+
+
+def test_concurrent_callers_share_one_load(tmp_path, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_load(self, weights_path, key):
+        calls.append(key)
+        assert release.wait(10)
+        return LoadedModel(object(), key[0], key[1], key[2])
+
+    monkeypatch.setattr(ModelRegistry, '_load', slow_load)
+    registry = ModelRegistry()
+    path = weights(tmp_path, 'a.pt')
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get(path, 'cpu', warm_up=False)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    # everyone is in get() while the one load is still running
+    while not calls:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(model is results[0] for model in results)
+
+
+@pytest.mark.parametrize('failing', ['load', 'warm_up'])
+def test_a_failed_load_is_retried(tmp_path, monkeypatch, failing):
+    attempts = []
+
+    class Model(LoadedModel):
+
+        def warm_up(self) -> None:
+            if failing == 'warm_up' and len(attempts) == 1:
+                raise RuntimeError("CUDA out of memory")
+            self.warmed_up = True
+
+    def flaky_load(self, weights_path, key):
+        attempts.append(key)
+        if failing == 'load' and len(attempts) == 1:
+            raise RuntimeError("CUDA out of memory")
+        return Model(object(), key[0], key[1], key[2])
+
+    monkeypatch.setattr(ModelRegistry, '_load', flaky_load)
+    registry = ModelRegistry()
+    path = weights(tmp_path, 'a.pt')
+
+    with pytest.raises(RuntimeError):
+        registry.get(path, 'cpu')
+    assert registry.list_models() == []
+    assert registry._loading == {}
+
+    model = registry.get(path, 'cpu')
+    assert model.warmed_up
+    assert len(attempts) == 2
+    assert registry.get(path, 'cpu') is model
+
+
+def test_backends(tmp_path, loads):
+    registry = ModelRegistry()
+    path = weights(tmp_path, 'a.onnx')
+
+    with pytest.raises(ValueError, match="Unknown detector backend"):
+        registry.get(path, 'cpu', backend='tensorrt')
+    # ONNX Runtime always runs on the CPU
+    registry.get(path, 'cuda', warm_up=False, backend='onnx')
+    assert loads[-1][2:] == ('cpu', 'onnx')
@@ -0,0 +1,138 @@
+import json
+import time
+
+import pytest
+
+from main import ProcessingForm, processing_params, result_cache_key
+from utils import result_cache
+from utils.image_store import ImageStore
+from utils.result_cache import ResultCache, cache_key
+
+INPUTS = {name: {'sha256': name * 8} for name in ('video', 'gpx', 'imu')}
+
+
+def result(defects: int = 1, padding: int = 0, image_key=None) -> dict:
+    return {
+        'defects': [{'track_index': k, 'image_key': image_key} for k in range(defects)],
+        'processing_info': {'padding': 'x' * padding},
+    }
+
+
+def size_of(value: dict) -> int:
+    return len(json.dumps(value).encode())
+
+
+@pytest.fixture
+def params(tmp_path):
+    weights = tmp_path / 'best.pt'
+    weights.write_bytes(b'weights')
+    return {**processing_params(ProcessingForm(segment_id=1)), 'weights_path': str(weights)}
+
+
+def test_cache_key_ignores_field_order():
+    assert cache_key({'a': 1, 'b': [1, 2]}) == cache_key({'b': [1, 2], 'a': 1})
+    assert cache_key({'a': 1}) != cache_key({'a': 2})
+
+
+def test_scheduling_options_share_a_result(params):
+    key = result_cache_key(INPUTS, params)
+
+    # batching and pipelining give the same defects, see test_defect_processor
+    assert result_cache_key(INPUTS, {**params, 'batch_size': 16, 'pipelined': not params['pipelined']}) == key
+    assert result_cache_key(INPUTS, {**params, 'confidence_threshold': 0.5}) != key
+    assert result_cache_key({**INPUTS, 'video': {'sha256': 'other'}}, params) != key
+    assert result_cache_key(INPUTS, {**params, 'detections_path': '/tmp/x.npz'}) != key
+
+
+def test_weights_are_keyed_by_content(params, tmp_path):
+    key = result_cache_key(INPUTS, params)
+
+    with open(params['weights_path'], 'ab') as f:
+        f.write(b' retrained')
+    assert result_cache_key(INPUTS, params) != key
+    # hub names can't be hashed, so they are never cached
+    assert result_cache_key(INPUTS, {**params, 'weights_path': str(tmp_path / 'yolov8s.pt')}) is None
+
+
+def test_results_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results'), max_bytes=10_000)
+    key = cache_key({'job': 1})
+
+    assert cache.get(key) is None
+    cache.put(key, result())
+
+    assert cache.get(key) == result()
+    # and from a fresh index read back from disk
+    assert ResultCache(str(tmp_path / 'results'), max_bytes=10_000).get(key) == result()
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    entry = size_of(result(padding=1000))
+    cache = ResultCache(str(tmp_path / 'results'), max_bytes=3 * entry)
+    a, b, c, d = (cache_key({'job': k}) for k in range(4))
+
+    for key in (a, b, c):
+        cache.put(key, result(padding=1000))
+        # file times are only as fine as the kernel clock tick
+        time.sleep(0.02)
+    # a is used again, so b is now the oldest
+    assert cache.get(a) is not None
+    time.sleep(0.02)
+    cache.put(d, result(padding=1000))
+
+    assert cache.get(b) is None
+    assert all(cache.get(key) is not None for key in (a, c, d))
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 3
+    assert stats['bytes'] <= cache.max_bytes
+
+
+def test_oversized_results_are_not_cached(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results'), max_bytes=100)
+    key = cache_key({'job': 1})
+
+    cache.put(key, result(padding=1000))
+
+    assert cache.get(key) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_a_zero_budget_turns_the_cache_off(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results'), max_bytes=0)
+    cache.put(cache_key({'job': 1}), result())
+
+    assert not cache.enabled
+    assert cache.get(cache_key({'job': 1})) is None
+    assert not (tmp_path / 'results').exists()
+
+
+def test_a_result_whose_images_are_gone_is_a_miss(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / 'images'))
+    monkeypatch.setattr(result_cache, 'image_store', store)
+    cache = ResultCache(str(tmp_path / 'results'), max_bytes=10_000)
+    image_key = store.put(b'\xff\xd8evidence')
+    key = cache_key({'job': 1})
+    cache.put(key, result(defects=2, image_key=image_key))
+
+    assert cache.get(key) is not None
+    store.cleanup(retention_seconds=-1)
+
+    assert cache.get(key) is None
+    # and the entry is dropped, not checked again every time
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['misses'] == 1
+
+
+def test_invalidate(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results'), max_bytes=10_000)
+    keys = [cache_key({'job': k}) for k in range(3)]
+    for key in keys:
+        cache.put(key, result())
+
+    assert cache.invalidate(keys[0]) == 1
+    assert cache.invalidate(keys[0]) == 0
+    assert cache.get(keys[0]) is None
+    assert cache.invalidate() == 2
+    assert cache.stats()['entries'] == 0
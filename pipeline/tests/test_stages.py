@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from utils.stages import BackgroundIterator
+
+
+class Source:
+    # an iterable that records whether it was closed, and on which thread
+
+    def __init__(self, items, fail_at=None, delay=0.0) -> None:
+        self.items = items
+        self.fail_at = fail_at
+        self.delay = delay
+        self.closed = threading.Event()
+        self.busy = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.items:
+            raise StopIteration
+        item = self.items.pop(0)
+        if item == self.fail_at:
+            raise ValueError(f"failed at {item}")
+        self.busy.set()
+        time.sleep(self.delay)
+        self.busy.clear()
+        return item
+
+    def close(self) -> None:
+        self.closed.set()
+
+
+def test_items_come_through_in_order():
+    source = Source(list(range(50)))
+    assert list(BackgroundIterator(source, maxsize=2)) == list(range(50))
+    assert source.closed.is_set()
+
+
+def test_a_producer_error_reaches_the_consumer_after_the_items_before_it():
+    source = Source(list(range(10)), fail_at=6)
+    received = []
+
+    with pytest.raises(ValueError, match="failed at 6"):
+        for item in BackgroundIterator(source):
+            received.append(item)
+
+    assert received == [0, 1, 2, 3, 4, 5]
+    assert source.closed.is_set()
+
+
+def test_close_cascades_upstream():
+    source = Source(list(range(1000)))
+    decode = BackgroundIterator(source, maxsize=2, name='decode')
+    inference = BackgroundIterator((item * 2 for item in decode), maxsize=2, name='inference')
+
+    consumer = iter(inference)
+    assert [next(consumer) for _ in range(3)] == [0, 2, 4]
+    consumer.close()
+
+    # both producers have stopped and the source was released, long before
+    # it ran out
+    assert not inference._thread.is_alive()
+    assert not decode._thread.is_alive()
+    assert source.closed.is_set()
+    assert len(source.items) > 900
+
+
+def test_close_waits_for_the_item_in_progress():
+    # the producer is still inside the source when the consumer gives up;
+    # whatever the caller releases after close() must no longer be in use
+    source = Source(list(range(10)), delay=0.5)
+    stage = BackgroundIterator(source, maxsize=1)
+    assert source.busy.wait(5)
+
+    stage.close()
+
+    assert not source.busy.is_set()
+    assert not stage._thread.is_alive()
+    assert source.closed.is_set()
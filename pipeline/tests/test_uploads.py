@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from utils.uploads import MultipartUpload, UploadTarget, UploadTooLarge
+
+BOUNDARY = 'test-boundary'
+
+
+class FakeRequest:
+    # just what MultipartUpload reads: the content type and the body, in chunks
+
+    def __init__(self, body: bytes, chunk_size: int = 7, content_type: str = f'multipart/form-data; boundary={BOUNDARY}') -> None:
+        self.headers = {'content-type': content_type}
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+def multipart_body(fields: dict, files: dict) -> bytes:
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+            + value.encode() + b'\r\n'
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'.encode()
+            + data + b'\r\n'
+        )
+    return b''.join(parts) + f'--{BOUNDARY}--\r\n'.encode()
+
+
+def receive(tmp_path, body: bytes, max_bytes: int = 1024, chunk_size: int = 7):
+    targets = {
+        'video': UploadTarget(str(tmp_path / 'video.mp4'), max_bytes, ('.mp4',), "Video must be MP4"),
+        'imu': UploadTarget(str(tmp_path / 'imu.csv'), max_bytes),
+    }
+    upload = MultipartUpload(targets, max_field_bytes=64, chunk_size=16)
+    return asyncio.run(upload.receive(FakeRequest(body, chunk_size)))
+
+
+def test_files_are_written_and_hashed_in_place(tmp_path):
+    video = os.urandom(700)
+    body = multipart_body({'segment_id': '3', 'note': 'héllo'}, {'video': ('clip.MP4', video), 'imu': ('imu.csv', b'')})
+
+    fields, inputs = receive(tmp_path, body)
+
+    assert fields == {'segment_id': '3', 'note': 'héllo'}
+    assert inputs['video'] == {'filename': 'clip.MP4', 'size': 700, 'sha256': hashlib.sha256(video).hexdigest()}
+    assert (tmp_path / 'video.mp4').read_bytes() == video
+    assert inputs['imu']['size'] == 0
+    assert (tmp_path / 'imu.csv').read_bytes() == b''
+
+
+def test_file_limit_is_enforced_while_reading(tmp_path):
+    body = multipart_body({}, {'video': ('clip.mp4', b'x' * 2000), 'imu': ('imu.csv', b'x')})
+
+    with pytest.raises(UploadTooLarge):
+        receive(tmp_path, body, max_bytes=1000)
+
+    # stopped at the limit, not after the whole part
+    assert os.path.getsize(tmp_path / 'video.mp4') <= 1000
+
+
+def test_field_limit(tmp_path):
+    body = multipart_body({'zones': 'x' * 100}, {'video': ('clip.mp4', b'x'), 'imu': ('imu.csv', b'x')})
+
+    with pytest.raises(UploadTooLarge):
+        receive(tmp_path, body)
+
+
+def test_wrong_suffix_is_refused_before_writing(tmp_path):
+    body = multipart_body({}, {'video': ('clip.txt', b'x'), 'imu': ('imu.csv', b'x')})
+
+    with pytest.raises(HTTPException) as error:
+        receive(tmp_path, body)
+
+    assert error.value.status_code == 400
+    assert not (tmp_path / 'video.mp4').exists()
+
+
+def test_missing_file(tmp_path):
+    body = multipart_body({}, {'video': ('clip.mp4', b'x')})
+
+    with pytest.raises(HTTPException) as error:
+        receive(tmp_path, body)
+
+    assert error.value.status_code == 422
+
+
+def test_not_multipart(tmp_path):
+    upload = MultipartUpload({})
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload.receive(FakeRequest(b'{}', content_type='application/json')))
+
+    assert error.value.status_code == 415
@@ -0,0 +1,101 @@
+import math
+import os
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from utils.general import datetime_to_ns
+
+SAMPLE_DISTANCE_M = float(os.environ.get('SAMPLE_DISTANCE_M', 1.5))
+MIN_SAMPLE_FPS = float(os.environ.get('MIN_SAMPLE_FPS', 1))
+# below this the vehicle counts as stationary (1 m/s = 3.6 km/h)
+STATIONARY_SPEED = float(os.environ.get('STATIONARY_SPEED', 1.0))
+# speed is the displacement over this window, which evens out GPS jitter
+SPEED_WINDOW_SECONDS = 3.0
+
+SAMPLING_MODES = ('fixed', 'distance')
+
+_EARTH_RADIUS_M = 6371000.0
+
+
+def _distance_m(lat1: np.ndarray, lng1: np.ndarray, lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    # equirectangular, plenty at a few metres apart
+    lat = np.radians((lat1 + lat2) / 2)
+    dx = np.radians(lng2 - lng1) * np.cos(lat)
+    dy = np.radians(lat2 - lat1)
+    return _EARTH_RADIUS_M * np.hypot(dx, dy)
+
+
+def frame_speeds(
+    gps_track,
+    start_time: datetime,
+    frame_count: int,
+    fps: float,
+    window_seconds: float = SPEED_WINDOW_SECONDS
+) -> np.ndarray:
+    # m/s at every source frame; NaN where the track doesn't cover the video
+    times = datetime_to_ns(start_time) + np.round(np.arange(frame_count) / fps * 1e9).astype(np.int64)
+    half = int(window_seconds / 2 * 1e9)
+    lat0, lng0, _ = gps_track.interpolate(times - half)
+    lat1, lng1, _ = gps_track.interpolate(times + half)
+    speeds = _distance_m(lat0, lng0, lat1, lng1) / window_seconds
+
+    covered = (times >= gps_track.times_ns[0]) & (times <= gps_track.times_ns[-1])
+    speeds[~covered] = np.nan
+    return speeds
+
+
+def distance_schedule(
+    gps_track,
+    start_time: Optional[datetime],
+    total_frames: int,
+    source_fps: float,
+    distance_m: float = SAMPLE_DISTANCE_M,
+    min_fps: float = MIN_SAMPLE_FPS,
+    max_fps: float = 10,
+    stationary_speed: float = STATIONARY_SPEED
+) -> Optional[tuple[np.ndarray, dict]]:
+    """
+    Frame numbers to sample, one every `distance_m` of travel, no closer
+    than 1/max_fps and no further apart than 1/min_fps while moving.
+    Stationary stretches get no frames at all; stretches without GPS
+    coverage are sampled at max_fps.
+
+    Returns None when the track has no timestamps to derive speed from.
+    """
+    if not gps_track.timed or start_time is None or total_frames <= 0:
+        return None
+
+    speeds = frame_speeds(gps_track, start_time, total_frames, source_fps)
+    known = ~np.isnan(speeds)
+    moving = ~known | (speeds >= stationary_speed)
+    # uncovered frames advance by exactly the distance that max_fps would give
+    step = np.where(known, speeds, distance_m * max_fps) / source_fps
+    travelled = np.cumsum(np.where(moving, step, 0.0))
+
+    min_gap = max(1, math.ceil(source_fps / max_fps))
+    max_gap = max(min_gap, int(source_fps / min_fps)) if min_fps > 0 else total_frames
+    moving_frames = np.flatnonzero(moving)
+
+    frames = []
+    frame = int(moving_frames[0]) if len(moving_frames) else total_frames
+    while frame < total_frames:
+        frames.append(frame)
+        following = int(np.searchsorted(travelled, travelled[frame] + distance_m, side='left'))
+        following = max(following, frame + min_gap)
+        if following > frame + max_gap:
+            following = frame + max_gap
+            # the min_fps bound only applies while moving
+            if following < total_frames and not moving[following]:
+                k = int(np.searchsorted(moving_frames, following))
+                following = int(moving_frames[k]) if k < len(moving_frames) else total_frames
+        frame = following
+
+    stats = {
+        'sample_distance_m': distance_m,
+        'min_fps': min_fps,
+        'max_fps': max_fps,
+        'stationary_seconds': round(float((~moving).sum()) / source_fps, 2),
+    }
+    return np.array(frames, dtype=np.int64), stats
@@ -0,0 +1,148 @@
+import io
+import json
+import os
+from collections.abc import Iterator
+from typing import Optional
+
+import numpy as np
+import supervision as sv
+
+from utils.result_cache import DiskCache
+
+# detections are recorded down to this confidence, rescoring can't go lower
+DETECTION_FLOOR = float(os.environ.get('DETECTION_FLOOR', 0.05))
+
+DEFAULT_DETECTION_DIR = os.environ.get(
+    'DETECTION_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'detections')
+)
+# 0 turns recording off
+DEFAULT_DETECTION_MAX_BYTES = int(os.environ.get('DETECTION_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+FORMAT_VERSION = 1
+
+
+class DetectionRecorder:
+    """Model output for every sampled frame of a video, before tracking.
+
+    Saved as an .npz of flat arrays: the sampled frame numbers, how many
+    detections each has, and all the boxes (float32 xyxy), scores (float32)
+    and classes (uint8) back to back.
+    """
+
+    def __init__(self, meta: dict) -> None:
+        self.meta = meta
+        self._frames: list[int] = []
+        self._counts: list[int] = []
+        self._boxes: list[np.ndarray] = []
+        self._scores: list[np.ndarray] = []
+        self._classes: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def add(self, frame_number: int, results) -> None:
+        boxes = results.boxes
+        self._frames.append(frame_number)
+        self._counts.append(len(boxes))
+        self._boxes.append(boxes.xyxy.cpu().numpy().astype(np.float32))
+        self._scores.append(boxes.conf.cpu().numpy().astype(np.float32))
+        self._classes.append(boxes.cls.cpu().numpy().astype(np.uint8))
+
+    def arrays(self, start_frame: int = 0, end_frame: Optional[int] = None) -> dict:
+        # frames in [start_frame, end_frame) only
+        keep = [
+            i for i, frame in enumerate(self._frames)
+            if frame >= start_frame and (end_frame is None or frame < end_frame)
+        ]
+        return {
+            'frames': np.array([self._frames[i] for i in keep], dtype=np.int32),
+            'counts': np.array([self._counts[i] for i in keep], dtype=np.int32),
+            'boxes': np.concatenate([self._boxes[i] for i in keep]) if keep else np.zeros((0, 4), np.float32),
+            'scores': np.concatenate([self._scores[i] for i in keep]) if keep else np.zeros(0, np.float32),
+            'classes': np.concatenate([self._classes[i] for i in keep]) if keep else np.zeros(0, np.uint8),
+        }
+
+    def extend(self, arrays: dict) -> None:
+        # appends frames recorded elsewhere (a chunk), in frame order
+        offsets = np.concatenate([[0], np.cumsum(arrays['counts'])])
+        for i, frame in enumerate(arrays['frames']):
+            a, b = offsets[i], offsets[i + 1]
+            self._frames.append(int(frame))
+            self._counts.append(int(b - a))
+            self._boxes.append(arrays['boxes'][a:b])
+            self._scores.append(arrays['scores'][a:b])
+            self._classes.append(arrays['classes'][a:b])
+
+    def save(self, path: str) -> int:
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.array(json.dumps({'version': FORMAT_VERSION, **self.meta})), **self.arrays())
+        data = buffer.getvalue()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so a rescore never reads a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(data)
+
+
+class RecordedDetections:
+    """A saved DetectionRecorder, replayed frame by frame as sv.Detections."""
+
+    def __init__(self, path: str) -> None:
+        with np.load(path) as data:
+            self.meta = json.loads(str(data['meta']))
+            if self.meta.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported detections file version {self.meta.get('version')}")
+            self.frames = data['frames']
+            self.counts = data['counts']
+            self.boxes = data['boxes']
+            self.scores = data['scores']
+            self.classes = data['classes']
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+
+    @property
+    def floor(self) -> float:
+        return self.meta['floor']
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __iter__(self) -> Iterator[tuple[int, sv.Detections]]:
+        for i, frame in enumerate(self.frames):
+            a, b = self.offsets[i], self.offsets[i + 1]
+            yield int(frame), sv.Detections(
+                xyxy=self.boxes[a:b],
+                confidence=self.scores[a:b],
+                class_id=self.classes[a:b].astype(int)
+            )
+
+
+class DetectionStore(DiskCache):
+    """Recorded detections, keyed by video, weights and sampling (see
+    cache_key). Files are written by the workers and registered here once
+    their job is done."""
+
+    suffix = '.npz'
+
+    def __init__(self, root: str = DEFAULT_DETECTION_DIR, max_bytes: int = DEFAULT_DETECTION_MAX_BYTES) -> None:
+        super().__init__(root, max_bytes)
+
+    def get_path(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._load_index() or not os.path.exists(self.path_for(key)):
+                self.misses += 1
+                return None
+            self._touch(key)
+            self.hits += 1
+            return self.path_for(key)
+
+
+detection_store = DetectionStore()
@@ -0,0 +1,177 @@
+import ast
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+
+from utils.model_registry import LoadedModel
+
+logger = logging.getLogger(__name__)
+
+# 0 leaves it to ONNX Runtime, which uses one thread per physical core
+DEFAULT_INTRA_OP_THREADS = int(os.environ.get('ORT_INTRA_OP_THREADS', 0))
+ONNX_IMGSZ = int(os.environ.get('ONNX_IMGSZ', 640))
+
+_export_lock = threading.Lock()
+
+
+def _onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise RuntimeError("The onnx backends need onnxruntime and onnx installed") from e
+    return onnxruntime
+
+
+def onnx_path_for(weights_path: str, int8: bool = False) -> str:
+    stem, _ = os.path.splitext(weights_path)
+    return f"{stem}.int8.onnx" if int8 else f"{stem}.onnx"
+
+
+def _is_fresh(artifact: str, source: str) -> bool:
+    return os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(source)
+
+
+def export_onnx(weights_path: str, imgsz: int = ONNX_IMGSZ) -> str:
+    # cached next to the weights, exported again only when the weights change
+    if not os.path.exists(weights_path):
+        raise FileNotFoundError(f"Weights not found at {weights_path}, cannot export to ONNX")
+    target = onnx_path_for(weights_path)
+
+    with _export_lock:
+        if _is_fresh(target, weights_path):
+            return target
+
+        from ultralytics import YOLO
+
+        logger.info("Exporting %s to ONNX", weights_path)
+        # exported from a private copy and renamed, so other processes never
+        # load a half-written file
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(target))) as tmp:
+            copy = os.path.join(tmp, os.path.basename(weights_path))
+            shutil.copy2(weights_path, copy)
+            exported = YOLO(copy).export(format='onnx', imgsz=imgsz, dynamic=True)
+            os.replace(exported, target)
+    return target
+
+
+def quantize_int8(weights_path: str) -> str:
+    """
+    INT8 weights (dynamic quantization: activations are quantized per batch
+    at run time), so no calibration frames are needed.
+    """
+    source = export_onnx(weights_path)
+    target = onnx_path_for(weights_path, int8=True)
+
+    with _export_lock:
+        if _is_fresh(target, source):
+            return target
+
+        import onnx
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing %s to INT8", source)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), suffix='.onnx')
+        os.close(fd)
+        try:
+            quantize_dynamic(source, tmp_path, weight_type=QuantType.QUInt8)
+            # class names, stride and imgsz live in the metadata, which the
+            # quantizer drops
+            quantized = onnx.load(tmp_path)
+            del quantized.metadata_props[:]
+            quantized.metadata_props.extend(onnx.load(source, load_external_data=False).metadata_props)
+            onnx.save(quantized, tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return target
+
+
+class OnnxModel(LoadedModel):
+    """A YOLO detection graph exported to ONNX, run by ONNX Runtime on CPU.
+
+    Letterboxing, NMS and box scaling are ultralytics' own, so predict()
+    returns the same Results objects as the torch backend.
+    """
+
+    def __init__(
+        self,
+        onnx_path: str,
+        weights_path: str,
+        mtime: Optional[float],
+        backend: str,
+        intra_op_threads: int = DEFAULT_INTRA_OP_THREADS
+    ) -> None:
+        super().__init__(None, weights_path, mtime, 'cpu')
+        ort = _onnxruntime()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+
+        self.onnx_path = onnx_path
+        self.backend = backend
+        self.intra_op_threads = intra_op_threads
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self._names = ast.literal_eval(metadata['names'])
+        self.stride = int(metadata.get('stride', 32))
+        self.imgsz = ast.literal_eval(metadata.get('imgsz', f'[{ONNX_IMGSZ}, {ONNX_IMGSZ}]'))
+        self._input_name = self.session.get_inputs()[0].name
+
+    @property
+    def names(self) -> dict:
+        return self._names
+
+    def _preprocess(self, frames: list[np.ndarray]) -> np.ndarray:
+        from ultralytics.data.augment import LetterBox
+
+        # same minimal padding as the torch backend when every frame matches
+        letterbox = LetterBox(self.imgsz, auto=len({f.shape for f in frames}) == 1, stride=self.stride)
+        batch = np.stack([letterbox(image=f) for f in frames])
+        batch = batch[..., ::-1].transpose(0, 3, 1, 2)
+        return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+    def predict(self, frames, conf: float = 0.25, iou: float = 0.7, max_det: int = 300, **kwargs) -> list:
+        import torch
+        from ultralytics.engine.results import Results
+        from ultralytics.utils import ops
+        try:
+            from ultralytics.utils.nms import non_max_suppression
+        except ImportError:
+            # ultralytics before utils.nms was split out of ops
+            non_max_suppression = ops.non_max_suppression
+
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        inputs = self._preprocess(frames)
+
+        with self._lock:
+            self.inference_calls += 1
+            outputs = self.session.run(None, {self._input_name: inputs})[0]
+
+        detections = non_max_suppression(torch.from_numpy(outputs), conf, iou, max_det=max_det)
+        results = []
+        for frame, pred in zip(frames, detections):
+            pred[:, :4] = ops.scale_boxes(inputs.shape[2:], pred[:, :4], frame.shape)
+            results.append(Results(frame, path='', names=self._names, boxes=pred[:, :6]))
+        return results
+
+    def info(self) -> dict:
+        return {
+            **super().info(),
+            'onnx_path': self.onnx_path,
+            'intra_op_threads': self.intra_op_threads,
+        }
+
+
+def load_onnx_model(weights_path: str, mtime: Optional[float], backend: str) -> OnnxModel:
+    onnx_path = quantize_int8(weights_path) if backend == 'onnx-int8' else export_onnx(weights_path)
+    return OnnxModel(onnx_path, weights_path, mtime, backend)
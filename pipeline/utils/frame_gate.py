@@ -0,0 +1,74 @@
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# mean absolute difference in gray levels (0-255) below which a frame is
+# considered unchanged
+DEFAULT_GATE_THRESHOLD = float(os.environ.get('FRAME_GATE_THRESHOLD', 3.0))
+# unchanged frames in a row before one is inferred anyway
+DEFAULT_GATE_MAX_REUSE = int(os.environ.get('FRAME_GATE_MAX_REUSE', 30))
+THUMBNAIL_WIDTH = 64
+
+
+class FrameGate:
+    """Decides whether a frame has changed enough since the last inferred one
+    to be worth a forward pass.
+
+    Frames are compared as small blurred grayscale thumbnails of `region`
+    (x1, y1, x2, y2), normally the road zones' bounding box.
+    """
+
+    def __init__(
+        self,
+        region: Optional[tuple] = None,
+        threshold: float = DEFAULT_GATE_THRESHOLD,
+        max_reuse: int = DEFAULT_GATE_MAX_REUSE,
+        thumbnail_width: int = THUMBNAIL_WIDTH
+    ) -> None:
+        self.region = region
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.thumbnail_width = thumbnail_width
+
+        self._reference: Optional[np.ndarray] = None
+        self._reused_in_row = 0
+        self.inferred = 0
+        self.reused = 0
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        if self.region is not None:
+            x1, y1, x2, y2 = self.region
+            frame = frame[y1:y2, x1:x2]
+        height, width = frame.shape[:2]
+        size = (self.thumbnail_width, max(1, round(height * self.thumbnail_width / width)))
+        # INTER_AREA averages blocks, which also smooths out sensor noise
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        # an inferred frame becomes the new reference
+        thumbnail = self.thumbnail(frame)
+        if (
+            self._reference is not None
+            and self._reused_in_row < self.max_reuse
+            and np.abs(thumbnail - self._reference).mean() < self.threshold
+        ):
+            self._reused_in_row += 1
+            self.reused += 1
+            return False
+
+        self._reference = thumbnail
+        self._reused_in_row = 0
+        self.inferred += 1
+        return True
+
+    def stats(self) -> dict:
+        total = self.inferred + self.reused
+        return {
+            'gate_threshold': self.threshold,
+            'inferred_frames': self.inferred,
+            'reused_frames': self.reused,
+            'skip_rate': round(self.reused / total, 3) if total else 0.0,
+        }
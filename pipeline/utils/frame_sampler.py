@@ -0,0 +1,107 @@
+import math
+from collections.abc import Iterator
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class FrameSampler:
+    """Yields (frame_number, frame) for sampled frames only.
+
+    Sample times are k / target_fps seconds, each mapped to the nearest source
+    frame, so non-integer ratios (29.97 -> 10) keep the requested rate. Frames
+    in between are grabbed without being decoded to pixels, and gaps longer
+    than `seek_threshold` frames are skipped with a seek instead.
+
+    A `schedule` of ascending frame numbers replaces the fixed-rate grid.
+    """
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture,
+        source_fps: float,
+        target_fps: float,
+        seek_threshold: int = 120,
+        start_sample: int = 0,
+        schedule: Optional[np.ndarray] = None
+    ) -> None:
+        self.cap = cap
+        self.source_fps = source_fps
+        self.target_fps = min(target_fps, source_fps) if target_fps > 0 else source_fps
+        self.seek_threshold = seek_threshold
+        self.schedule = schedule
+
+        self.decoded_frames = 0
+        self.skipped_frames = 0
+        self.seeks = 0
+
+        self._position = 0  # index of the next frame the capture will return
+        # starting later keeps the same sample grid as a full pass
+        self._sample_index = start_sample
+
+    def _next_target(self) -> int:
+        target = self.frame_for_sample(self._sample_index)
+        self._sample_index += 1
+        return target
+
+    def _seek(self, frame_number: int) -> bool:
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number):
+            return False
+        # some backends accept the call but land elsewhere
+        if int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_number:
+            return False
+        self.seeks += 1
+        self.skipped_frames += frame_number - self._position
+        self._position = frame_number
+        return True
+
+    def _advance_to(self, frame_number: int) -> bool:
+        gap = frame_number - self._position
+        if gap > self.seek_threshold and self._seek(frame_number):
+            return True
+
+        while self._position < frame_number:
+            if not self.cap.grab():
+                return False
+            self._position += 1
+            self.skipped_frames += 1
+        return True
+
+    def __iter__(self) -> Iterator[tuple[int, np.ndarray]]:
+        while True:
+            if self.schedule is not None and self._sample_index >= len(self.schedule):
+                break
+            target = self._next_target()
+            if target < self._position:
+                # two sample times rounded onto the same source frame
+                continue
+            if not self._advance_to(target):
+                break
+
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self._position += 1
+            self.decoded_frames += 1
+
+            yield target, frame
+
+    def frame_for_sample(self, sample_index: int) -> int:
+        if self.schedule is not None:
+            return int(self.schedule[sample_index])
+        return int(round(sample_index * self.source_fps / self.target_fps))
+
+    def expected_samples(self, total_frames: int) -> int:
+        if total_frames <= 0:
+            return 0
+        if self.schedule is not None:
+            return int(np.searchsorted(self.schedule, total_frames))
+        return int(math.floor((total_frames - 0.5) * self.target_fps / self.source_fps)) + 1
+
+    def stats(self) -> dict:
+        return {
+            'decoded_frames': self.decoded_frames,
+            'skipped_frames': self.skipped_frames,
+            'seeks': self.seeks,
+        }
@@ -1,9 +1,45 @@
 import json
-from collections.abc import Generator
+import logging
+import os
+import time
+from collections.abc import Generator, Iterable
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import TypeVar
 
 import cv2
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# job worker processes (see utils.jobs)
+PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS', 1))
+# processes holding a model at once: the job workers plus the chunk
+# processes their jobs fan out to (see chunked_processor)
+PROCESS_BUDGET = int(os.environ.get('PIPELINE_PROCESS_BUDGET', os.cpu_count() or 1))
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def clean_value(v):
+    if isinstance(v, (np.float32, np.float64, np.int32, np.int64)):
+        return v.item()
+    if isinstance(v, np.ndarray):
+        return v.tolist()
+    return v
+
+
+def deep_clean(data):
+    if isinstance(data, dict):
+        return {k: deep_clean(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [deep_clean(v) for v in data]
+    return clean_value(data)
+
 
 def load_zones_config(file_path: str) -> list[np.ndarray]:
     
@@ -20,18 +56,80 @@ def find_in_list(array: np.ndarray, search_list: list[int]) -> np.ndarray:
         return np.isin(array, search_list)
 
 
-def get_stream_frames_generator(rtsp_url: str) -> Generator[np.ndarray, None, None]:
+def get_stream_frames_generator(rtsp_url: str, loop: bool = False, realtime: bool = False) -> Generator[np.ndarray, None, None]:
     
     cap = cv2.VideoCapture(rtsp_url)
     if not cap.isOpened():
         raise Exception("Error: Could not open video stream.")
 
+    # a file source can stand in for a camera: played at its own frame rate
+    # and restarted from the beginning when it ends
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    interval = 1.0 / fps if realtime and fps > 0 else 0.0
+    next_time = time.monotonic()
+    frames_since_start = 0
+
     try:
         while True:
             ret, frame = cap.read()
             if not ret:
-                print("End of stream or error reading frame.")
+                if loop and frames_since_start and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    frames_since_start = 0
+                    continue
+                logger.debug("End of stream or error reading frame")
                 break
+            frames_since_start += 1
+
+            if interval:
+                next_time = max(next_time + interval, time.monotonic() - interval)
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
             yield frame
     finally:
-        cap.release()
\ No newline at end of file
+        cap.release()
+
+
+def iter_batches(iterable: Iterable[T], batch_size: int) -> Generator[list[T], None, None]:
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, max(1, batch_size)))
+        if not batch:
+            return
+        yield batch
+
+
+def chunk_worker_budget(requested: int, job_workers: int = PIPELINE_WORKERS, budget: int = PROCESS_BUDGET) -> int:
+    # each job's even share of the budget, its own worker process included
+    return max(1, min(requested, budget // max(1, job_workers)))
+
+
+def datetime_to_ns(value: datetime) -> int:
+    # exact integer nanoseconds since the epoch. Aware datetimes are converted
+    # to UTC; naive ones are wall-clock readings and are counted from a naive
+    # epoch, i.e. read as if they were UTC, with no local offset applied.
+    # Naive GPX, IMU and video times all come from that same wall clock, and
+    # unix timestamps (read as naive local time, see imu_analyzer) are shifted
+    # by the local offset onto it. A naive and an aware value only line up
+    # when the naive clock was on UTC.
+    epoch = _EPOCH_UTC if value.tzinfo is not None else _EPOCH
+    return ((value - epoch) // _ONE_MICROSECOND) * 1000
+
+
+def to_ns_array(times) -> np.ndarray:
+    if isinstance(times, np.ndarray):
+        if np.issubdtype(times.dtype, np.datetime64):
+            return times.astype('datetime64[ns]').astype(np.int64)
+        return times.astype(np.int64, copy=False)
+    if isinstance(times, datetime):
+        times = [times]
+    return np.fromiter((datetime_to_ns(t) for t in times), dtype=np.int64)
+
+
+def ns_to_datetime(ns: int, tzinfo=None) -> datetime:
+    # inverse of datetime_to_ns, aware results are expressed in `tzinfo`
+    delta = timedelta(microseconds=int(ns) // 1000)
+    if tzinfo is None:
+        return _EPOCH + delta
+    return (_EPOCH_UTC + delta).astimezone(tzinfo)
@@ -1,139 +1,269 @@
-
+import io
 import xml.etree.ElementTree as ET
+from array import array
+from collections.abc import Iterator, Sequence
 from datetime import datetime
-from typing import Optional
-
-
-def parse_gpx(gpx_content: str) -> list[dict]:
-    
-    root = ET.fromstring(gpx_content)
-
-    namespaces = {
-        'gpx': 'http://www.topografix.com/GPX/1/1',
-        'gpx10': 'http://www.topografix.com/GPX/1/0'
-    }
-
-    coordinates = []
-
-    track_points = root.findall('.//gpx:trkpt', namespaces)
-    if not track_points:
-        track_points = root.findall('.//gpx10:trkpt', namespaces)
-
-    if not track_points:
-        track_points = root.findall('.//{http://www.topografix.com/GPX/1/1}trkpt')
-
-    if not track_points:
-        track_points = root.findall('.//trkpt')
-
-    for point in track_points:
-        lat = float(point.get('lat'))
-        lng = float(point.get('lon'))
-
-        # Extract elevation if available
-        elevation = None
-        ele_elem = point.find('gpx:ele', namespaces) or point.find('ele') or point.find('{http://www.topografix.com/GPX/1/1}ele')
-        if ele_elem is not None and ele_elem.text:
-            elevation = float(ele_elem.text)
-
-        # Extract timestamp
-        timestamp = None
-        time_elem = point.find('gpx:time', namespaces) or point.find('time') or point.find('{http://www.topografix.com/GPX/1/1}time')
-        if time_elem is not None and time_elem.text:
-            
-            time_str = time_elem.text
-            
-            if time_str.endswith('Z'):
-                time_str = time_str[:-1] + '+00:00'
-            try:
-                timestamp = datetime.fromisoformat(time_str)
-            except ValueError:
-                # Try parsing without timezone
-                timestamp = datetime.strptime(time_str.split('.')[0], '%Y-%m-%dT%H:%M:%S')
-
-        coordinates.append({
+from typing import IO, Optional, Union
+
+import numpy as np
+
+from utils.general import datetime_to_ns, to_ns_array
+
+# time strings parsed per call of the vectorized path
+TIME_CHUNK = 8192
+
+
+def _open(gpx_content: Union[str, bytes, IO]) -> IO:
+    if hasattr(gpx_content, 'read'):
+        return gpx_content
+    if isinstance(gpx_content, bytes):
+        return io.BytesIO(gpx_content)
+    return io.StringIO(gpx_content)
+
+
+def _iter_track_points(gpx_content: Union[str, bytes, IO]) -> Iterator[tuple[float, float, Optional[str], Optional[str]]]:
+    """
+    (lat, lng, elevation text, time text) of every trkpt, in file order.
+
+    The document is read incrementally: the namespace is taken from the root
+    element once, and every element (points, and waypoints, routes or
+    anything else the file carries) is dropped from the tree once it has
+    ended, so memory doesn't grow with the length of the file.
+    """
+    events = ET.iterparse(_open(gpx_content), events=('start', 'end'))
+    _, root = next(events)
+    namespace = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+    trkpt_tag, ele_tag, time_tag = f'{namespace}trkpt', f'{namespace}ele', f'{namespace}time'
+
+    # open elements, the parent of whatever ends next is on top
+    open_elements = [root]
+    for event, element in events:
+        if event == 'start':
+            open_elements.append(element)
+            continue
+        open_elements.pop()
+        if element.tag == trkpt_tag:
+            elevation = timestamp = None
+            for child in element:
+                if child.tag == ele_tag:
+                    elevation = child.text or None
+                elif child.tag == time_tag:
+                    timestamp = child.text or None
+            yield float(element.get('lat')), float(element.get('lon')), elevation, timestamp
+        elif open_elements and open_elements[-1].tag == trkpt_tag:
+            # read when the point itself ends
+            continue
+
+        if open_elements:
+            open_elements[-1].remove(element)
+
+
+def _parse_time(time_str: str) -> datetime:
+    if time_str.endswith('Z'):
+        time_str = time_str[:-1] + '+00:00'
+    try:
+        return datetime.fromisoformat(time_str)
+    except ValueError:
+        # Try parsing without timezone
+        return datetime.strptime(time_str.split('.')[0], '%Y-%m-%dT%H:%M:%S')
+
+
+def _times_to_ns(time_strs: list[str]) -> np.ndarray:
+    # UTC 'Z' timestamps, nearly every GPX file, are parsed by numpy in one
+    # call; anything else goes through _parse_time one by one
+    values = np.array(time_strs)
+    if np.char.endswith(values, 'Z').all():
+        try:
+            parsed = np.array(np.char.rstrip(values, 'Z'), dtype='datetime64[us]')
+        except ValueError:
+            parsed = None
+        if parsed is not None and not np.isnat(parsed).any():
+            return parsed.astype(np.int64) * 1000
+    return np.fromiter((datetime_to_ns(_parse_time(t)) for t in time_strs), dtype=np.int64, count=len(time_strs))
+
+
+def parse_gpx(gpx_content: Union[str, bytes, IO]) -> list[dict]:
+    # one dict per point; parse_gpx_track builds the arrays without them
+    return [
+        {
             'lat': lat,
             'lng': lng,
-            'elevation': elevation,
-            'timestamp': timestamp
-        })
-
-    return coordinates
-
-
-def get_gps_at_time(coordinates: list[dict], target_time: datetime) -> Optional[dict]:
-    
+            'elevation': float(elevation) if elevation is not None else None,
+            'timestamp': _parse_time(timestamp) if timestamp is not None else None
+        }
+        for lat, lng, elevation, timestamp in _iter_track_points(gpx_content)
+    ]
+
+
+class GpsTrack:
+    """Time-sorted GPS fixes as NumPy arrays, built once per GPX file.
+
+    Lookups use binary search and reproduce get_gps_at_time: exact matches
+    return the fix, times outside the track clamp to its ends, anything in
+    between is interpolated linearly.
+    """
+
+    def __init__(
+        self,
+        times_ns: np.ndarray,
+        lat: np.ndarray,
+        lng: np.ndarray,
+        elevation: np.ndarray,
+        start_time: Optional[datetime] = None,
+        untimed_lat: Optional[np.ndarray] = None,
+        untimed_lng: Optional[np.ndarray] = None
+    ) -> None:
+        order = np.argsort(times_ns, kind='stable')
+        self.times_ns = np.ascontiguousarray(times_ns[order], dtype=np.int64)
+        self.lat = np.ascontiguousarray(lat[order], dtype=np.float64)
+        self.lng = np.ascontiguousarray(lng[order], dtype=np.float64)
+        self.elevation = np.ascontiguousarray(elevation[order], dtype=np.float64)
+        # first timestamp in file order, which is what the video is aligned to
+        self.start_time = start_time
+        # every fix in file order, used when the track carries no timestamps
+        self.untimed_lat = untimed_lat if untimed_lat is not None else self.lat
+        self.untimed_lng = untimed_lng if untimed_lng is not None else self.lng
+
+    @classmethod
+    def from_coordinates(cls, coordinates: list[dict]) -> 'GpsTrack':
+        timed = [c for c in coordinates if c['timestamp'] is not None]
+        return cls(
+            times_ns=to_ns_array([c['timestamp'] for c in timed]),
+            lat=np.array([c['lat'] for c in timed], dtype=np.float64),
+            lng=np.array([c['lng'] for c in timed], dtype=np.float64),
+            elevation=np.array(
+                [np.nan if c['elevation'] is None else c['elevation'] for c in timed],
+                dtype=np.float64
+            ),
+            start_time=timed[0]['timestamp'] if timed else None,
+            untimed_lat=np.array([c['lat'] for c in coordinates], dtype=np.float64),
+            untimed_lng=np.array([c['lng'] for c in coordinates], dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.untimed_lat)
+
+    @property
+    def timed(self) -> bool:
+        return len(self.times_ns) > 0
+
+    def first(self) -> Optional[dict]:
+        if not len(self):
+            return None
+        return {'lat': float(self.untimed_lat[0]), 'lng': float(self.untimed_lng[0])}
+
+    def interpolate(self, times) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # resolves any number of timestamps in one vectorized pass
+        t = to_ns_array(times)
+        n = len(self.times_ns)
+
+        after = np.searchsorted(self.times_ns, t, side='left')
+        a = np.minimum(after, n - 1)
+        b = np.maximum(after - 1, 0)
+
+        # exact hits take the fix itself, times outside the track clamp to its ends
+        exact = (after < n) & (self.times_ns[a] == t)
+        use_a = exact | (after == 0) | (after >= n)
+
+        t_b = self.times_ns[b]
+        span = (self.times_ns[a] - t_b).astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(use_a, 0.0, (t - t_b) / span)
+
+        def blend(values: np.ndarray) -> np.ndarray:
+            return np.where(use_a, values[a], values[b] + (values[a] - values[b]) * ratio)
+
+        lat, lng, elevation = blend(self.lat), blend(self.lng), blend(self.elevation)
+        return lat, lng, elevation
+
+    def at_time(self, target_time: datetime) -> Optional[dict]:
+        if not len(self):
+            return None
+        if not self.timed:
+            return self.first()
+
+        lat, lng, _ = self.interpolate([target_time])
+        return {'lat': float(lat[0]), 'lng': float(lng[0])}
+
+    def at_frames(self, frame_numbers: Sequence[int], fps: float, video_start_time: Optional[datetime] = None) -> tuple[np.ndarray, np.ndarray]:
+        frames = np.asarray(frame_numbers, dtype=np.float64)
+
+        if video_start_time is None:
+            video_start_time = self.start_time
+            if video_start_time is None:
+                # no timestamps, spread the fixes over one minute of video
+                if len(self) == 1:
+                    return np.full(len(frames), self.untimed_lat[0]), np.full(len(frames), self.untimed_lng[0])
+                ratio = frames / (fps * 60)
+                idx = np.minimum((ratio * len(self)).astype(np.int64), len(self) - 1)
+                return self.untimed_lat[idx], self.untimed_lng[idx]
+
+        if not self.timed:
+            return np.full(len(frames), self.untimed_lat[0]), np.full(len(frames), self.untimed_lng[0])
+
+        offsets_ns = np.round(frames / fps * 1e6).astype(np.int64) * 1000
+        lat, lng, _ = self.interpolate(datetime_to_ns(video_start_time) + offsets_ns)
+        return lat, lng
+
+    def at_frame(self, frame_number: int, fps: float, video_start_time: Optional[datetime] = None) -> Optional[dict]:
+        if not len(self):
+            return None
+
+        lat, lng = self.at_frames([frame_number], fps, video_start_time)
+        return {'lat': float(lat[0]), 'lng': float(lng[0])}
+
+
+def parse_gpx_track(gpx_content: Union[str, bytes, IO]) -> GpsTrack:
+    # columns are filled straight from the parser, no per-point dicts or datetimes
+    lat, lng, elevation = array('d'), array('d'), array('d')
+    timed = array('b')
+    times_ns: list[np.ndarray] = []
+    pending: list[str] = []
+    start_time = None
+
+    for point_lat, point_lng, point_elevation, timestamp in _iter_track_points(gpx_content):
+        lat.append(point_lat)
+        lng.append(point_lng)
+        elevation.append(float(point_elevation) if point_elevation is not None else np.nan)
+        timed.append(timestamp is not None)
+        if timestamp is not None:
+            if start_time is None:
+                start_time = _parse_time(timestamp)
+            pending.append(timestamp)
+            if len(pending) >= TIME_CHUNK:
+                times_ns.append(_times_to_ns(pending))
+                pending = []
+    if pending:
+        times_ns.append(_times_to_ns(pending))
+
+    lat, lng = np.frombuffer(lat, dtype=np.float64), np.frombuffer(lng, dtype=np.float64)
+    mask = np.frombuffer(timed, dtype=np.int8).astype(bool)
+    return GpsTrack(
+        times_ns=np.concatenate(times_ns) if times_ns else np.zeros(0, dtype=np.int64),
+        lat=lat[mask],
+        lng=lng[mask],
+        elevation=np.frombuffer(elevation, dtype=np.float64)[mask],
+        start_time=start_time,
+        untimed_lat=lat,
+        untimed_lng=lng
+    )
+
+
+def _as_track(coordinates: Union[list[dict], GpsTrack]) -> GpsTrack:
+    if isinstance(coordinates, GpsTrack):
+        return coordinates
+    return GpsTrack.from_coordinates(coordinates)
+
+
+def get_gps_at_time(coordinates: Union[list[dict], GpsTrack], target_time: datetime) -> Optional[dict]:
+    # kept for callers holding parse_gpx output; build a GpsTrack once for repeated lookups
     if not coordinates:
         return None
+    return _as_track(coordinates).at_time(target_time)
 
-    # Filter coordinates with timestamps
-    timed_coords = [c for c in coordinates if c['timestamp'] is not None]
-
-    if not timed_coords:
-        # If no timestamps, return first coordinate
-        return {'lat': coordinates[0]['lat'], 'lng': coordinates[0]['lng']}
-
-   
-    timed_coords.sort(key=lambda x: x['timestamp'])
-
-    # Find surrounding points
-    before = None
-    after = None
-
-    for i, coord in enumerate(timed_coords):
-        if coord['timestamp'] <= target_time:
-            before = coord
-        if coord['timestamp'] >= target_time and after is None:
-            after = coord
-            break
-
-    # target is before all points, return first
-    if before is None:
-        return {'lat': timed_coords[0]['lat'], 'lng': timed_coords[0]['lng']}
-
-    # target is after all points, return last
-    if after is None:
-        return {'lat': timed_coords[-1]['lat'], 'lng': timed_coords[-1]['lng']}
 
-    # exact match
-    if before['timestamp'] == after['timestamp']:
-        return {'lat': before['lat'], 'lng': before['lng']}
+def get_gps_at_frame(coordinates: Union[list[dict], GpsTrack], frame_number: int, fps: float, video_start_time: Optional[datetime] = None) -> Optional[dict]:
 
-    # interpolation
-    total_time = (after['timestamp'] - before['timestamp']).total_seconds()
-    elapsed_time = (target_time - before['timestamp']).total_seconds()
-    ratio = elapsed_time / total_time if total_time > 0 else 0
-
-    lat = before['lat'] + (after['lat'] - before['lat']) * ratio
-    lng = before['lng'] + (after['lng'] - before['lng']) * ratio
-
-    return {'lat': lat, 'lng': lng}
-
-
-def get_gps_at_frame(coordinates: list[dict], frame_number: int, fps: float, video_start_time: Optional[datetime] = None) -> Optional[dict]:
-    
     if not coordinates:
         return None
-
-    time_offset_seconds = frame_number / fps
-
-    # start time
-    if video_start_time is None:
-        # first GPS timestamp
-        timed_coords = [c for c in coordinates if c['timestamp'] is not None]
-        if timed_coords:
-            video_start_time = timed_coords[0]['timestamp']
-        else:
-            # no timestamps, interpolate by index
-            if len(coordinates) == 1:
-                return {'lat': coordinates[0]['lat'], 'lng': coordinates[0]['lng']}
-
-
-            ratio = frame_number / (fps * 60)  #  1 minute default
-            idx = min(int(ratio * len(coordinates)), len(coordinates) - 1)
-            return {'lat': coordinates[idx]['lat'], 'lng': coordinates[idx]['lng']}
-
-    # target time
-    from datetime import timedelta
-    target_time = video_start_time + timedelta(seconds=time_offset_seconds)
-
-    return get_gps_at_time(coordinates, target_time)
+    return _as_track(coordinates).at_frame(frame_number, fps, video_start_time)
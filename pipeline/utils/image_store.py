@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIR = os.environ.get(
+    'IMAGE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'images')
+)
+DEFAULT_RETENTION_SECONDS = float(os.environ.get('IMAGE_RETENTION_SECONDS', 30 * 24 * 3600))
+DEFAULT_CLEANUP_INTERVAL = float(os.environ.get('IMAGE_CLEANUP_INTERVAL', 3600))
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(_KEY_PATTERN.match(key))
+
+
+class ImageStore:
+    """JPEG files on local disk, named by the sha256 of their bytes.
+
+    The same image is only ever written once. Storing it again refreshes its
+    mtime, which is what the retention policy looks at. Pinned images (the
+    ones the backend has saved a link to) are kept regardless of age.
+    """
+
+    def __init__(self, root: str = DEFAULT_IMAGE_DIR, retention_seconds: float = DEFAULT_RETENTION_SECONDS) -> None:
+        self.root = root
+        self.retention_seconds = retention_seconds
+
+    def path_for(self, key: str) -> str:
+        # two-character fan-out keeps directories small
+        return os.path.join(self.root, key[:2], f"{key}.jpg")
+
+    def pin_path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pin")
+
+    def put(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        path = self.path_for(key)
+
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+                return key
+            except FileNotFoundError:
+                # removed by cleanup in between, written again below
+                pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def get_path(self, key: str) -> Optional[str]:
+        if not is_valid_key(key):
+            return None
+        path = self.path_for(key)
+        return path if os.path.exists(path) else None
+
+    def pin(self, key: str) -> bool:
+        # False when there is no such image (any more)
+        if self.get_path(key) is None:
+            return False
+        with open(self.pin_path_for(key), 'a'):
+            pass
+        return True
+
+    def unpin(self, key: str) -> bool:
+        if not is_valid_key(key):
+            return False
+        try:
+            os.remove(self.pin_path_for(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def is_pinned(self, key: str) -> bool:
+        return is_valid_key(key) and os.path.exists(self.pin_path_for(key))
+
+    def cleanup(self, retention_seconds: Optional[float] = None) -> int:
+        # removes unpinned images not written or re-stored within the retention period
+        if retention_seconds is None:
+            retention_seconds = self.retention_seconds
+        cutoff = time.time() - retention_seconds
+        removed = 0
+
+        if not os.path.isdir(self.root):
+            return 0
+
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                key, ext = os.path.splitext(filename)
+                if ext == '.pin' or (ext == '.jpg' and self.is_pinned(key)):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+
+        if removed:
+            logger.info("Removed %d images older than %ss from %s", removed, retention_seconds, self.root)
+        return removed
+
+
+image_store = ImageStore()
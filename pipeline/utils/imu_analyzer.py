@@ -1,100 +1,394 @@
 import csv
 import io
 import numpy as np
-from datetime import datetime
-from typing import Optional
-
-
-def parse_imu_csv(csv_content: str) -> list[dict]:
-    reader = csv.DictReader(io.StringIO(csv_content))
-
-    data = []
-
-    for row in reader:
-        entry = {}
-
-        timestamp = None
-        for key in ['timestamp', 'time', 'Time', 'Timestamp', 't']:
-            if key in row:
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import IO, Optional, Union
+
+from utils.general import datetime_to_ns, ns_to_datetime, to_ns_array
+
+TIMESTAMP_KEYS = ['timestamp', 'time', 'Time', 'Timestamp', 't']
+
+CHANNEL_ALIASES = {
+    'accel_x': ['accel_x', 'acc_x', 'ax', 'Accel_X', 'AccX'],
+    'accel_y': ['accel_y', 'acc_y', 'ay', 'Accel_Y', 'AccY'],
+    'accel_z': ['accel_z', 'acc_z', 'az', 'Accel_Z', 'AccZ'],
+    'gyro_x': ['gyro_x', 'gx', 'Gyro_X', 'GyroX'],
+    'gyro_y': ['gyro_y', 'gy', 'Gyro_Y', 'GyroY'],
+    'gyro_z': ['gyro_z', 'gz', 'Gyro_Z', 'GyroZ'],
+}
+
+CHANNELS = list(CHANNEL_ALIASES)
+
+# widest timestamp string the loadtxt fast path keeps, '...T08:00:00.000000+08:00' is 32
+TIMESTAMP_WIDTH = 40
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    # row-by-row fallback for columns the vectorized path can't handle
+    timestamp = None
+    try:
+        ts = value.strip()
+        if 'T' in ts:
+            timestamp = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        elif '/' in ts or '-' in ts:
+            for fmt in ['%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M:%S']:
                 try:
-                    ts = row[key].strip()
-                    if 'T' in ts:
-                        timestamp = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-                    elif '/' in ts or '-' in ts:
-                        for fmt in ['%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M:%S']:
-                            try:
-                                timestamp = datetime.strptime(ts, fmt)
-                                break
-                            except ValueError:
-                                continue
-                    else:
-                       
-                        ts_num = float(ts)
-                        if ts_num > 1e12:
-                            ts_num = ts_num / 1000
-                        timestamp = datetime.fromtimestamp(ts_num)
-                except (ValueError, OSError):
-                    pass
-                break
-
-        entry['timestamp'] = timestamp
-
-        # Parse acceleration (m/s^2)
-        for ax_key in ['accel_x', 'acc_x', 'ax', 'Accel_X', 'AccX']:
-            if ax_key in row:
-                entry['accel_x'] = float(row[ax_key])
-                break
+                    timestamp = datetime.strptime(ts, fmt)
+                    break
+                except ValueError:
+                    continue
         else:
-            entry['accel_x'] = 0.0
 
-        for ay_key in ['accel_y', 'acc_y', 'ay', 'Accel_Y', 'AccY']:
-            if ay_key in row:
-                entry['accel_y'] = float(row[ay_key])
-                break
+            ts_num = float(ts)
+            if ts_num > 1e12:
+                ts_num = ts_num / 1000
+            timestamp = datetime.fromtimestamp(ts_num)
+    except (ValueError, OSError):
+        pass
+    return timestamp
+
+
+def _split_utc_offset(value: str) -> tuple[str, Optional[int]]:
+    if len(value) > 6 and value[-6] in '+-' and value[-3] == ':':
+        sign = -1 if value[-6] == '-' else 1
+        minutes = int(value[-5:-3]) * 60 + int(value[-2:])
+        return value[:-6], sign * minutes
+    return value, None
+
+
+def _parse_timestamps_vectorized(values: np.ndarray) -> tuple[np.ndarray, np.ndarray, Optional[object]]:
+    present = values != ''
+    if not present.any():
+        return np.zeros(len(values), dtype=np.int64), present, None
+
+    sample = str(values[np.argmax(present)])
+
+    if 'T' in sample or ('-' in sample and '/' not in sample):
+        reference = _parse_timestamp(sample)
+        if reference is None:
+            raise ValueError(f"unsupported timestamp format: {sample}")
+
+        # ISO-8601 / 'YYYY-MM-DD HH:MM:SS[.f]' bodies are parsed by numpy in one call,
+        # a trailing Z or +HH:MM offset is stripped first and applied afterwards
+        offsets_min = 0
+        naive = False
+        if sample.endswith('Z'):
+            if (present & ~np.char.endswith(values, 'Z')).any():
+                raise ValueError("mixed naive and timezone-aware timestamps")
+            body = np.char.rstrip(values, 'Z')
+        elif reference.tzinfo is not None:
+            split = [_split_utc_offset(v) for v in values.tolist()]
+            if any(offset is None for (_, offset), ok in zip(split, present) if ok):
+                raise ValueError("mixed naive and timezone-aware timestamps")
+            body = [b for b, _ in split]
+            offsets_min = np.array([offset or 0 for _, offset in split], dtype=np.int64)
         else:
-            entry['accel_y'] = 0.0
+            body = values
+            naive = True
+
+        parsed = np.array(body, dtype='datetime64[us]')
+        # numpy also takes dates without a time ('2025-01-01') and times without
+        # seconds; the row parser only accepts ISO 'T' strings and, without an
+        # offset, 'YYYY-MM-DD HH:MM:SS[.f]', the rest stay untimed as before
+        body = np.asarray(body, dtype=str)
+        has_time = np.char.find(body, 'T') >= 0
+        if naive:
+            has_time |= (np.char.find(body, ' ') >= 0) & (np.char.count(body, ':') == 2)
+        valid = ~np.isnat(parsed) & has_time
+        ns = (parsed.astype(np.int64) - offsets_min * 60_000_000) * 1000
+        return np.where(valid, ns, 0), valid, reference.tzinfo
+
+    if '/' in sample:
+        raise ValueError(f"no vectorized parser for {sample}")
+
+    # unix seconds or milliseconds, read as naive local time like datetime.fromtimestamp
+    seconds = np.array(values, dtype=np.float64)
+    if not np.isfinite(seconds).all():
+        raise ValueError("non-finite unix timestamp")
+    seconds = np.where(seconds > 1e12, seconds / 1000, seconds)
+    # the local UTC offset per distinct minute, so a log crossing a DST change
+    # shifts with it; zone transitions always fall on a whole minute
+    minutes, inverse = np.unique(np.floor(seconds / 60).astype(np.int64), return_inverse=True)
+    local_offsets_us = np.array([
+        datetime_to_ns(datetime.fromtimestamp(int(minute) * 60)) // 1000 - int(minute) * 60_000_000
+        for minute in minutes
+    ], dtype=np.int64)
+    ns = (np.round(seconds * 1e6).astype(np.int64) + local_offsets_us[inverse.ravel()]) * 1000
+    return ns, np.ones(len(values), dtype=bool), None
+
+
+def _parse_timestamps(values) -> tuple[np.ndarray, np.ndarray, Optional[object]]:
+    values = np.asarray(values, dtype=str)
+    if len(values) and (np.char.startswith(values, ' ') | np.char.endswith(values, ' ')).any():
+        values = np.char.strip(values)
+    try:
+        return _parse_timestamps_vectorized(values)
+    except (ValueError, OverflowError, OSError):
+        pass
+
+    parsed = [_parse_timestamp(v) for v in values.tolist()]
+    valid = np.array([t is not None for t in parsed], dtype=bool)
+    ns = np.array([datetime_to_ns(t) if t is not None else 0 for t in parsed], dtype=np.int64)
+    tzinfo = next((t.tzinfo for t in parsed if t is not None), None)
+    return ns, valid, tzinfo
+
+
+class ImuSeries:
+    """Columnar IMU log: one float64 array per channel plus int64 timestamps.
+
+    Timestamps are nanoseconds (naive values as-is, aware ones as UTC, see
+    utils.general.datetime_to_ns); `has_time` marks rows whose timestamp
+    could be parsed. Rows stay in file order.
+    """
+
+    def __init__(
+        self,
+        timestamps_ns: np.ndarray,
+        has_time: np.ndarray,
+        channels: dict[str, np.ndarray],
+        tzinfo=None
+    ) -> None:
+        self.timestamps_ns = np.ascontiguousarray(timestamps_ns, dtype=np.int64)
+        self.has_time = np.ascontiguousarray(has_time, dtype=bool)
+        self.tzinfo = tzinfo
+        for name in CHANNELS:
+            values = channels.get(name)
+            if values is None:
+                values = np.zeros(len(self.timestamps_ns))
+            setattr(self, name, np.ascontiguousarray(values, dtype=np.float64))
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> 'ImuSeries':
+        has_time = np.array([r['timestamp'] is not None for r in records], dtype=bool)
+        timestamps = np.array(
+            [datetime_to_ns(r['timestamp']) if r['timestamp'] is not None else 0 for r in records],
+            dtype=np.int64
+        )
+        tzinfo = next((r['timestamp'].tzinfo for r in records if r['timestamp'] is not None), None)
+        channels = {name: np.array([r.get(name, 0.0) for r in records], dtype=np.float64) for name in CHANNELS}
+        return cls(timestamps, has_time, channels, tzinfo)
+
+    def __len__(self) -> int:
+        return len(self.timestamps_ns)
+
+    @property
+    def start_time(self) -> Optional[datetime]:
+        # first parsed timestamp in file order
+        timed = np.flatnonzero(self.has_time)
+        if not len(timed):
+            return None
+        return ns_to_datetime(self.timestamps_ns[timed[0]], self.tzinfo)
+
+    def time_mask(self, start_time: datetime, end_time: datetime) -> np.ndarray:
+        start_ns, end_ns = datetime_to_ns(start_time), datetime_to_ns(end_time)
+        return self.has_time & (self.timestamps_ns >= start_ns) & (self.timestamps_ns <= end_ns)
+
+    def row(self, index: int) -> dict:
+        entry = {
+            'timestamp': ns_to_datetime(self.timestamps_ns[index], self.tzinfo) if self.has_time[index] else None
+        }
+        for name in CHANNELS:
+            entry[name] = float(getattr(self, name)[index])
+        return entry
+
+    def to_records(self) -> list[dict]:
+        return [self.row(i) for i in range(len(self))]
+
+    def take(self, indices: np.ndarray) -> 'ImuSeries':
+        channels = {name: getattr(self, name)[indices] for name in CHANNELS}
+        return ImuSeries(self.timestamps_ns[indices], self.has_time[indices], channels, self.tzinfo)
+
+    # indexes are built on first use, then shared by every query on this series
+
+    @cached_property
+    def time_index(self) -> 'ImuTimeIndex':
+        return ImuTimeIndex(self)
+
+    @cached_property
+    def windows(self) -> 'ImuWindowStats':
+        return ImuWindowStats(self)
+
+
+class ImuTimeIndex:
+    """Timed samples sorted by time for binary-search nearest lookups.
+
+    `order` maps sorted positions back to rows of the series; the sort is
+    stable, so among equal timestamps the earliest row comes first.
+    """
+
+    def __init__(self, series: 'ImuSeries') -> None:
+        timed = np.flatnonzero(series.has_time)
+        self.order = timed[np.argsort(series.timestamps_ns[timed], kind='stable')]
+        self.times_ns = series.timestamps_ns[self.order]
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def nearest(self, times) -> np.ndarray:
+        # row of the closest sample for each target; on equal distance the
+        # earlier row wins, matching a first-minimum linear scan
+        t = np.atleast_1d(_to_ns(times))
+        n = len(self.times_ns)
+        if not n:
+            raise ValueError("IMU series has no timestamps")
+
+        after = np.searchsorted(self.times_ns, t, side='left')
+        a = np.minimum(after, n - 1)
+        before = np.maximum(after - 1, 0)
+        b = np.searchsorted(self.times_ns, self.times_ns[before], side='left')
+
+        never = np.iinfo(np.int64).max
+        dist_a = np.where(after < n, self.times_ns[a] - t, never)
+        dist_b = np.where(after > 0, t - self.times_ns[b], never)
+
+        take_b = (dist_b < dist_a) | ((dist_b == dist_a) & (self.order[b] < self.order[a]))
+        return self.order[np.where(take_b, b, a)]
+
+
+class ImuWindowStats:
+    """O(log N) mean/variance over any time window of an ImuSeries.
+
+    Timed samples are sorted once and prefix sums of the acceleration
+    magnitude, vertical acceleration and their squares are kept; a window
+    [start, end] (inclusive, like the list filters it replaces) is two binary
+    searches and a handful of subtractions. Values are shifted by their
+    global mean before summing to limit cancellation in sum(x^2) - n*mean^2.
+    """
+
+    def __init__(self, series: 'ImuSeries') -> None:
+        order = series.time_index.order
+        self.times_ns = series.time_index.times_ns
+
+        magnitude = np.sqrt(series.accel_x[order]**2 + series.accel_y[order]**2 + series.accel_z[order]**2)
+        self._magnitude = self._prefix_sums(magnitude)
+        self._accel_z = self._prefix_sums(series.accel_z[order])
+
+    @staticmethod
+    def _prefix_sums(values: np.ndarray) -> tuple[float, np.ndarray, np.ndarray]:
+        shift = float(values.mean()) if len(values) else 0.0
+        centered = values - shift
+        sums = np.concatenate(([0.0], np.cumsum(centered)))
+        squares = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        return shift, sums, squares
+
+    def bounds(self, start_ns, end_ns) -> tuple[np.ndarray, np.ndarray]:
+        lo = np.searchsorted(self.times_ns, start_ns, side='left')
+        hi = np.searchsorted(self.times_ns, end_ns, side='right')
+        return lo, np.maximum(hi, lo)
+
+    def _moments(self, prefix, start_ns, end_ns) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        shift, sums, squares = prefix
+        lo, hi = self.bounds(start_ns, end_ns)
+        count = hi - lo
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = (sums[hi] - sums[lo]) / count
+            variance = np.maximum((squares[hi] - squares[lo]) / count - mean * mean, 0.0)
+        return count, mean + shift, variance
+
+    def count(self, start_time, end_time) -> np.ndarray:
+        lo, hi = self.bounds(_to_ns(start_time), _to_ns(end_time))
+        return hi - lo
+
+    def magnitude_variance(self, start_time, end_time) -> tuple[np.ndarray, np.ndarray]:
+        # (sample count, population variance of |a|) for one or many windows
+        count, _, variance = self._moments(self._magnitude, _to_ns(start_time), _to_ns(end_time))
+        return count, variance
+
+    def accel_z_rms(self, start_time, end_time) -> tuple[np.ndarray, np.ndarray]:
+        # (sample count, RMS of mean-removed vertical acceleration)
+        count, _, variance = self._moments(self._accel_z, _to_ns(start_time), _to_ns(end_time))
+        return count, np.sqrt(variance)
+
+
+def _to_ns(value):
+    if isinstance(value, datetime):
+        return datetime_to_ns(value)
+    return to_ns_array(value)
+
+
+def _resolve_columns(fieldnames: list[str]) -> tuple[Optional[int], dict[str, int]]:
+    # aliases are resolved once from the header instead of once per row
+    position = {name: i for i, name in enumerate(fieldnames)}
+    timestamp_col = next((position[k] for k in TIMESTAMP_KEYS if k in position), None)
+    channel_cols = {}
+    for name, aliases in CHANNEL_ALIASES.items():
+        col = next((position[k] for k in aliases if k in position), None)
+        if col is not None:
+            channel_cols[name] = col
+    return timestamp_col, channel_cols
+
+
+def _load_columns(source: IO, columns: list[int], timestamp_col: Optional[int]) -> dict[int, np.ndarray]:
+    # one C-level pass over the file: timestamps as strings, channels as float64
+    dtype = np.dtype([(f'c{col}', f'U{TIMESTAMP_WIDTH}' if col == timestamp_col else 'f8') for col in columns])
+    table = np.loadtxt(source, delimiter=',', quotechar='"', usecols=columns, dtype=dtype, ndmin=1)
+    if timestamp_col is not None and len(table):
+        if np.char.str_len(table[f'c{timestamp_col}']).max() >= TIMESTAMP_WIDTH:
+            raise ValueError("timestamp column wider than the fast path allows")
+    return {col: table[f'c{col}'] for col in columns}
+
+
+def _load_columns_csv(source: IO, columns: list[int]) -> dict[int, list[str]]:
+    # tolerant path for files loadtxt rejects (blank cells, ragged rows)
+    raw = {col: [] for col in columns}
+    for row in csv.reader(source):
+        if not row:
+            continue
+        for col in columns:
+            raw[col].append(row[col] if col < len(row) else '')
+    return raw
+
+
+def parse_imu_series(csv_content: Union[str, IO]) -> ImuSeries:
+    source = csv_content if hasattr(csv_content, 'read') else io.StringIO(csv_content)
+
+    fieldnames = next(csv.reader([source.readline()]), [])
+    timestamp_col, channel_cols = _resolve_columns(fieldnames)
+    columns = sorted(set(channel_cols.values()) | ({timestamp_col} if timestamp_col is not None else set()))
+
+    if not columns:
+        n_rows = sum(1 for row in csv.reader(source) if row)
+        return ImuSeries(np.zeros(n_rows, dtype=np.int64), np.zeros(n_rows, dtype=bool), {})
+
+    raw = None
+    start = source.tell() if source.seekable() else None
+    if start is not None:
+        try:
+            raw = _load_columns(source, columns, timestamp_col)
+        except ValueError:
+            source.seek(start)
+    if raw is None:
+        raw = _load_columns_csv(source, columns)
+
+    n_rows = len(raw[columns[0]])
+    if timestamp_col is not None:
+        timestamps, has_time, tzinfo = _parse_timestamps(raw[timestamp_col])
+    else:
+        timestamps, has_time, tzinfo = np.zeros(n_rows, dtype=np.int64), np.zeros(n_rows, dtype=bool), None
 
-        for az_key in ['accel_z', 'acc_z', 'az', 'Accel_Z', 'AccZ']:
-            if az_key in row:
-                entry['accel_z'] = float(row[az_key])
-                break
-        else:
-            entry['accel_z'] = 0.0
+    channels = {name: np.asarray(raw[col], dtype=np.float64) for name, col in channel_cols.items()}
+    return ImuSeries(timestamps, has_time, channels, tzinfo)
 
-        # Parse gyroscope (rad/s or deg/s)
-        for gx_key in ['gyro_x', 'gx', 'Gyro_X', 'GyroX']:
-            if gx_key in row:
-                entry['gyro_x'] = float(row[gx_key])
-                break
-        else:
-            entry['gyro_x'] = 0.0
 
-        for gy_key in ['gyro_y', 'gy', 'Gyro_Y', 'GyroY']:
-            if gy_key in row:
-                entry['gyro_y'] = float(row[gy_key])
-                break
-        else:
-            entry['gyro_y'] = 0.0
+def parse_imu_csv(csv_content: Union[str, IO]) -> list[dict]:
+    # row dicts for existing callers; new code should use parse_imu_series
+    return parse_imu_series(csv_content).to_records()
 
-        for gz_key in ['gyro_z', 'gz', 'Gyro_Z', 'GyroZ']:
-            if gz_key in row:
-                entry['gyro_z'] = float(row[gz_key])
-                break
-        else:
-            entry['gyro_z'] = 0.0
 
-        data.append(entry)
+def _as_series(imu_data: Union[list[dict], ImuSeries]) -> ImuSeries:
+    if isinstance(imu_data, ImuSeries):
+        return imu_data
+    return ImuSeries.from_records(imu_data)
 
-    return data
 
+def calculate_iri(imu_data: Union[list[dict], ImuSeries], segment_length_km: float = 1.0) -> float:
 
-def calculate_iri(imu_data: list[dict], segment_length_km: float = 1.0) -> float:
-    
-    if not imu_data:
+    if not len(imu_data):
         return 0.0
 
     # vertical acc
-    z_accels = np.array([d['accel_z'] for d in imu_data])
+    z_accels = _as_series(imu_data).accel_z
 
     z_accels_adjusted = z_accels - np.mean(z_accels)
 
@@ -110,54 +404,25 @@ def calculate_iri(imu_data: list[dict], segment_length_km: float = 1.0) -> float
     return round(iri, 2)
 
 
-def get_roughness_at_time(imu_data: list[dict], target_time: datetime, window_seconds: float = 1.0) -> float:
-    if not imu_data:
+def get_roughness_at_time(imu_data: Union[list[dict], ImuSeries], target_time: datetime, window_seconds: float = 1.0) -> float:
+    if not len(imu_data):
         return 0.0
 
     # Filter data within time window
-    from datetime import timedelta
-
     half_window = timedelta(seconds=window_seconds / 2)
     start_time = target_time - half_window
     end_time = target_time + half_window
 
-    window_data = [
-        d for d in imu_data
-        if d['timestamp'] is not None and start_time <= d['timestamp'] <= end_time
-    ]
+    # RMS of vertical acceleration, from the prefix-sum index
+    count, rms = _as_series(imu_data).windows.accel_z_rms(start_time, end_time)
 
-    if not window_data:
+    if not count:
         return 0.0
 
-    # RMS of vertical acceleration
-    z_accels = np.array([d['accel_z'] for d in window_data])
-    z_accels_adjusted = z_accels - np.mean(z_accels)
-    rms = np.sqrt(np.mean(z_accels_adjusted ** 2))
-
-    return round(rms, 4)
-
+    return round(float(rms), 4)
 
-def calculate_severity_weight(imu_data: list[dict], start_time: datetime, end_time: datetime) -> float:
 
-    if not imu_data:
-        return 1.0
-
-    # Filter data within time window
-    window_data = [
-        d for d in imu_data
-        if d['timestamp'] is not None and start_time <= d['timestamp'] <= end_time
-    ]
-
-    if len(window_data) < 2:
-        return 1.0
-
-    # variance of all acceleration components
-    x_accels = np.array([d['accel_x'] for d in window_data])
-    y_accels = np.array([d['accel_y'] for d in window_data])
-    z_accels = np.array([d['accel_z'] for d in window_data])
-
-    magnitudes = np.sqrt(x_accels**2 + y_accels**2 + z_accels**2)
-    variance = np.var(magnitudes)
+def severity_weight_from_variance(variance: float) -> float:
 
     # Map variance to weight (calibrated for typical values)
     # Low variance (< 1): weight = 0.5-1.0 (mild)
@@ -174,37 +439,57 @@ def calculate_severity_weight(imu_data: list[dict], start_time: datetime, end_ti
     return round(min(2.0, max(0.5, weight)), 2)
 
 
-def get_imu_at_frame(imu_data: list[dict], frame_number: int, fps: float, video_start_time: Optional[datetime] = None) -> Optional[dict]:
-   
-    if not imu_data:
-        return None
+def calculate_severity_weight(imu_data: Union[list[dict], ImuSeries], start_time: datetime, end_time: datetime) -> float:
+
+    if not len(imu_data):
+        return 1.0
+
+    # variance of the acceleration magnitude within the time window
+    count, variance = _as_series(imu_data).windows.magnitude_variance(start_time, end_time)
+
+    if count < 2:
+        return 1.0
+
+    return severity_weight_from_variance(float(variance))
+
 
-    time_offset_seconds = frame_number / fps
+def _frame_times_ns(frame_numbers: np.ndarray, fps: float, video_start_time: datetime) -> np.ndarray:
+    offsets_us = np.round(frame_numbers / fps * 1e6).astype(np.int64)
+    return datetime_to_ns(video_start_time) + offsets_us * 1000
+
+
+def get_imu_rows_at_frames(imu_data: Union[list[dict], ImuSeries], frame_numbers, fps: float, video_start_time: Optional[datetime] = None) -> np.ndarray:
+    # row index of the reading for every frame number, resolved in one call
+    series = _as_series(imu_data)
+    frames = np.atleast_1d(np.asarray(frame_numbers, dtype=np.float64))
 
-  
     if video_start_time is None:
-        timed_data = [d for d in imu_data if d['timestamp'] is not None]
-        if timed_data:
-            video_start_time = timed_data[0]['timestamp']
-        else:
+        video_start_time = series.start_time
+        if video_start_time is None:
             # No timestamps, use index-based lookup
-            sample_rate = len(imu_data) / (frame_number / fps) if frame_number > 0 else 100
-            idx = min(int(time_offset_seconds * sample_rate), len(imu_data) - 1)
-            return imu_data[idx]
+            offsets = frames / fps
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sample_rate = np.where(frames > 0, len(series) / offsets, 100)
+            return np.minimum((offsets * sample_rate).astype(np.int64), len(series) - 1)
 
-    # closest IMU reading to target time
-    from datetime import timedelta
-    target_time = video_start_time + timedelta(seconds=time_offset_seconds)
+    return series.time_index.nearest(_frame_times_ns(frames, fps, video_start_time))
 
-    closest = None
-    min_diff = float('inf')
 
-    for reading in imu_data:
-        if reading['timestamp'] is None:
-            continue
-        diff = abs((reading['timestamp'] - target_time).total_seconds())
-        if diff < min_diff:
-            min_diff = diff
-            closest = reading
+def get_imu_at_frames(imu_data: Union[list[dict], ImuSeries], frame_numbers, fps: float, video_start_time: Optional[datetime] = None) -> ImuSeries:
+    # one reading per frame, as a series aligned with frame_numbers
+    series = _as_series(imu_data)
+    return series.take(get_imu_rows_at_frames(series, frame_numbers, fps, video_start_time))
+
+
+def get_imu_at_frame(imu_data: Union[list[dict], ImuSeries], frame_number: int, fps: float, video_start_time: Optional[datetime] = None) -> Optional[dict]:
+
+    if not len(imu_data):
+        return None
+
+    series = _as_series(imu_data)
+    if video_start_time is not None and not len(series.time_index):
+        return None
 
-    return closest
+    # closest IMU reading to target time, earliest row wins ties
+    rows = get_imu_rows_at_frames(series, [frame_number], fps, video_start_time)
+    return series.row(int(rows[0]))
@@ -0,0 +1,431 @@
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Optional
+
+from utils.general import PIPELINE_WORKERS
+from utils.metrics import frames_per_second, job_seconds, jobs_total, stage_seconds
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 8))
+DEFAULT_JOB_TTL = float(os.environ.get('JOB_TTL_SECONDS', 3600))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(
+        self,
+        job_id: str,
+        params: dict,
+        work_dir: Optional[str] = None,
+        inputs: Optional[dict] = None,
+        stream: bool = False,
+        cache_key: Optional[str] = None
+    ) -> None:
+        self.id = job_id
+        self.params = params
+        self.work_dir = work_dir
+        self.inputs = inputs or {}
+        self.cache_key = cache_key
+        self.cached = False
+        # time spent receiving the upload, before the job existed
+        self.upload_seconds: Optional[float] = None
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.frames_processed = 0
+        self.frames_total = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+        # defect/progress events for a streaming client, None marks the end
+        self.events: Optional[queue.Queue] = queue.Queue() if stream else None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def request_stages(self) -> dict:
+        # the stages before processing, seen from the API process
+        stages = {}
+        if self.upload_seconds is not None:
+            stages['upload'] = round(self.upload_seconds, 4)
+        if self.started_at is not None and not self.cached:
+            stages['queue_wait'] = round((self.started_at - self.created_at).total_seconds(), 4)
+        return stages
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': {
+                'frames_processed': self.frames_processed,
+                'frames_total': self.frames_total,
+                'fraction': round(self.frames_processed / self.frames_total, 4) if self.frames_total else 0.0,
+            },
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error,
+            'inputs': self.inputs,
+            'cache_key': self.cache_key,
+            'cached': self.cached,
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+
+# --- worker process side ---
+
+_progress_queue = None
+
+
+def _report_models() -> None:
+    from utils.model_registry import registry
+    _progress_queue.put(('models', os.getpid(), registry.list_models()))
+
+
+def _init_worker(progress_queue, weights_path: Optional[str], device: Optional[str]) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    # every worker loads and warms its own copy of the model up front
+    if weights_path and os.path.exists(weights_path):
+        from utils.model_registry import get_model
+        try:
+            get_model(weights_path, device)
+        except Exception:
+            logger.exception("Worker warm-up failed for %s", weights_path)
+    _report_models()
+
+
+def _noop() -> None:
+    pass
+
+
+def _run_job(job_id: str, params: dict, stream: bool = False) -> dict:
+    from defect_processor import collect_events, iter_process_video
+    from utils.general import deep_clean
+
+    _progress_queue.put(('started', job_id))
+
+    def report(processed: int, total: int) -> None:
+        _progress_queue.put(('progress', job_id, processed, total))
+
+    def send_defect(event: dict) -> None:
+        _progress_queue.put(('defect', job_id, deep_clean(event)))
+
+    params = dict(params)
+    gpx_path = params.pop('gpx_path')
+    imu_path = params.pop('imu_path')
+
+    # GPX and IMU are parsed straight from the files rather than read into strings
+    try:
+        with open(gpx_path, 'rb') as gpx_file, open(imu_path, encoding='utf-8', newline='') as imu_file:
+            events = iter_process_video(gpx_content=gpx_file, imu_content=imu_file, **params)
+            result = collect_events(events, report, send_defect if stream else None)
+        return deep_clean(result)
+    finally:
+        # sent through the same queue as the events, so it arrives after them
+        _progress_queue.put(('finished', job_id))
+        _report_models()
+
+
+def _run_rescore(params: dict) -> dict:
+    from rescore import rescore
+    from utils.general import deep_clean
+
+    params = dict(params)
+    gpx_path = params.pop('gpx_path')
+    imu_path = params.pop('imu_path')
+    with open(gpx_path, 'rb') as gpx_file, open(imu_path, encoding='utf-8', newline='') as imu_file:
+        return deep_clean(rescore(gpx_content=gpx_file, imu_content=imu_file, **params))
+
+
+# --- API process side ---
+
+class JobManager:
+    """Runs process_video jobs in a process pool with a bounded backlog."""
+
+    def __init__(
+        self,
+        max_workers: int = PIPELINE_WORKERS,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        job_ttl: float = DEFAULT_JOB_TTL,
+        weights_path: Optional[str] = None,
+        device: Optional[str] = None,
+        cache=None
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.job_ttl = job_ttl
+        self.weights_path = weights_path
+        self.device = device
+        # a ResultCache, results of successful jobs with a cache_key go in it
+        self.cache = cache
+
+        self._jobs: dict[str, Job] = {}
+        # rescores in the pool, they share the jobs' bound
+        self._rescores = 0
+        self._worker_models: dict[int, list[dict]] = {}
+        # guards the jobs and the executor; reentrant since _restart stops
+        # and starts the pool while holding it
+        self._lock = threading.RLock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._listener: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                return
+            # spawn, not fork: the parent may already hold torch thread pools
+            ctx = multiprocessing.get_context('spawn')
+            self._progress_queue = ctx.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._progress_queue, self.weights_path, self.device)
+            )
+            self._listener = threading.Thread(target=self._listen, name='job-progress', daemon=True)
+            self._listener.start()
+
+            # start every worker now so model loading happens before the first upload
+            for _ in range(self.max_workers):
+                self._executor.submit(_noop)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                return
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._progress_queue.put(None)
+            self._listener.join(timeout=5)
+            self._executor = None
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        # a worker that died (OOM-killed on a long video, say) breaks the whole
+        # pool for good; every job in it has failed, later ones get a new pool
+        with self._lock:
+            if self._executor is not broken:
+                return
+            logger.warning("Worker pool is broken, starting a new one")
+            self.shutdown()
+            self._worker_models.clear()
+            self.start()
+
+    def _submit(self, fn, *args) -> tuple[Future, ProcessPoolExecutor]:
+        # under the lock, so a concurrent _restart can't shut the pool down in between
+        with self._lock:
+            self.start()
+            executor = self._executor
+            try:
+                return executor.submit(fn, *args), executor
+            except BrokenProcessPool:
+                self._restart(executor)
+                executor = self._executor
+                return executor.submit(fn, *args), executor
+
+    def _listen(self) -> None:
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            if message[0] == 'models':
+                self._worker_models[message[1]] = message[2]
+                continue
+            job = self._jobs.get(message[1])
+            if job is None:
+                continue
+            # events can still be in flight after the future has resolved
+            if message[0] == 'defect':
+                if job.events is not None:
+                    job.events.put(message[2])
+            elif message[0] == 'finished':
+                if job.events is not None:
+                    job.events.put(None)
+            elif job.finished:
+                continue
+            elif message[0] == 'started':
+                job.status = RUNNING
+                job.started_at = datetime.now()
+            elif message[0] == 'progress':
+                job.frames_processed, job.frames_total = message[2], message[3]
+                if job.events is not None:
+                    job.events.put({
+                        'event': 'progress',
+                        'frames_processed': job.frames_processed,
+                        'frames_total': job.frames_total
+                    })
+
+    def worker_models(self) -> dict[int, list[dict]]:
+        return dict(self._worker_models)
+
+    def active_count(self) -> int:
+        with self._lock:
+            return self._active()
+
+    def _active(self) -> int:
+        # queued or running jobs and rescores; the caller holds the lock
+        return sum(1 for job in self._jobs.values() if not job.finished) + self._rescores
+
+    def _check_capacity(self) -> None:
+        active = self._active()
+        if active >= self.max_workers + self.max_queue:
+            raise JobQueueFull(f"{active} jobs already queued or running")
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at.timestamp() < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(
+        self,
+        params: dict,
+        work_dir: Optional[str] = None,
+        inputs: Optional[dict] = None,
+        stream: bool = False,
+        cache_key: Optional[str] = None
+    ) -> Job:
+        # blocking: a cache hit is read from disk, so call this off the event loop
+        job = Job(uuid.uuid4().hex, params, work_dir, inputs, stream, cache_key)
+        cached = self.cache.get(cache_key) if self.cache is not None and cache_key else None
+        if cached is not None:
+            self._complete_from_cache(job, cached)
+            return job
+
+        with self._lock:
+            self._prune()
+            self._check_capacity()
+            self._jobs[job.id] = job
+
+        try:
+            job.future, executor = self._submit(_run_job, job.id, params, stream)
+        except BaseException:
+            # never queued, so it must not hold a slot of the bound
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise
+        job.future.add_done_callback(lambda future: self._finish(job, future, executor))
+        return job
+
+    def rescore(self, params: dict) -> Future:
+        # replays recorded detections (see rescore.py) in a worker rather
+        # than the API process; not a job, it takes seconds and has no
+        # progress, but it waits for a worker like one and counts against
+        # the same bound (JobQueueFull past it)
+        with self._lock:
+            self._check_capacity()
+            self._rescores += 1
+        try:
+            future, executor = self._submit(_run_rescore, params)
+        except BaseException:
+            with self._lock:
+                self._rescores -= 1
+            raise
+
+        def done(future: Future) -> None:
+            with self._lock:
+                self._rescores -= 1
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                self._restart(executor)
+
+        future.add_done_callback(done)
+        return future
+
+    def _complete_from_cache(self, job: Job, result: dict) -> None:
+        job.cached = True
+        job.started_at = job.created_at
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        # a streaming client still gets every defect, just all at once
+        if job.events is not None:
+            for index, defect in enumerate(result.get('defects', [])):
+                job.events.put({'event': 'defect', 'track_index': index, 'defect': defect})
+            job.events.put(None)
+        job.future = Future()
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        job.future.set_result(result)
+
+    def _finish(self, job: Job, future: Future, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        try:
+            job.result = future.result()
+            job.status = COMPLETED
+            if job.frames_total:
+                job.frames_processed = job.frames_total
+            if job.cache_key and not job.cached and self.cache is not None:
+                try:
+                    self.cache.put(job.cache_key, job.result)
+                except OSError:
+                    logger.exception("Could not cache the result of job %s", job.id)
+        except BaseException as e:
+            job.error = str(e) or e.__class__.__name__
+            job.status = FAILED
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                self._restart(executor)
+            # a crashed worker never sends 'finished'
+            if job.events is not None:
+                job.events.put(None)
+        job.finished_at = datetime.now()
+        self._observe(job)
+
+        if job.work_dir:
+            shutil.rmtree(job.work_dir, ignore_errors=True)
+
+    def _observe(self, job: Job) -> None:
+        if job.cached:
+            jobs_total.inc(status='cached')
+            return
+        jobs_total.inc(status=job.status)
+        if job.status != COMPLETED:
+            return
+
+        # uploads are observed by the API as they arrive
+        queue_wait = job.request_stages().get('queue_wait')
+        if queue_wait is not None:
+            stage_seconds.observe(queue_wait, stage='queue_wait')
+        info = job.result.get('processing_info', {})
+        for stage, seconds in info.get('stage_seconds', {}).items():
+            stage_seconds.observe(seconds, stage=stage)
+        if job.started_at is not None:
+            run_seconds = (job.finished_at - job.started_at).total_seconds()
+            job_seconds.observe(run_seconds)
+            if run_seconds > 0 and info.get('processed_frames'):
+                frames_per_second.observe(info['processed_frames'] / run_seconds)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs.values())
@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MODELS = int(os.environ.get('MODEL_CACHE_SIZE', 2))
+
+# onnx backends run on CPU through ONNX Runtime, see utils.detector_backends
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+DEFAULT_BACKEND = os.environ.get('DETECTOR_BACKEND', 'torch')
+
+WARMUP_FRAME_SHAPE = (1080, 1920, 3)
+
+
+@lru_cache(maxsize=1)
+def detect_device() -> str:
+    # probed once per process, torch import is expensive
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return 'cuda'
+        if hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
+            return 'mps'
+    except ImportError:
+        pass
+    return 'cpu'
+
+
+def weights_mtime(weights_path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(weights_path)
+    except OSError:
+        # hub names such as 'yolov8s.pt' are resolved by ultralytics itself
+        return None
+
+
+class LoadedModel:
+    """A YOLO model bound to one device, safe to share between threads."""
+
+    backend = 'torch'
+
+    def __init__(self, model: 'YOLO', weights_path: str, mtime: Optional[float], device: str) -> None:
+        self.model = model
+        self.weights_path = weights_path
+        self.mtime = mtime
+        self.device = device
+        self.loaded_at = datetime.now()
+        self.warmed_up = False
+        self.inference_calls = 0
+        # ultralytics predictors keep per-call state, so calls are serialized
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> dict:
+        return self.model.names
+
+    def predict(self, frames, **kwargs) -> list:
+        with self._lock:
+            self.inference_calls += 1
+            return self.model(frames, verbose=False, device=self.device, **kwargs)
+
+    def warm_up(self) -> None:
+        if self.warmed_up:
+            return
+        self.predict(np.zeros(WARMUP_FRAME_SHAPE, dtype=np.uint8))
+        self.warmed_up = True
+
+    def info(self) -> dict:
+        return {
+            'weights_path': self.weights_path,
+            'weights_mtime': self.mtime,
+            'device': self.device,
+            'backend': self.backend,
+            'loaded_at': self.loaded_at.isoformat(),
+            'warmed_up': self.warmed_up,
+            'inference_calls': self.inference_calls,
+        }
+
+
+class ModelRegistry:
+    """LRU cache of loaded models keyed by (weights path, file mtime, device, backend)."""
+
+    def __init__(self, max_models: int = DEFAULT_MAX_MODELS) -> None:
+        self.max_models = max(1, max_models)
+        self._models: OrderedDict[tuple, LoadedModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: dict[tuple, threading.Lock] = {}
+
+    def _key(self, weights_path: str, device: str, backend: str) -> tuple:
+        path = os.path.abspath(weights_path) if os.path.exists(weights_path) else weights_path
+        return path, weights_mtime(weights_path), device, backend
+
+    def _load(self, weights_path: str, key: tuple) -> LoadedModel:
+        path, mtime, device, backend = key
+        if backend == 'torch':
+            # ultralytics pulls in torch, only paid for by processes that load a model
+            from ultralytics import YOLO
+            return LoadedModel(YOLO(weights_path), path, mtime, device)
+        from utils.detector_backends import load_onnx_model
+        return load_onnx_model(weights_path, mtime, backend)
+
+    def get(
+        self,
+        weights_path: str,
+        device: Optional[str] = None,
+        warm_up: bool = True,
+        backend: Optional[str] = None
+    ) -> LoadedModel:
+        backend = backend or DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown detector backend {backend!r}, expected one of {BACKENDS}")
+        # ONNX Runtime is only used on CPU
+        device = 'cpu' if backend != 'torch' else device or detect_device()
+        key = self._key(weights_path, device, backend)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # one loader per key, other callers for the same key wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    return entry
+
+            try:
+                logger.info("Loading model %s on %s (%s)", weights_path, device, backend)
+                entry = self._load(weights_path, key)
+                if warm_up:
+                    entry.warm_up()
+
+                with self._lock:
+                    self._models[key] = entry
+                    while len(self._models) > self.max_models:
+                        evicted_key, _ = self._models.popitem(last=False)
+                        logger.info("Evicted model %s on %s", evicted_key[0], evicted_key[2])
+            finally:
+                # a failed load leaves nothing behind, the next caller retries
+                with self._lock:
+                    self._loading.pop(key, None)
+
+        return entry
+
+    def list_models(self) -> list[dict]:
+        with self._lock:
+            return [entry.info() for entry in self._models.values()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+registry = ModelRegistry()
+
+
+def get_model(weights_path: str, device: Optional[str] = None, backend: Optional[str] = None) -> LoadedModel:
+    return registry.get(weights_path, device, backend=backend)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from utils.image_store import image_store, is_valid_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'RESULT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'results')
+)
+# 0 turns the cache off
+DEFAULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
+_file_hashes: dict[tuple, str] = {}
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    # remembered per (path, size, mtime), weights are hashed once per version
+    stat = os.stat(path)
+    marker = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if marker not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        _file_hashes[marker] = digest.hexdigest()
+    return _file_hashes[marker]
+
+
+def cache_key(fields: dict) -> str:
+    # fields must be JSON-serializable; key order doesn't matter
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class DiskCache:
+    """Files on local disk, one per key, bounded to max_bytes in total.
+
+    Using an entry refreshes its mtime; once the entries add up to more than
+    max_bytes the least recently used ones are removed.
+    """
+
+    suffix = ''
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        # key -> (size, last use); read from disk on first access
+        self._index: Optional[dict[str, tuple[int, float]]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}{self.suffix}")
+
+    def _load_index(self) -> dict[str, tuple[int, float]]:
+        if self._index is None:
+            self._index = {}
+            if os.path.isdir(self.root):
+                for dirpath, _, filenames in os.walk(self.root):
+                    for filename in filenames:
+                        key, ext = os.path.splitext(filename)
+                        if ext != self.suffix or not is_valid_key(key):
+                            continue
+                        stat = os.stat(os.path.join(dirpath, filename))
+                        self._index[key] = (stat.st_size, stat.st_mtime)
+        return self._index
+
+    def _remove(self, key: str) -> None:
+        self._load_index().pop(key, None)
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def _touch(self, key: str) -> None:
+        path = self.path_for(key)
+        os.utime(path)
+        self._load_index()[key] = (os.path.getsize(path), os.path.getmtime(path))
+
+    def write(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.register(key)
+
+    def register(self, key: str) -> None:
+        # for entries written to path_for(key) by someone else
+        with self._lock:
+            if not os.path.exists(self.path_for(key)):
+                return
+            index = self._load_index()
+            self._touch(key)
+            self._evict(index)
+
+    def _evict(self, index: dict[str, tuple[int, float]]) -> None:
+        total = sum(size for size, _ in index.values())
+        for key in sorted(index, key=lambda k: index[k][1]):
+            if total <= self.max_bytes:
+                break
+            total -= index[key][0]
+            self._remove(key)
+            self.evictions += 1
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        # one entry, or everything without a key
+        with self._lock:
+            index = self._load_index()
+            keys = list(index) if key is None else [key] if key in index else []
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load_index() if self.enabled else {}
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(index),
+                'bytes': sum(size for size, _ in index.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+class ResultCache(DiskCache):
+    """Finished /process responses, keyed by cache_key.
+
+    Results whose evidence images have since been cleaned up from the image
+    store count as misses.
+    """
+
+    suffix = '.json'
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES) -> None:
+        super().__init__(root, max_bytes)
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            result = None
+            if key in self._load_index():
+                try:
+                    with open(self.path_for(key)) as f:
+                        result = json.load(f)
+                except (OSError, ValueError):
+                    logger.warning("Dropping unreadable cache entry %s", key)
+                    self._remove(key)
+            if result is not None and not self._images_available(result):
+                self._remove(key)
+                result = None
+
+            if result is None:
+                self.misses += 1
+                return None
+            self._touch(key)
+            self.hits += 1
+            return result
+
+    @staticmethod
+    def _images_available(result: dict) -> bool:
+        for defect in result.get('defects', []):
+            key = defect.get('image_key')
+            if key is None:
+                continue
+            path = image_store.get_path(key)
+            if path is None:
+                return False
+            # still referenced, keep it through the image retention period
+            os.utime(path)
+        return True
+
+    def put(self, key: str, result: dict) -> None:
+        if self.enabled:
+            self.write(key, json.dumps(result).encode())
+
+
+result_cache = ResultCache()
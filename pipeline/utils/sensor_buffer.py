@@ -0,0 +1,125 @@
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+import numpy as np
+
+from utils.gpx_parser import GpsTrack
+from utils.imu_analyzer import CHANNEL_ALIASES, CHANNELS, ImuSeries
+from utils.general import datetime_to_ns, ns_to_datetime
+
+DEFAULT_SENSOR_RETENTION = float(os.environ.get('LIVE_SENSOR_RETENTION_SECONDS', 600))
+
+
+def parse_pushed_time(value: Union[str, int, float, datetime]) -> datetime:
+    # ISO strings or unix seconds; anything without a zone is taken as UTC
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class _Columns:
+    # appended in chunks, concatenated and trimmed lazily on read
+
+    def __init__(self, names: list[str]) -> None:
+        self.names = names
+        self.chunks: list[dict[str, np.ndarray]] = []
+        self.merged: Optional[dict[str, np.ndarray]] = None
+
+    def append(self, columns: dict[str, np.ndarray]) -> None:
+        if len(columns['times_ns']):
+            self.chunks.append(columns)
+            self.merged = None
+
+    def read(self, retention_ns: int) -> dict[str, np.ndarray]:
+        if self.merged is None:
+            if self.chunks:
+                merged = {name: np.concatenate([c[name] for c in self.chunks]) for name in ['times_ns'] + self.names}
+                order = np.argsort(merged['times_ns'], kind='stable')
+                times = merged['times_ns'][order]
+                keep = order[times >= times[-1] - retention_ns]
+                merged = {name: values[keep] for name, values in merged.items()}
+                self.chunks = [merged]
+            else:
+                merged = {name: np.empty(0, dtype=np.float64) for name in self.names}
+                merged['times_ns'] = np.empty(0, dtype=np.int64)
+            self.merged = merged
+        return self.merged
+
+
+class SensorBuffer:
+    """GPS fixes and IMU samples pushed alongside a live video stream.
+
+    Samples may arrive late or out of order; reads return them sorted by
+    time. Only the last `retention_seconds` (relative to the newest sample)
+    are kept, so a session can run indefinitely.
+    """
+
+    def __init__(self, retention_seconds: float = DEFAULT_SENSOR_RETENTION) -> None:
+        self.retention_ns = int(retention_seconds * 1e9)
+        self._gps = _Columns(['lat', 'lng', 'elevation'])
+        self._imu = _Columns(CHANNELS)
+        self._lock = threading.Lock()
+        self._gps_track: Optional[GpsTrack] = None
+        self._imu_series: Optional[ImuSeries] = None
+        self.gps_received = 0
+        self.imu_received = 0
+
+    def add_gps(self, fixes: list[dict]) -> int:
+        times = [datetime_to_ns(parse_pushed_time(f['timestamp'])) for f in fixes]
+        columns = {
+            'times_ns': np.array(times, dtype=np.int64),
+            'lat': np.array([f['lat'] for f in fixes], dtype=np.float64),
+            'lng': np.array([f['lng'] for f in fixes], dtype=np.float64),
+            'elevation': np.array(
+                [np.nan if f.get('elevation') is None else f['elevation'] for f in fixes],
+                dtype=np.float64
+            ),
+        }
+        with self._lock:
+            self._gps.append(columns)
+            self._gps_track = None
+            self.gps_received += len(fixes)
+        return len(fixes)
+
+    def add_imu(self, samples: list[dict]) -> int:
+        times = [datetime_to_ns(parse_pushed_time(s['timestamp'])) for s in samples]
+        columns = {'times_ns': np.array(times, dtype=np.int64)}
+        for name, aliases in CHANNEL_ALIASES.items():
+            key = next((alias for alias in aliases if alias in samples[0]), name) if samples else name
+            columns[name] = np.array([float(s.get(key, 0.0)) for s in samples], dtype=np.float64)
+        with self._lock:
+            self._imu.append(columns)
+            self._imu_series = None
+            self.imu_received += len(samples)
+        return len(samples)
+
+    def gps_track(self) -> GpsTrack:
+        with self._lock:
+            if self._gps_track is None:
+                gps = self._gps.read(self.retention_ns)
+                start_time = ns_to_datetime(gps['times_ns'][0], timezone.utc) if len(gps['times_ns']) else None
+                self._gps_track = GpsTrack(gps['times_ns'], gps['lat'], gps['lng'], gps['elevation'], start_time)
+            return self._gps_track
+
+    def imu_series(self) -> ImuSeries:
+        with self._lock:
+            if self._imu_series is None:
+                imu = self._imu.read(self.retention_ns)
+                has_time = np.ones(len(imu['times_ns']), dtype=bool)
+                channels = {name: imu[name] for name in CHANNELS}
+                self._imu_series = ImuSeries(imu['times_ns'], has_time, channels, timezone.utc)
+            return self._imu_series
+
+    def stats(self) -> dict:
+        return {
+            'gps_received': self.gps_received,
+            'imu_received': self.imu_received,
+            'gps_buffered': len(self.gps_track()),
+            'imu_buffered': len(self.imu_series()),
+        }
@@ -0,0 +1,78 @@
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+from typing import Generic, TypeVar
+
+T = TypeVar('T')
+
+_DONE = object()
+
+
+class _Failure:
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class BackgroundIterator(Generic[T]):
+    """Drains an iterable on a worker thread into a bounded queue.
+
+    The producer blocks once `maxsize` items are waiting, which is what keeps
+    memory bounded when a later stage is slower. Exceptions raised by the
+    producer are re-raised in the consuming thread, in order.
+    """
+
+    def __init__(self, iterable: Iterable[T], maxsize: int = 4, name: str = 'stage') -> None:
+        self._iterable = iterable
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        try:
+            for item in self._iterable:
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self._put(_Failure(e))
+            return
+        finally:
+            # lets an upstream stage or generator release its resources
+            close = getattr(self._iterable, 'close', None)
+            if close is not None:
+                close()
+        self._put(_DONE)
+
+    def __iter__(self) -> Iterator[T]:
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._stop.set()
+        # unblock a producer waiting on a full queue
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        # no timeout: the producer may still be inside the iterable (a read
+        # on the capture the caller releases next), it stops after that item
+        self._thread.join()
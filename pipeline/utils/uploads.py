@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import os
+from typing import IO, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    # python-multipart before 0.0.13
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+CHUNK_SIZE = 1024 * 1024
+
+MAX_VIDEO_BYTES = int(os.environ.get('MAX_VIDEO_BYTES', 700 * 1024 * 1024))
+MAX_GPX_BYTES = int(os.environ.get('MAX_GPX_BYTES', 50 * 1024 * 1024))
+MAX_IMU_BYTES = int(os.environ.get('MAX_IMU_BYTES', 200 * 1024 * 1024))
+# all the plain form fields of one request together
+MAX_FIELD_BYTES = int(os.environ.get('MAX_FIELD_BYTES', 1024 * 1024))
+
+# whole request body: the three files plus the multipart framing and form fields
+MAX_REQUEST_BYTES = int(os.environ.get(
+    'MAX_REQUEST_BYTES', MAX_VIDEO_BYTES + MAX_GPX_BYTES + MAX_IMU_BYTES + MAX_FIELD_BYTES
+))
+
+
+class UploadTooLarge(Exception):
+
+    def __init__(self, filename: str, max_bytes: int) -> None:
+        super().__init__(f"{filename} exceeds the upload limit of {max_bytes} bytes")
+        self.filename = filename
+        self.max_bytes = max_bytes
+
+
+class RequestSizeLimit:
+    """
+    ASGI middleware answering 413 to request bodies over max_bytes: straight
+    from Content-Length when the client sends one, otherwise as soon as the
+    received bytes pass the limit.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _detail(self) -> str:
+        return f"Request body exceeds the upload limit of {self.max_bytes} bytes"
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get('content-length', '')
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({'detail': self._detail()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class UploadTarget:
+    """Where one file field of a multipart upload goes, and what it may be."""
+
+    def __init__(self, path: str, max_bytes: int, suffixes: tuple[str, ...] = (), invalid_detail: str = '') -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.suffixes = suffixes
+        self.invalid_detail = invalid_detail
+
+    def check_filename(self, field: str, filename: str) -> None:
+        if self.suffixes and not filename.lower().endswith(self.suffixes):
+            raise HTTPException(status_code=400, detail=self.invalid_detail or f"Unsupported file type for {field}")
+
+
+class _FilePart:
+
+    def __init__(self, target: UploadTarget, filename: str, file: IO[bytes]) -> None:
+        self.target = target
+        self.filename = filename
+        self.file = file
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.pending: list[bytes] = []
+        self.pending_bytes = 0
+
+    def write(self, data: bytes) -> None:
+        # runs on a worker thread, the event loop only counts bytes
+        self.digest.update(data)
+        self.file.write(data)
+
+    def info(self) -> dict:
+        return {
+            'filename': self.filename,
+            'size': self.size,
+            'sha256': self.digest.hexdigest(),
+        }
+
+
+class MultipartUpload:
+    """
+    Parses a multipart/form-data request body as it arrives. File fields
+    named in targets are hashed and written straight to their path, each
+    checked against its own limit as the bytes come in; everything else is
+    kept as a (small) text field. Nothing is spooled anywhere else first.
+    """
+
+    def __init__(self, targets: dict[str, UploadTarget], max_field_bytes: int = MAX_FIELD_BYTES, chunk_size: int = CHUNK_SIZE) -> None:
+        self.targets = targets
+        self.max_field_bytes = max_field_bytes
+        self.chunk_size = chunk_size
+
+        self.fields: dict[str, str] = {}
+        self.files: dict[str, _FilePart] = {}
+        self._field_bytes = 0
+        self._part: Optional[_FilePart] = None
+        self._field: Optional[tuple[str, bytearray]] = None
+        # parser callbacks only record what they saw, the writes are async
+        self._events: list[tuple] = []
+        self._header_field = b''
+        self._header_value = b''
+        self._headers: dict[bytes, bytes] = {}
+
+    # --- parser callbacks ---
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b''
+        self._header_value = b''
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        name = options.get(b'name', b'').decode('utf-8', 'replace')
+        filename = options.get(b'filename', b'').decode('utf-8', 'replace')
+        self._events.append(('begin', name, filename))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._events.append(('data', data[start:end]))
+
+    def _on_part_end(self) -> None:
+        self._events.append(('end',))
+
+    # --- async side ---
+
+    async def _flush(self, part: _FilePart) -> None:
+        if part.pending:
+            data = b''.join(part.pending)
+            part.pending, part.pending_bytes = [], 0
+            await asyncio.to_thread(part.write, data)
+
+    async def _begin(self, name: str, filename: str) -> None:
+        target = self.targets.get(name)
+        if target is None:
+            self._field = (name, bytearray())
+            return
+        if name in self.files:
+            raise HTTPException(status_code=400, detail=f"{name} was sent more than once")
+        target.check_filename(name, filename)
+        file = await asyncio.to_thread(open, target.path, 'wb')
+        self._part = self.files[name] = _FilePart(target, filename, file)
+
+    async def _data(self, data: bytes) -> None:
+        part = self._part
+        if part is None:
+            self._field_bytes += len(data)
+            if self._field_bytes > self.max_field_bytes:
+                raise UploadTooLarge('form fields', self.max_field_bytes)
+            self._field[1].extend(data)
+            return
+
+        part.size += len(data)
+        if part.size > part.target.max_bytes:
+            raise UploadTooLarge(part.filename, part.target.max_bytes)
+        part.pending.append(data)
+        part.pending_bytes += len(data)
+        if part.pending_bytes >= self.chunk_size:
+            await self._flush(part)
+
+    async def _end(self) -> None:
+        if self._part is not None:
+            await self._flush(self._part)
+            self._part = None
+        elif self._field is not None:
+            name, value = self._field
+            self.fields[name] = value.decode('utf-8', 'replace')
+            self._field = None
+
+    async def _handle_events(self) -> None:
+        events, self._events = self._events, []
+        for kind, *args in events:
+            if kind == 'begin':
+                await self._begin(*args)
+            elif kind == 'data':
+                await self._data(*args)
+            else:
+                await self._end()
+
+    async def receive(self, request: Request) -> tuple[dict[str, str], dict[str, dict]]:
+        """Reads the whole body; returns the text fields and, per file field, its name, size and sha256."""
+        content_type, options = parse_options_header(request.headers.get('content-type', ''))
+        boundary = options.get(b'boundary')
+        if content_type != b'multipart/form-data' or not boundary:
+            raise HTTPException(status_code=415, detail="Expected a multipart/form-data body")
+
+        parser = MultipartParser(boundary, {
+            'on_part_begin': self._on_part_begin,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+        })
+        try:
+            async for chunk in request.stream():
+                try:
+                    parser.write(chunk)
+                except FormParserError as e:
+                    raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+                await self._handle_events()
+            parser.finalize()
+            await self._handle_events()
+        finally:
+            # partial files are left for the caller, who owns the directory
+            for part in self.files.values():
+                part.file.close()
+
+        missing = [name for name in self.targets if name not in self.files]
+        if missing:
+            raise HTTPException(status_code=422, detail=f"Missing file field(s): {', '.join(missing)}")
+
+        return self.fields, {name: part.info() for name, part in self.files.items()}
+
+
+def multipart_openapi(form_schema: dict, files: dict[str, str]) -> dict:
+    # the request body these endpoints parse themselves, for /docs
+    properties = {
+        name: {'type': 'string', 'format': 'binary', 'description': description}
+        for name, description in files.items()
+    }
+    properties.update(form_schema.get('properties', {}))
+    return {
+        'requestBody': {
+            'required': True,
+            'content': {
+                'multipart/form-data': {
+                    'schema': {
+                        'type': 'object',
+                        'properties': properties,
+                        'required': [*files, *form_schema.get('required', [])],
+                    }
+                }
+            }
+        }
+    }